@@ -6,7 +6,7 @@ from dotenv import load_dotenv
 from telegram import Update, ReplyKeyboardMarkup
 from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
 
-from core.analyzer import run_analysis
+from core.analyzer import run_multi_timeframe_analysis_async
 from utils.symbols import resolve_symbol_alias as resolve_symbol
 from formatters.markdown_formatter import format_report_markdown
 
@@ -43,13 +43,18 @@ async def report(update: Update, context: ContextTypes.DEFAULT_TYPE):
             timeframes = ['15min']  # default
 
         for symbol in symbols:
-            for tf in timeframes:
-                await update.message.reply_text(
-                    f"🌸 Running report for *{symbol.get('input_symbol', symbol.get('db_symbol', '???'))}* @ `{tf}`...",
-                    parse_mode="Markdown"
-                )
-
-                report_obj = run_analysis(symbol_details=symbol, timeframe=tf)
+            await update.message.reply_text(
+                f"🌸 Running report for *{symbol.get('input_symbol', symbol.get('db_symbol', '???'))}* @ `{', '.join(timeframes)}`...",
+                parse_mode="Markdown"
+            )
+
+            # One fetch serves every requested timeframe
+            reports = await run_multi_timeframe_analysis_async(symbol_details=symbol, timeframes=timeframes)
+
+            for tf, report_obj in reports.items():
+                if isinstance(report_obj, Exception):
+                    await update.message.reply_text(f"❌ Error on {tf}: {report_obj}")
+                    continue
                 report_text = format_report_markdown(report_obj)
 
                 await update.message.reply_markdown_v2(report_text)
@@ -1,5 +1,8 @@
 import sys
-from core.analyzer import run_analysis
+import argparse
+from config.settings import BATCH_MAX_WORKERS, SCAN_UNIVERSE, BACKTEST_HORIZON_BARS, SWEEP_MAX_WORKERS
+from core.analyzer import run_multi_timeframe_analysis
+from core.batch import read_watchlist, run_batch
 from formatters.markdown_formatter import format_report_markdown
 from utils.symbols import resolve_symbol_alias
 
@@ -20,14 +23,177 @@ def normalize_timeframe(tf: str) -> str:
                 return f"{number}{val}"
     return tf
 
+def batch_main(argv):
+    """
+    Batch mode: analyzes every symbol of a watchlist file over a process pool.
+    """
+    parser = argparse.ArgumentParser(prog="kawaii_cli.py --batch", description="Run a watchlist in parallel.")
+    parser.add_argument("watchlist", help="File with one symbol per line, optionally followed by timeframes")
+    parser.add_argument("timeframes", nargs="?", default="", help="Default timeframes, e.g. 15min,1h")
+    parser.add_argument("--workers", type=int, default=BATCH_MAX_WORKERS)
+    parser.add_argument("--no-chart", action="store_true", help="Skip chart rendering")
+    parser.add_argument("--quiet", action="store_true", help="Print one status line per job instead of the reports")
+    args = parser.parse_args(argv)
+
+    default_timeframes = [normalize_timeframe(t) for t in args.timeframes.split(",") if t.strip()]
+    try:
+        jobs = read_watchlist(args.watchlist, default_timeframes)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return
+    jobs = [(symbol, [normalize_timeframe(t) for t in timeframes]) for symbol, timeframes in jobs]
+    if not jobs:
+        print(f"Error: No symbols in {args.watchlist}")
+        return
+
+    total = len(jobs)
+    print(f"\n[🏭 Batch: {total} symbols, {sum(len(tfs) for _, tfs in jobs)} reports, {args.workers} workers]")
+    done = 0
+
+    def on_result(result):
+        nonlocal done
+        done += 1
+        label = f"{result['symbol']} @ {', '.join(result['timeframes'])}"
+        if result["error"]:
+            print(f"[ERROR] ({done}/{total}) {label} failed after {result['elapsed']:.1f}s: {result['error']}")
+            return
+        print(f"\n[✅ ({done}/{total}) {label} in {result['elapsed']:.1f}s]")
+        for timeframe, error in result["errors"].items():
+            print(f"[ERROR] {result['symbol']} @ {timeframe}: {error}")
+        if not args.quiet:
+            for timeframe, report in result["reports"].items():
+                print(f"\n[🌸 Report for: {result['symbol']} @ {timeframe}]")
+                print(format_report_markdown(report))
+
+    summary = run_batch(jobs, max_workers=args.workers, render_chart=not args.no_chart, on_result=on_result)
+
+    print(f"\n[📊 Batch summary]")
+    print(f"  Jobs: {summary['jobs']} ({len(summary['failed'])} failed), reports: {summary['reports']}")
+    print(f"  Wall time: {summary['elapsed']:.1f}s over {summary['workers']} workers "
+          f"(job time {summary['job_seconds']:.1f}s, {summary['reports_per_min']:.1f} reports/min)")
+    for result in summary["failed"]:
+        print(f"  ❌ {result['symbol']}: {result['error']}")
+
+def scan_main(argv):
+    """
+    Scan mode: ranks a universe by active range, fresh manipulation and IRZ proximity.
+    """
+    from core.scanner import resolve_universe, scan_universe
+
+    parser = argparse.ArgumentParser(prog="kawaii_cli.py --scan", description="Scan a universe for setups.")
+    parser.add_argument("timeframe", nargs="?", default="1h")
+    parser.add_argument("--universe", default=SCAN_UNIVERSE, help='"all", a symbol file, or a comma list')
+    parser.add_argument("--top", type=int, default=25, help="Rows to print (0 for all)")
+    args = parser.parse_args(argv)
+
+    timeframe = normalize_timeframe(args.timeframe)
+    symbols = resolve_universe(args.universe)
+    if not symbols:
+        print(f"Error: No symbols in universe {args.universe}")
+        return
+
+    print(f"\n[🔭 Scanning {len(symbols)} symbols @ {timeframe}]")
+    try:
+        table = scan_universe(symbols, timeframe, top=args.top or None)
+    except Exception as e:
+        print(f"[ERROR] Scan failed: {e}")
+        return
+    if table.empty:
+        print("No bars loaded for this universe.")
+        return
+    print(table.drop(columns=["db_symbol"]).to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+
+def backtest_main(argv):
+    """
+    Backtest mode: walk-forward hit rates of the IRZ retracements and targets.
+    """
+    from core.backtest import backtest_symbol
+
+    parser = argparse.ArgumentParser(prog="kawaii_cli.py --backtest", description="Backtest IRZ projections.")
+    parser.add_argument("symbol")
+    parser.add_argument("timeframe", nargs="?", default="5min")
+    parser.add_argument("--days", type=int, default=365, help="History to replay")
+    parser.add_argument("--horizon", type=int, default=BACKTEST_HORIZON_BARS, help="Bars a level has to be hit in")
+    args = parser.parse_args(argv)
+
+    timeframe = normalize_timeframe(args.timeframe)
+    symbol_details = resolve_symbol_alias(args.symbol.upper())
+    print(f"\n[🧪 Backtesting {args.symbol.upper()} @ {timeframe} over {args.days} days]")
+    try:
+        result = backtest_symbol(symbol_details, timeframe, args.days, horizon=args.horizon)
+    except Exception as e:
+        print(f"[ERROR] Backtest failed: {e}")
+        return
+
+    print(f"  Bars: {result['bars']}, signals: {result['signals']}, replayed in {result['elapsed']:.1f}s")
+    if result["signals"]:
+        print(result["summary"].to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+
+def sweep_main(argv):
+    """
+    Sweep mode: tunes the detector parameters for one symbol and timeframe and
+    saves the winners for run_analysis.
+    """
+    from core.sweep import sweep_symbol
+
+    parser = argparse.ArgumentParser(prog="kawaii_cli.py --sweep", description="Tune detector parameters.")
+    parser.add_argument("symbol")
+    parser.add_argument("timeframe", nargs="?", default="1h")
+    parser.add_argument("--days", type=int, default=365, help="History to evaluate on")
+    parser.add_argument("--workers", type=int, default=SWEEP_MAX_WORKERS)
+    parser.add_argument("--dry-run", action="store_true", help="Print the winners without saving them")
+    args = parser.parse_args(argv)
+
+    timeframe = normalize_timeframe(args.timeframe)
+    symbol_details = resolve_symbol_alias(args.symbol.upper())
+    print(f"\n[🎛️ Sweeping {args.symbol.upper()} @ {timeframe} over {args.days} days, {args.workers} workers]")
+    try:
+        result = sweep_symbol(symbol_details, timeframe, args.days, max_workers=args.workers, save=not args.dry_run)
+    except Exception as e:
+        print(f"[ERROR] Sweep failed: {e}")
+        return
+
+    print(f"  Bars: {result['bars']}, done in {result['elapsed']:.1f}s")
+    for family, table in result["results"].items():
+        print(f"\n[{family}]")
+        print(table.head(5).drop(columns=["elapsed", "changed"]).to_string(index=False))
+        for error in table["error"].dropna().unique():
+            print(f"  ❌ {error}")
+    if result["params"]:
+        print(f"\n  Best: {result['params']}")
+    else:
+        print("\n  No setting had enough samples; detector defaults stay in use.")
+    if result["path"]:
+        print(f"  Saved to {result['path']}")
+
 def main():
     args = sys.argv[1:]
 
     if not args:
         print("Usage: python3 kawaii_cli.py <symbol(s)> <timeframe(s)>")
+        print("       python3 kawaii_cli.py --batch <watchlist file> [timeframe(s)] [--workers N] [--quiet] [--no-chart]")
+        print("       python3 kawaii_cli.py --scan [timeframe] [--universe all|FILE|ES,NQ] [--top N]")
+        print("       python3 kawaii_cli.py --backtest <symbol> [timeframe] [--days N] [--horizon N]")
+        print("       python3 kawaii_cli.py --sweep <symbol> [timeframe] [--days N] [--workers N] [--dry-run]")
         print("Example: python3 kawaii_cli.py ES,AAPL 15min,1d")
         return
 
+    if args[0] in ("--batch", "-b"):
+        batch_main(args[1:])
+        return
+
+    if args[0] in ("--scan", "-s"):
+        scan_main(args[1:])
+        return
+
+    if args[0] == "--backtest":
+        backtest_main(args[1:])
+        return
+
+    if args[0] == "--sweep":
+        sweep_main(args[1:])
+        return
+
     flat_args = [x.strip() for arg in args for x in arg.split(",") if x.strip()]
 
     raw_symbols = []
@@ -48,17 +214,25 @@ def main():
         return
 
     for symbol_input in symbols:
-        for timeframe in timeframes:
-            print(f"\n[🌸 Running report for: {symbol_input} @ {timeframe}]")
-            
-            symbol_details = resolve_symbol_alias(symbol_input)
-            
-            try:
-                report = run_analysis(symbol_details, timeframe)
-                print(format_report_markdown(report))
-            except Exception as e:
+        print(f"\n[🌸 Running report for: {symbol_input} @ {', '.join(timeframes)}]")
+
+        symbol_details = resolve_symbol_alias(symbol_input)
+
+        try:
+            # One fetch serves every requested timeframe
+            reports = run_multi_timeframe_analysis(symbol_details, timeframes)
+        except Exception as e:
+            db_symbol_for_error = symbol_details.get("db_symbol", symbol_details.get("symbol", symbol_input))
+            print(f"[ERROR] Failed to analyze {db_symbol_for_error} (input: {symbol_input}) on {', '.join(timeframes)}: {e}")
+            continue
+
+        for timeframe, report in reports.items():
+            if isinstance(report, Exception):
                 db_symbol_for_error = symbol_details.get("db_symbol", symbol_details.get("symbol", symbol_input))
-                print(f"[ERROR] Failed to analyze {db_symbol_for_error} (input: {symbol_input}) on {timeframe}: {e}")
+                print(f"[ERROR] Failed to analyze {db_symbol_for_error} (input: {symbol_input}) on {timeframe}: {report}")
+                continue
+            print(f"\n[🌸 Report for: {symbol_input} @ {timeframe}]")
+            print(format_report_markdown(report))
 
 if __name__ == "__main__":
     main()
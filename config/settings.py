@@ -1,3 +1,63 @@
 # /mnt/data/kawaiitrader_full/config/settings.py
 
-# TODO: implement
+import os
+
+# 🗄️ Local bar cache (data/bar_cache.py)
+BAR_CACHE_ENABLED = os.getenv("KAWAII_BAR_CACHE", "1") != "0"
+BAR_CACHE_DIR = os.getenv("KAWAII_BAR_CACHE_DIR", os.path.join("Cache", "bars"))
+BAR_CACHE_MEMORY_BARS = int(os.getenv("KAWAII_BAR_CACHE_MEMORY_BARS", "5000000"))  # bars kept in memory across partitions
+
+# 🔺 Materialized timeframe rollups (data/rollup_store.py)
+ROLLUP_STORE_ENABLED = os.getenv("KAWAII_ROLLUPS", "0") == "1"
+ROLLUP_STORE_DIR = os.getenv("KAWAII_ROLLUP_DIR", os.path.join("Cache", "rollups"))
+ROLLUP_STORE_MEMORY_BARS = int(os.getenv("KAWAII_ROLLUP_MEMORY_BARS", "2000000"))  # bars kept in memory across levels
+
+# ⚡ Async fetch pool (data/async_client.py)
+FETCH_MAX_IN_FLIGHT = int(os.getenv("KAWAII_FETCH_MAX_IN_FLIGHT", "8"))
+FETCH_RATE_LIMIT_PER_SEC = float(os.getenv("KAWAII_FETCH_RATE_LIMIT", "20"))
+
+# 🔌 Data source behind fetch_ohlcv (data/sources.py): "databento" or "files"
+DATA_SOURCE = os.getenv("KAWAII_DATA_SOURCE", "databento")
+DATA_FILES_DIR = os.getenv("KAWAII_DATA_DIR", "Data")
+
+# 🧮 Bar dtypes: "compact" keeps float32 prices where exact, "float" always float64
+BAR_PRICE_TYPE = os.getenv("KAWAII_BAR_PRICE_TYPE", "compact")
+
+# 🕒 How long a dataset's available range from metadata.get_dataset_range stays fresh
+AVAILABILITY_TTL_SEC = float(os.getenv("KAWAII_AVAILABILITY_TTL", "300"))
+AVAILABILITY_RETRY_SEC = float(os.getenv("KAWAII_AVAILABILITY_RETRY", "30"))  # after a failed lookup, requests go unclamped this long
+
+# 📦 Bulk history downloads (data/bulk_download.py), written where FileSource reads them
+BULK_CHUNK_DAYS = int(os.getenv("KAWAII_BULK_CHUNK_DAYS", "7"))
+BULK_MAX_WORKERS = int(os.getenv("KAWAII_BULK_MAX_WORKERS", "4"))
+
+# 🧵 Locally stitched continuous futures (data/continuous.py)
+# "off" uses the provider's ROOT.c.0 series; "back", "ratio" or "none" builds it from contracts
+CONTINUOUS_ADJUSTMENT = os.getenv("KAWAII_CONTINUOUS_ADJUST", "off")
+CONTINUOUS_ROLL_RULE = os.getenv("KAWAII_CONTINUOUS_ROLL", "volume")  # "volume" or "calendar"
+CONTINUOUS_ROLL_DAYS = int(os.getenv("KAWAII_CONTINUOUS_ROLL_DAYS", "8"))
+
+# 🌊 Records per chunk when trades/mbp-1/1s bars are streamed and folded into bars (data/stream_aggregator.py)
+STREAM_CHUNK_RECORDS = int(os.getenv("KAWAII_STREAM_CHUNK_RECORDS", "250000"))
+
+# 💱 Fold mbp-1 quotes into spread/bid/ask/imbalance columns next to OHLCV
+QUOTE_BARS_ENABLED = os.getenv("KAWAII_QUOTE_BARS", "0") == "1"
+
+# 🕸️ Threads for the S/R, trendline, range and chart stages of one analysis (core/pipeline.py); 1 runs them inline
+ANALYSIS_THREADS = int(os.getenv("KAWAII_ANALYSIS_THREADS", "4"))
+
+# 🗃️ Finished reports kept per (symbol, timeframe, bar in progress, params) (core/report_cache.py); 0 disables
+REPORT_CACHE_SIZE = int(os.getenv("KAWAII_REPORT_CACHE_SIZE", "256"))
+
+# 🏭 Worker processes for CLI batch runs over a watchlist (core/batch.py)
+BATCH_MAX_WORKERS = int(os.getenv("KAWAII_BATCH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# 🔭 Market scanner universe (core/scanner.py): "all" CME futures roots, a symbol file, or a comma list
+SCAN_UNIVERSE = os.getenv("KAWAII_SCAN_UNIVERSE", "all")
+
+# 🧪 Bars after a signal within which an IRZ level must be reached to count as hit (core/backtest.py)
+BACKTEST_HORIZON_BARS = int(os.getenv("KAWAII_BACKTEST_HORIZON", "500"))
+
+# 🎛️ Per-symbol detector parameters found by the sweep (core/sweep.py), loaded by run_analysis
+TUNED_PARAMS_DIR = os.getenv("KAWAII_TUNED_PARAMS_DIR", os.path.join("Cache", "params"))
+SWEEP_MAX_WORKERS = int(os.getenv("KAWAII_SWEEP_WORKERS", str(os.cpu_count() or 1)))
@@ -1,23 +1,133 @@
-from data.databento_client import fetch_ohlcv, get_dynamic_lookback
+import asyncio
+
+from config.settings import QUOTE_BARS_ENABLED
+from data.databento_client import fetch_ohlcv, fetch_ohlcv_multi, get_dynamic_lookback
+from data.async_client import get_async_fetcher
 from core.support_resistance import detect_support_resistance
 from core.trendline_detector import detect_trendline
-from core.range_detector import detect_body_range
+from core.range_detector import detect_body_range, detect_consolidation_history
 from core.manipulation_detector import detect_manipulation
 from core.irz_fib import calculate_irz_projection
+from core.features import FeatureStore
+from core.pipeline import run_stages, get_stage_pool
+from core.report_cache import get_report_cache, report_key
+from core.detector_params import load_detector_params
 from core.visualizer import plot_full_analysis
 from core.report_types import Report, Target, ManipulationEvent, Retracement
 
+def _lookback_days(timeframe: str, symbol_details: dict = None, end_time=None) -> int:
+    target_candles = 365 if timeframe == "1d" else 120
+    dataset = symbol_details.get("dataset") if symbol_details else None
+    return get_dynamic_lookback(timeframe, target_candles=target_candles, dataset=dataset, end_time=end_time)
+
+def _cached_reports(symbol_details: dict, timeframes: list, lookbacks: dict, with_quotes: bool,
+                    source=None, end_time=None, need_chart: bool = True, detector_params: dict = None):
+    """
+    Looks the timeframes up in the report cache.
+    Returns (cache, keys, hits); cache is None for custom sources, whose data the key cannot describe.
+    """
+    if source is not None:
+        return None, {}, {}
+    cache = get_report_cache()
+    detector_params = detector_params or {}
+    keys = {
+        tf: report_key(symbol_details, tf, {"lookback_days": lookbacks[tf], "with_quotes": with_quotes,
+                                            "detectors": detector_params.get(tf, {})}, end_time)
+        for tf in timeframes
+    }
+    hits = {}
+    for tf in timeframes:
+        report = cache.get(keys[tf], need_chart=need_chart)
+        if report is not None:
+            hits[tf] = report
+    return cache, keys, hits
+
 # run_analysis now accepts symbol_details dictionary
-def run_analysis(symbol_details: dict, timeframe: str = "1h") -> Report:
-    
-    # Use input_symbol for user-facing elements, db_symbol for internal Databento calls (though fetch_ohlcv now handles details)
-    input_symbol = symbol_details.get("input_symbol", symbol_details.get("db_symbol", "Unknown"))
+# source/end_time let research runs replay local files (data/sources.py) at any point in history
+# with_quotes adds mbp-1 spread/bid/ask/imbalance columns to the frame the detectors see
+# Reports are reused until the timeframe's bar rolls (core/report_cache.py)
+def run_analysis(symbol_details: dict, timeframe: str = "1h", source=None, end_time=None,
+                 render_chart: bool = True, with_quotes: bool = QUOTE_BARS_ENABLED) -> Report:
+    lookback_days = _lookback_days(timeframe, symbol_details, end_time)
+    params = load_detector_params(symbol_details, timeframe)
+    cache, keys, hits = _cached_reports(symbol_details, [timeframe], {timeframe: lookback_days}, with_quotes,
+                                        source=source, end_time=end_time, need_chart=render_chart,
+                                        detector_params={timeframe: params})
+    if timeframe in hits:
+        return hits[timeframe]
 
-    target_candles = 365 if timeframe == "1d" else 120
-    lookback_days = get_dynamic_lookback(timeframe, target_candles=target_candles)
-    
     # Pass the entire symbol_details dictionary to fetch_ohlcv
-    df = fetch_ohlcv(symbol_details, timeframe, lookback_days=lookback_days)
+    df = fetch_ohlcv(symbol_details, timeframe, lookback_days=lookback_days,
+                     source=source, end_time=end_time, with_quotes=with_quotes)
+    report = analyze_frame(df, symbol_details, timeframe, render_chart=render_chart, params=params)
+    if cache is not None:
+        cache.put(keys[timeframe], report)
+    return report
+
+def run_multi_timeframe_analysis(symbol_details: dict, timeframes: list, source=None, end_time=None,
+                                 render_chart: bool = True, with_quotes: bool = QUOTE_BARS_ENABLED) -> dict:
+    """
+    Runs the full analysis for several timeframes from a single data fetch.
+    Timeframes with a cached report for the current bar are not fetched again.
+    Returns {timeframe: Report} in the order the timeframes were given; a
+    timeframe that failed holds its exception instead, the others are unaffected.
+    """
+    timeframes = list(dict.fromkeys(timeframes))
+    lookbacks = {tf: _lookback_days(tf, symbol_details, end_time) for tf in timeframes}
+    params = {tf: load_detector_params(symbol_details, tf) for tf in timeframes}
+    cache, keys, reports = _cached_reports(symbol_details, timeframes, lookbacks, with_quotes,
+                                           source=source, end_time=end_time, need_chart=render_chart,
+                                           detector_params=params)
+    missing = [tf for tf in timeframes if tf not in reports]
+    if missing:
+        frames = fetch_ohlcv_multi(symbol_details, missing, {tf: lookbacks[tf] for tf in missing},
+                                   source=source, end_time=end_time, with_quotes=with_quotes)
+        for tf in missing:
+            reports[tf] = _analyze_or_error(frames[tf], symbol_details, tf, render_chart, params[tf])
+            if cache is not None and isinstance(reports[tf], Report):
+                cache.put(keys[tf], reports[tf])
+    return {tf: reports[tf] for tf in timeframes}
+
+def _analyze_or_error(frame, symbol_details: dict, timeframe: str, render_chart: bool, params: dict):
+    # A failed fetch arrives as its exception; analysis errors are returned the same way
+    if isinstance(frame, Exception):
+        return frame
+    try:
+        return analyze_frame(frame, symbol_details, timeframe, render_chart=render_chart, params=params)
+    except Exception as e:
+        return e
+
+async def run_multi_timeframe_analysis_async(symbol_details: dict, timeframes: list, fetcher=None,
+                                             with_quotes: bool = QUOTE_BARS_ENABLED) -> dict:
+    """
+    Async variant of run_multi_timeframe_analysis for the bot: the fetch runs on
+    the shared client pool and the detectors run in a worker thread, so the
+    event loop never blocks. Cached reports are served without either.
+    Failed timeframes hold their exception, as in run_multi_timeframe_analysis.
+    """
+    fetcher = fetcher or get_async_fetcher()
+    timeframes = list(dict.fromkeys(timeframes))
+    lookbacks = {tf: _lookback_days(tf, symbol_details) for tf in timeframes}
+    params = {tf: load_detector_params(symbol_details, tf) for tf in timeframes}
+    cache, keys, reports = _cached_reports(symbol_details, timeframes, lookbacks, with_quotes,
+                                           detector_params=params)
+    missing = [tf for tf in timeframes if tf not in reports]
+    if missing:
+        frames = await fetcher.fetch_ohlcv_multi(symbol_details, missing, {tf: lookbacks[tf] for tf in missing},
+                                                 with_quotes=with_quotes)
+        fresh = await asyncio.to_thread(
+            lambda: {tf: _analyze_or_error(frames[tf], symbol_details, tf, True, params[tf]) for tf in missing}
+        )
+        for tf, report in fresh.items():
+            if isinstance(report, Report):
+                cache.put(keys[tf], report)
+        reports.update(fresh)
+    return {tf: reports[tf] for tf in timeframes}
+
+def analyze_frame(df, symbol_details: dict, timeframe: str, render_chart: bool = True,
+                  features: FeatureStore = None, params: dict = None) -> Report:
+    # Use input_symbol for user-facing elements, db_symbol for internal Databento calls (though fetch_ohlcv now handles details)
+    input_symbol = symbol_details.get("input_symbol", symbol_details.get("db_symbol", "Unknown"))
 
     if df is None or df.empty:
         raise ValueError(f"No data returned for {input_symbol} on {timeframe}")
@@ -29,18 +139,107 @@ def run_analysis(symbol_details: dict, timeframe: str = "1h") -> Report:
     current_price = float(df["close"].iloc[-1])
     current_price_time = df.index[-1].isoformat()
 
-    # 🟦 Support / Resistance
-    supports, resistances = detect_support_resistance(df)
+    # 🧮 Shared ATR / extrema / body features, computed once for every detector
+    if features is None:
+        features = FeatureStore(df)
+
+    # 🎛️ Tuned detector parameters ({family: {param: value}}, see core/detector_params.py)
+    params = params or {}
+    sr_params = params.get("support_resistance", {})
+    range_params = params.get("range", {})
+    r_threshold = params.get("trendline", {}).get("r_threshold", 0.7)
+
+    # 🕸️ Stage graph: S/R, trendlines and range run side by side; manipulation
+    # waits for the range, the IRZ projection for manipulation, the chart for everything
+    stages = {
+        "levels": ((), lambda: detect_support_resistance(df, features=features, **sr_params)),
+        "trendlines": ((), lambda: detect_trendline(df, timeframe, input_symbol, features=features,
+                                                    r_threshold=r_threshold)),
+        "range": ((), lambda: detect_body_range(df, timeframe, features=features, **range_params)),
+        "manipulation": (("range",), lambda range_info: (
+            detect_manipulation(df, range_info) if range_info.get("is_range", False) else None
+        )),
+        "fib": (("range", "manipulation"), project_irz),
+    }
+    if render_chart:
+        stages["range_history"] = ((), lambda: detect_consolidation_history(
+            df, features=features, **range_params
+        )["boxes"])
+        stages["chart"] = (
+            ("levels", "trendlines", "range", "fib", "range_history"),
+            lambda levels, trendline_data, range_info, fib_data, range_boxes: render_chart_stage(
+                df, input_symbol, timeframe, levels[0], levels[1], trendline_data, range_info, fib_data, features,
+                range_boxes
+            ),
+        )
+    results = run_stages(stages, get_stage_pool())
 
-    # 📐 Trendlines
-    trendline_data = detect_trendline(df, timeframe, input_symbol)
-    trendline_vectors = trendline_data["vectors"]
+    supports, resistances = results["levels"]
+    return assemble_report(
+        input_symbol, timeframe, supports, resistances, results["trendlines"], results["range"],
+        results["manipulation"], results["fib"], results.get("chart"), current_price, current_price_time
+    )
+
+def project_irz(range_info: dict, manipulation):
+    """
+    IRZ/Fib projection for a manipulated range, else None.
+    """
+    if manipulation is None or manipulation["status"] != "manipulated":
+        return None
+    return calculate_irz_projection(
+        range_low=range_info.get("range_low"),
+        range_high=range_info.get("range_high"),
+        manipulation_direction=manipulation["direction"]
+    )
+
+def render_chart_stage(chart_df, input_symbol: str, timeframe: str, supports: list, resistances: list,
+                       trendline_data: dict, range_info: dict, fib_data, features: FeatureStore = None,
+                       range_boxes: list = None) -> str:
+    return plot_full_analysis(
+        df=chart_df,
+        symbol=input_symbol,
+        timeframe=timeframe,
+        support_levels=supports,
+        resistance_levels=resistances,
+        trendlines=trendline_data["vectors"],
+        fib_data=fib_data,
+        range_data=range_info,
+        features=features,
+        range_boxes=range_boxes
+    )
+
+def build_report(input_symbol: str, timeframe: str, supports: list, resistances: list,
+                 trendline_data: dict, range_info: dict, manipulation, current_price: float,
+                 current_price_time: str, chart_df=None, features: FeatureStore = None) -> Report:
+    """
+    Turns detector outputs into a Report (IRZ projection, bias, optional chart).
+    `manipulation` is None when no range was found; a chart is drawn only when
+    `chart_df` is given.
+    """
+    fib_data = project_irz(range_info, manipulation)
+
+    # 🖼️ Chart output (skipped for headless research runs)
+    chart_path = None
+    if chart_df is not None:
+        chart_path = render_chart_stage(chart_df, input_symbol, timeframe, supports, resistances,
+                                        trendline_data, range_info, fib_data, features)
+
+    return assemble_report(input_symbol, timeframe, supports, resistances, trendline_data, range_info,
+                           manipulation, fib_data, chart_path, current_price, current_price_time)
+
+def _as_float(value):
+    return None if value is None else float(value)
+
+def assemble_report(input_symbol: str, timeframe: str, supports: list, resistances: list,
+                    trendline_data: dict, range_info: dict, manipulation, fib_data, chart_path,
+                    current_price: float, current_price_time: str) -> Report:
     trendline_summary = "\n".join(trendline_data["messages"])
 
-    # 🟥 Range Detection
-    range_info = detect_body_range(df, timeframe)
-    range_low = range_info.get("range_low")
-    range_high = range_info.get("range_high")
+    # Detectors read compact float32 bars; the Report carries plain Python floats
+    supports = [float(level) for level in supports]
+    resistances = [float(level) for level in resistances]
+    range_low = _as_float(range_info.get("range_low"))
+    range_high = _as_float(range_info.get("range_high"))
     directional_bias = range_info.get("bias", "neutral")
 
     irz_zone = None
@@ -49,32 +248,22 @@ def run_analysis(symbol_details: dict, timeframe: str = "1h") -> Report:
     manipulations = []
     retracements = []
 
-    fib_data = None
-    if range_info.get("is_range", False):
-        manipulation = detect_manipulation(df, range_info)
-
-        if manipulation["status"] == "manipulated":
-            fib_data = calculate_irz_projection(
-                range_low=range_low,
-                range_high=range_high,
-                manipulation_direction=manipulation["direction"]
-            )
-
-            irz_zone = fib_data.get("irz_zone")
-            irz_message = fib_data.get("message")
-
-            if fib_data:
-                for t in fib_data.get("targets", []):
-                    targets.append(t)
-                for r in fib_data.get("retracements", []):
-                    retracements.append(r)
-
-        if manipulation["status"] != "clean":
-            manipulations.append(ManipulationEvent(
-                direction=manipulation["direction"],
-                price=manipulation["price"],
-                timestamp=manipulation["timestamp"]
-            ))
+    if fib_data is not None:
+        irz_zone = fib_data.get("irz_zone")
+        irz_message = fib_data.get("message")
+
+        if fib_data:
+            for t in fib_data.get("targets", []):
+                targets.append(t)
+            for r in fib_data.get("retracements", []):
+                retracements.append(r)
+
+    if manipulation is not None and manipulation["status"] != "clean":
+        manipulations.append(ManipulationEvent(
+            direction=manipulation["direction"],
+            price=_as_float(manipulation["price"]),
+            timestamp=manipulation["timestamp"]
+        ))
 
     # ✅ Override bias based on IRZ projection
     if fib_data:
@@ -84,18 +273,6 @@ def run_analysis(symbol_details: dict, timeframe: str = "1h") -> Report:
         elif direction == "down":
             directional_bias = "bearish"
 
-    # 🖼️ Chart output
-    chart_path = plot_full_analysis(
-        df=df,
-        symbol=input_symbol,
-        timeframe=timeframe,
-        support_levels=supports,
-        resistance_levels=resistances,
-        trendlines=trendline_vectors,
-        fib_data=fib_data,
-        range_data=range_info
-    )
-
     return Report(
         symbol=input_symbol,
         timeframe=timeframe,
@@ -111,6 +288,6 @@ def run_analysis(symbol_details: dict, timeframe: str = "1h") -> Report:
         targets=targets,
         manipulations=manipulations,
         retracements=retracements,
-        current_price=current_price,  # ✅ added
+        current_price=_as_float(current_price),  # ✅ added
         current_price_time=current_price_time  # ✅ added
     )
@@ -0,0 +1,210 @@
+import time
+import numpy as np
+import pandas as pd
+
+from config.settings import BACKTEST_HORIZON_BARS
+from core.features import FeatureStore
+from core.range_detector import detect_consolidation_history
+from core.manipulation_detector import _breakout_events, MANIPULATION_LOOKBACK
+from core.irz_fib import calculate_irz_projection
+from core.streaming_analyzer import _RunningMax
+from core.detector_params import DEFAULT_PARAMS, load_detector_params
+
+LEVEL_COLUMNS = [
+    "signal_time", "event_time", "direction", "signal_close", "range_low", "range_high",
+    "kind", "label", "level", "hit", "bars_to_hit", "hit_time",
+]
+
+
+def walk_forward_signals(df: pd.DataFrame, features: FeatureStore = None, window: int = DEFAULT_PARAMS["range"]["window"],
+                         atr_multiplier: float = 1.25, tolerance_pct: float = 0.015, min_bounces: int = 1) -> list:
+    """
+    Replays `df` bar by bar and returns the IRZ projections a live run would
+    have shown, one per manipulation event, at the first bar it was reported.
+
+    At each bar the range (last `window` bars) and the most extreme manipulation
+    over the last 300 closes are what detect_body_range (with these parameters)
+    and detect_manipulation give on the history up to that bar. The range comes
+    from detect_consolidation_history's per-bar arrays; the lookback's extreme
+    closes are carried between bars in monotonic deques, so an event is usually
+    confirmed by a short scan from the extreme close to its return into the range.
+    """
+    if features is None:
+        features = FeatureStore(df)
+    n = len(df)
+    closes = features.column("close").astype(np.float64)
+    nan_closes = np.r_[0, np.cumsum(np.isnan(closes))].tolist()
+    close_values = closes.tolist()  # Python floats for the per-bar scalar work
+
+    # 🟥 Range over the last `window` bars at every bar
+    history = detect_consolidation_history(df, window=window, atr_multiplier=atr_multiplier,
+                                           tolerance_pct=tolerance_pct, min_bounces=min_bounces,
+                                           features=features)
+    is_range = history["is_range"].tolist()
+    range_highs, range_lows = history["range_high"].tolist(), history["range_low"].tolist()
+
+    close_high = _RunningMax(MANIPULATION_LOOKBACK, earliest=True)
+    close_low = _RunningMax(MANIPULATION_LOOKBACK, minimum=True, earliest=True)
+
+    signals = []
+    seen = set()
+    for t in range(n):
+        close_high.push(t, close_values[t])
+        close_low.push(t, close_values[t])
+        if not is_range[t]:
+            continue
+        high, low = range_highs[t], range_lows[t]
+
+        # 🟨 Most extreme breakout-and-return over the lookback
+        begin = max(0, t - MANIPULATION_LOOKBACK + 1)
+        event = None
+        if nan_closes[t + 1] == nan_closes[begin]:
+            event = _extreme_event(closes, t, low, high, close_high, close_low)
+        if event is None:
+            found = _breakout_events(closes[begin:t + 1], low, high)
+            event = False
+            if len(found["direction"]):
+                best = int(np.argmax(found["deviation"]))  # earliest on ties, as most_extreme_event
+                event = (int(found["direction"][best]), begin + int(found["extreme"][best]))
+        if not event or event in seen:
+            continue
+        seen.add(event)
+
+        # 🟪 Freeze the projection the report showed at this bar
+        direction = "up" if event[0] == 1 else "down"
+        fib = calculate_irz_projection(low, high, direction)
+        signals.append({
+            "bar": t,
+            "event_bar": event[1],
+            "direction": direction,
+            "signal_close": close_values[t],
+            "range_low": low,
+            "range_high": high,
+            "levels": [("retracement", r.label, r.level) for r in fib["retracements"]]
+                      + [("target", tg.label, tg.level) for tg in fib["targets"]],
+        })
+
+    # Timestamps in one pass rather than per signal
+    for signal, signal_time, event_time in zip(
+        signals, df.index[[sig["bar"] for sig in signals]], df.index[[sig["event_bar"] for sig in signals]]
+    ):
+        signal["signal_time"], signal["event_time"] = signal_time, event_time
+    return signals
+
+
+def _extreme_event(closes: np.ndarray, t: int, low: float, high: float, close_high, close_low):
+    """
+    The lookback's most extreme event as (direction, position), False when clean,
+    or None when the full search is needed.
+
+    The highest close above the range (the lowest below it) is the extreme of
+    the best event on that side if its run returns inside the range. A run that
+    flips to the other side or is still outside at the last bar falls back.
+    """
+    candidates = []
+    for direction, tracker in ((1, close_high), (-1, close_low)):
+        position, extreme = tracker.position(), tracker.value()
+        if not (extreme > high if direction == 1 else extreme < low):
+            continue
+        if position == t:
+            return None
+        after = closes[position + 1:t + 1]
+        back = (after <= high) if direction == 1 else (after >= low)
+        j = int(back.argmax())
+        if not back[j] or not (low <= after[j] <= high):
+            return None
+        deviation = extreme - high if direction == 1 else low - extreme
+        candidates.append((-deviation, position, direction))
+    if not candidates:
+        return False
+    _, position, direction = min(candidates)
+    return direction, position
+
+
+def score_signals(df: pd.DataFrame, signals: list, horizon: int = BACKTEST_HORIZON_BARS) -> pd.DataFrame:
+    """
+    One row per (signal, level): whether price reached the level within
+    `horizon` bars after the signal bar, and how many bars it took.
+
+    Levels above the signal close are hit by a later high at or above them,
+    levels below by a later low at or below them.
+    """
+    highs = df["high"].to_numpy(dtype=np.float64)
+    lows = df["low"].to_numpy(dtype=np.float64)
+    columns = {name: [] for name in LEVEL_COLUMNS if name != "hit_time"}
+    hit_bars = []
+    for signal in signals:
+        t = signal["bar"]
+        reach_up = np.fmax.accumulate(highs[t + 1:t + 1 + horizon])
+        reach_down = -np.fmin.accumulate(lows[t + 1:t + 1 + horizon])
+
+        for kind, label, level in signal["levels"]:
+            above = level > signal["signal_close"]
+            reach = reach_up if above else reach_down
+            k = int(np.searchsorted(reach, level if above else -level, side="left"))
+            hit = k < len(reach)
+            for name in ("signal_time", "event_time", "direction", "signal_close", "range_low", "range_high"):
+                columns[name].append(signal[name])
+            columns["kind"].append(kind)
+            columns["label"].append(label)
+            columns["level"].append(level)
+            columns["hit"].append(hit)
+            columns["bars_to_hit"].append(k + 1 if hit else np.nan)
+            hit_bars.append(t + 1 + k if hit else -1)
+
+    hit_bars = np.asarray(hit_bars, dtype=np.int64)
+    columns["hit_time"] = pd.Series(df.index[np.maximum(hit_bars, 0)]).where(hit_bars >= 0, pd.NaT) \
+        if len(hit_bars) else []
+    return pd.DataFrame(columns, columns=LEVEL_COLUMNS)
+
+
+def summarize_levels(levels: pd.DataFrame) -> pd.DataFrame:
+    """
+    Hit rate and bars-to-hit per IRZ level, in report order.
+    """
+    if levels.empty:
+        return pd.DataFrame(columns=["kind", "label", "signals", "hits", "hit_rate", "median_bars", "mean_bars"])
+    grouped = levels.groupby(["kind", "label"], sort=False)
+    summary = grouped.agg(
+        signals=("hit", "size"),
+        hits=("hit", "sum"),
+        hit_rate=("hit", "mean"),
+        median_bars=("bars_to_hit", "median"),
+        mean_bars=("bars_to_hit", "mean"),
+    )
+    return summary.reset_index()
+
+
+def run_backtest(df: pd.DataFrame, horizon: int = BACKTEST_HORIZON_BARS, range_params: dict = None) -> dict:
+    """
+    Walk-forward IRZ backtest of one bar series; `range_params` overrides the
+    detect_body_range parameters (window, atr_multiplier, tolerance_pct, min_bounces).
+    Returns {"signals": count, "levels": per-level rows, "summary": per-level stats, "bars", "elapsed"}.
+    """
+    started = time.perf_counter()
+    signals = walk_forward_signals(df, **(range_params or {}))
+    levels = score_signals(df, signals, horizon=horizon)
+    return {
+        "bars": len(df),
+        "signals": len(signals),
+        "levels": levels,
+        "summary": summarize_levels(levels),
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+def backtest_symbol(symbol_details: dict, timeframe: str, lookback_days: int,
+                    horizon: int = BACKTEST_HORIZON_BARS, source=None, end_time=None,
+                    range_params: dict = None) -> dict:
+    """
+    Fetches `lookback_days` of `timeframe` bars and backtests them with
+    `range_params`, by default the symbol's tuned range parameters.
+    """
+    if range_params is None:
+        range_params = load_detector_params(symbol_details, timeframe).get("range", {})
+    from data.databento_client import fetch_ohlcv
+
+    df = fetch_ohlcv(symbol_details, timeframe, lookback_days=lookback_days, source=source, end_time=end_time)
+    if df is None or df.empty:
+        raise ValueError(f"No data for {symbol_details.get('db_symbol')} on {timeframe}")
+    return run_backtest(df, horizon=horizon, range_params=range_params)
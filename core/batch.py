@@ -0,0 +1,111 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from config.settings import BATCH_MAX_WORKERS
+
+
+def read_watchlist(path: str, default_timeframes: list = None) -> list:
+    """
+    Parses a watchlist file into [(symbol, [timeframes]), ...].
+
+    One symbol per line, optionally followed by its own comma-separated
+    timeframes (`ES 15min,1h`); lines without them use `default_timeframes`.
+    Blank lines and `#` comments are skipped; repeated symbols are merged.
+    """
+    jobs = {}
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            parts = line.replace(",", " ").split()
+            symbol, timeframes = parts[0].upper(), parts[1:] or list(default_timeframes or [])
+            if not timeframes:
+                raise ValueError(f"{path}:{line_no}: no timeframes for {symbol} and no default given")
+            merged = jobs.setdefault(symbol, [])
+            merged.extend(tf for tf in timeframes if tf not in merged)
+    return list(jobs.items())
+
+
+def run_batch_job(symbol_input: str, timeframes: list, render_chart: bool = True) -> dict:
+    """
+    One grid row: every timeframe of one symbol from a single fetch.
+    Runs in a worker process and never raises; failures come back in "error",
+    or per timeframe in "errors" when only some timeframes failed.
+    """
+    from core.analyzer import run_multi_timeframe_analysis
+    from utils.symbols import resolve_symbol_alias
+
+    started = time.perf_counter()
+    result = {"symbol": symbol_input, "timeframes": timeframes, "reports": {}, "errors": {}, "error": None,
+              "pid": os.getpid()}
+    try:
+        symbol_details = resolve_symbol_alias(symbol_input)
+        reports = run_multi_timeframe_analysis(symbol_details, timeframes, render_chart=render_chart)
+        for tf, report in reports.items():
+            if isinstance(report, Exception):
+                result["errors"][tf] = f"{type(report).__name__}: {report}"
+            else:
+                result["reports"][tf] = report
+        if not result["reports"] and result["errors"]:
+            result["error"] = "; ".join(f"{tf}: {error}" for tf, error in result["errors"].items())
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed"] = time.perf_counter() - started
+    return result
+
+
+def _pool_context():
+    # Workers start clean instead of inheriting the parent's threads and open clients.
+    # A fork server imports the analysis stack once and forks each worker from it.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["core.analyzer"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def run_batch(jobs: list, max_workers: int = BATCH_MAX_WORKERS, render_chart: bool = True,
+              on_result=None) -> dict:
+    """
+    Fans [(symbol, [timeframes]), ...] out over a process pool of `max_workers`.
+
+    `on_result(result)` is called in the parent as each job finishes (see
+    run_batch_job for the result dict). A failed job never stops the batch.
+    Returns a summary with the results in completion order and throughput figures.
+    """
+    started = time.perf_counter()
+    results = []
+    workers = max(1, min(max_workers, len(jobs) or 1))
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+        futures = {
+            pool.submit(run_batch_job, symbol, timeframes, render_chart): (symbol, timeframes)
+            for symbol, timeframes in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. killed or unpicklable result)
+                symbol, timeframes = futures[future]
+                result = {"symbol": symbol, "timeframes": timeframes, "reports": {}, "errors": {},
+                          "error": f"{type(e).__name__}: {e}", "pid": None, "elapsed": 0.0}
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+    elapsed = time.perf_counter() - started
+    reports = sum(len(r["reports"]) for r in results)
+    return {
+        "jobs": len(results),
+        "failed": [r for r in results if r["error"]],
+        "reports": reports,
+        "workers": workers,
+        "elapsed": elapsed,
+        "reports_per_min": reports / elapsed * 60 if elapsed > 0 else 0.0,
+        "job_seconds": sum(r["elapsed"] for r in results),
+        "results": results,
+    }
@@ -0,0 +1,80 @@
+import os
+import json
+import threading
+from datetime import datetime, timezone
+
+from config.settings import TUNED_PARAMS_DIR
+
+# Detector defaults, by the family name used in the tuned-params files
+DEFAULT_PARAMS = {
+    "support_resistance": {"window": 20, "tolerance": 0.002, "min_reversal_atr": 1.5},
+    "range": {"window": 50, "atr_multiplier": 1.25, "tolerance_pct": 0.015, "min_bounces": 1},
+    "trendline": {"r_threshold": 0.7},
+}
+
+_loaded = {}  # path -> (mtime, contents)
+_loaded_lock = threading.Lock()
+
+
+def params_path(symbol_details: dict, root: str = TUNED_PARAMS_DIR) -> str:
+    safe_symbol = symbol_details["db_symbol"].replace("/", "_").replace(" ", "_")
+    return os.path.join(root, symbol_details["dataset"], f"{safe_symbol}.json")
+
+
+def _read(path: str) -> dict:
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    with _loaded_lock:
+        cached = _loaded.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    try:
+        with open(path) as f:
+            contents = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[Warning] Ignoring unreadable detector params {path}: {e}")
+        contents = {}
+    with _loaded_lock:
+        _loaded[path] = (mtime, contents)
+    return contents
+
+
+def load_detector_params(symbol_details: dict, timeframe: str, root: str = TUNED_PARAMS_DIR) -> dict:
+    """
+    Tuned {family: {param: value}} for this symbol and timeframe, or {} when
+    it was never swept. Families and parameters not listed keep the detector defaults.
+    """
+    if not symbol_details.get("db_symbol") or not symbol_details.get("dataset"):
+        return {}
+    entry = _read(params_path(symbol_details, root)).get("timeframes", {}).get(timeframe, {})
+    return {family: dict(entry[family]) for family in DEFAULT_PARAMS if entry.get(family)}
+
+
+def save_detector_params(symbol_details: dict, timeframe: str, params: dict, scores: dict = None,
+                         root: str = TUNED_PARAMS_DIR) -> str:
+    """
+    Stores tuned params for one timeframe, keeping the symbol's other timeframes.
+    Returns the file path.
+    """
+    path = params_path(symbol_details, root)
+    contents = dict(_read(path))
+    timeframes = dict(contents.get("timeframes", {}))
+    timeframes[timeframe] = {family: dict(values) for family, values in params.items() if values}
+    contents.update({
+        "db_symbol": symbol_details["db_symbol"],
+        "dataset": symbol_details["dataset"],
+        "timeframes": timeframes,
+    })
+    if scores is not None:
+        contents.setdefault("scores", {})
+        contents["scores"] = {**contents["scores"], timeframe: scores}
+    contents["updated"] = datetime.now(timezone.utc).isoformat()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(contents, f, indent=1, sort_keys=True, default=float)
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,173 @@
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _windows(values: np.ndarray, window: int):
+    return sliding_window_view(values, window) if len(values) >= window else None
+
+
+def _trailing(values: np.ndarray, window: int, reduce) -> np.ndarray:
+    # out[i] reduces bars i - window + 1 .. i; each window is reduced on its own,
+    # so a value never depends on where the series was cut
+    out = np.full(len(values), np.nan, dtype=np.result_type(values.dtype, np.float32))
+    windows = _windows(values, window)
+    if windows is not None:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            out[window - 1:] = reduce(windows, axis=1)
+    return out
+
+
+def _trailing_extreme(values: np.ndarray, window: int, maximum: bool) -> np.ndarray:
+    # _trailing with nanmax/nanmin in O(n) for any window (van Herk / Gil-Werman):
+    # within blocks of `window` bars keep running extremes from each block's start
+    # and from its end; a window spans at most two blocks, so it is one of each
+    out = np.full(len(values), np.nan, dtype=np.result_type(values.dtype, np.float32))
+    if len(values) < window:
+        return out
+    pick = np.fmax if maximum else np.fmin
+    padded = np.full(-(-len(values) // window) * window, np.nan, dtype=out.dtype)
+    padded[:len(values)] = values
+    blocks = padded.reshape(-1, window)
+    from_start = pick.accumulate(blocks, axis=1).ravel()
+    from_end = pick.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    out[window - 1:] = pick(from_end[:len(values) - window + 1], from_start[window - 1:len(values)])
+    return out
+
+
+def _centered(values: np.ndarray, window: int, reduce) -> np.ndarray:
+    # out[i] reduces bars i - window .. i + window; NaN where either side is incomplete
+    out = np.full(len(values), np.nan, dtype=np.result_type(values.dtype, np.float32))
+    windows = _windows(values, 2 * window + 1)
+    if windows is not None:
+        out[window:len(values) - window] = reduce(windows, axis=1)
+    return out
+
+
+class FeatureStore:
+    """
+    Per-bar features of one bar series, computed on first use and memoized so
+    every detector in an analysis reads the same arrays.
+
+    Each feature knows how many earlier bars it reads and how many later bars
+    can still change it. `append` keeps every cached value the new bars cannot
+    affect; the stale tail is recomputed on next use.
+
+    Detector stages may read one store from several threads; each feature is
+    computed once while others wait for it. Appends must not overlap reads.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._cache = {}  # key -> [values, valid_bars, lookahead]
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def __len__(self):
+        return len(self.df)
+
+    def append(self, bars: pd.DataFrame):
+        """
+        Adds newer bars and invalidates only the cached tails they affect.
+        """
+        if bars is None or bars.empty:
+            return
+        n_old = len(self.df)
+        self.df = pd.concat([self.df, bars])
+        for entry in self._cache.values():
+            entry[1] = max(0, min(entry[1], n_old - entry[2]))
+
+    def _memo(self, key, lookback: int, lookahead: int, compute) -> np.ndarray:
+        # compute(begin) returns the feature for bars begin..n-1
+        n = len(self.df)
+        entry = self._cache.get(key)
+        if entry is not None and entry[1] >= n:
+            return entry[0]
+
+        with self._locks_guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[1] >= n:
+                return entry[0]
+
+            valid = 0 if entry is None else entry[1]
+            begin = max(0, valid - lookback)
+            fresh = compute(begin)[valid - begin:]
+            values = fresh if valid == 0 else np.concatenate([entry[0][:valid], fresh])
+            self._cache[key] = [values, n, lookahead]
+            return values
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Raw bar column, or one of the derived series below by name.
+        """
+        derived = {
+            "range": self.bar_range,
+            "true_range": self.true_range,
+            "body_high": self.body_high,
+            "body_low": self.body_low,
+        }
+        if name in derived:
+            return derived[name]()
+        return self._memo(("column", name), 0, 0, lambda begin: self.df[name].to_numpy()[begin:])
+
+    # 🕯️ Per-bar series (native dtype, so compact float32 bars compare exactly)
+    def bar_range(self) -> np.ndarray:
+        return self._memo(("range",), 0, 0, lambda begin: self.column("high")[begin:] - self.column("low")[begin:])
+
+    def body_high(self) -> np.ndarray:
+        return self._memo(("body_high",), 0, 0,
+                          lambda begin: np.fmax(self.column("open")[begin:], self.column("close")[begin:]))
+
+    def body_low(self) -> np.ndarray:
+        return self._memo(("body_low",), 0, 0,
+                          lambda begin: np.fmin(self.column("open")[begin:], self.column("close")[begin:]))
+
+    def true_range(self) -> np.ndarray:
+        """
+        max(high - low, |high - prev close|, |low - prev close|); the first bar uses high - low.
+        """
+        def compute(begin):
+            high = self.column("high")[begin:]
+            low = self.column("low")[begin:]
+            prev_close = np.r_[np.nan, self.column("close")[begin:-1]] if begin == 0 \
+                else self.column("close")[begin - 1:-1]
+            return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        return self._memo(("true_range",), 1, 0, compute)
+
+    # 📏 Rolling features
+    def rolling_mean(self, name: str, window: int, skipna: bool = False) -> np.ndarray:
+        """
+        Trailing mean in float64, NaN until `window` bars are available. Like
+        pandas' rolling().mean(), a NaN bar makes its windows NaN; with `skipna`
+        each window averages its non-NaN bars instead, like Series.mean.
+        """
+        reduce = np.nanmean if skipna else np.mean
+        return self._memo(("rolling_mean", name, window, skipna), window - 1, 0,
+                          lambda begin: _trailing(self.column(name)[begin:].astype(np.float64), window, reduce))
+
+    def rolling_max(self, name: str, window: int) -> np.ndarray:
+        return self._memo(("rolling_max", name, window), window - 1, 0,
+                          lambda begin: _trailing_extreme(self.column(name)[begin:], window, maximum=True))
+
+    def rolling_min(self, name: str, window: int) -> np.ndarray:
+        return self._memo(("rolling_min", name, window), window - 1, 0,
+                          lambda begin: _trailing_extreme(self.column(name)[begin:], window, maximum=False))
+
+    def centered_max(self, name: str, window: int) -> np.ndarray:
+        return self._memo(("centered_max", name, window), window, window,
+                          lambda begin: _centered(self.column(name)[begin:], window, np.max))
+
+    def centered_min(self, name: str, window: int) -> np.ndarray:
+        return self._memo(("centered_min", name, window), window, window,
+                          lambda begin: _centered(self.column(name)[begin:], window, np.min))
+
+    def atr(self, period: int = 14) -> np.ndarray:
+        """
+        Rolling mean of high - low, the ATR the support/resistance filter uses.
+        """
+        return self.rolling_mean("range", period)
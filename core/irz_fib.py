@@ -1,3 +1,4 @@
+import numpy as np
 from core.report_types import Retracement, Target
 
 def calculate_irz_projection(range_low, range_high, manipulation_direction):
@@ -92,3 +93,25 @@ Profit Targets → {target_values[0]} / {target_values[1]} / {target_values[2]}"
             "projection_direction": None,
             "full_levels": {}
         }
+
+
+def irz_zone_bounds(range_low, range_high, manipulation_direction):
+    """
+    Vectorized retracement zone (0.618 to 0.786) of calculate_irz_projection.
+    `manipulation_direction` is +1 (up), -1 (down) or 0; zones without a
+    direction are NaN. Returns (zone_low, zone_high) arrays.
+    """
+    range_low = np.asarray(range_low, dtype=np.float64)
+    range_high = np.asarray(range_high, dtype=np.float64)
+    direction = np.asarray(manipulation_direction)
+
+    # Projected against the manipulation: a down move anchors at the range high
+    fib_start = np.where(direction < 0, range_high, range_low)
+    diff = np.where(direction < 0, range_low - range_high, range_high - range_low)
+    level_618 = np.round(fib_start + diff * 0.618, 2)
+    level_786 = np.round(fib_start + diff * 0.786, 2)
+
+    valid = direction != 0
+    zone_low = np.where(valid, np.minimum(level_618, level_786), np.nan)
+    zone_high = np.where(valid, np.maximum(level_618, level_786), np.nan)
+    return zone_low, zone_high
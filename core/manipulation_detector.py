@@ -1,6 +1,162 @@
 import pandas as pd
 import numpy as np
 
+MANIPULATION_LOOKBACK = 300
+
+
+def _close_array(df: pd.DataFrame):
+    # Column names are matched case-insensitively, as before
+    for col in df.columns:
+        if str(col).lower() == "close":
+            return df[col].to_numpy(dtype=np.float64)
+    return None
+
+
+def _breakout_events(closes: np.ndarray, range_low, range_high, rows: np.ndarray = None) -> dict:
+    """
+    Finds every breakout-and-return on a close array without a per-row loop.
+
+    Closes are labelled above (+1), below (-1) or inside (0) the range and split
+    into runs of equal labels. An outside run is an event when the next run is
+    back inside; a run that flips straight to the other side starts a new
+    sequence instead. NaN closes are skipped and never end a run.
+
+    `rows` optionally labels several series laid end to end (e.g. a scanner's
+    stacked symbols): runs never cross a row change, and range_low/range_high
+    may then be per-close arrays.
+    Returns arrays of positions into `closes`, one entry per event.
+    """
+    positions = np.flatnonzero(~np.isnan(closes))
+    c = closes[positions]
+    low = range_low[positions] if np.ndim(range_low) else range_low
+    high = range_high[positions] if np.ndim(range_high) else range_high
+    empty = np.array([], dtype=np.int64)
+    if len(c) == 0:
+        return {"direction": empty, "start": empty, "extreme": empty, "end": empty,
+                "price": c, "deviation": c, "row": empty}
+
+    state = np.where(c > high, 1, np.where(c < low, -1, 0))
+    breaks = state[1:] != state[:-1]
+    row = rows[positions] if rows is not None else np.zeros(len(c), dtype=np.int64)
+    new_row = row[1:] != row[:-1]
+    starts = np.flatnonzero(np.r_[True, breaks | new_row])
+    lengths = np.diff(np.r_[starts, len(c)])
+    run_state = state[starts]
+    run_row = row[starts]
+
+    # Deviation beyond the breached boundary; the first bar reaching a run's maximum is its extreme
+    deviation = np.where(state == 1, c - high, low - c)
+    run_max = np.maximum.reduceat(deviation, starts)
+    run_id = np.repeat(np.arange(len(starts)), lengths)
+    hits = np.flatnonzero(deviation == run_max[run_id])
+    hit_runs, first = np.unique(run_id[hits], return_index=True)
+    first_hit = starts.copy()  # runs against a NaN range have no hit and are never events
+    first_hit[hit_runs] = hits[first]
+
+    is_event = np.zeros(len(starts), dtype=bool)
+    is_event[:-1] = (run_state[:-1] != 0) & (run_state[1:] == 0) & (run_row[:-1] == run_row[1:])
+    events = np.flatnonzero(is_event)
+
+    return {
+        "direction": run_state[events],
+        "start": positions[starts[events]],
+        "extreme": positions[first_hit[events]],
+        "end": positions[starts[events + 1]],
+        "price": c[first_hit[events]],
+        "deviation": run_max[events],
+        "row": run_row[events],
+    }
+
+
+def detect_manipulation_events(df: pd.DataFrame, range_info: dict, lookback: int = None) -> list:
+    """
+    Returns every breakout-and-return event against the range, oldest first,
+    over the whole frame (or its last `lookback` candles).
+
+    Each event: direction ("up"/"down"), price (most extreme close), deviation
+    (distance beyond the boundary), start (first close outside), extreme
+    (timestamp of the most extreme close) and end (first close back inside).
+    """
+    if df is None or df.empty:
+        return []
+    if lookback is not None:
+        df = df.tail(lookback)
+
+    closes = _close_array(df)
+    range_low = range_info.get("range_low")
+    range_high = range_info.get("range_high")
+    if closes is None or range_low is None or range_high is None or pd.isna(range_low) or pd.isna(range_high):
+        return []
+
+    return events_from_closes(closes, df.index, range_low, range_high)
+
+
+def events_from_closes(closes: np.ndarray, index, range_low: float, range_high: float) -> list:
+    """
+    Same as detect_manipulation_events for a float64 close array and its timestamps.
+    """
+    found = _breakout_events(closes, range_low, range_high)
+    return [
+        {
+            "direction": "up" if direction == 1 else "down",
+            "price": price,
+            "deviation": deviation,
+            "start": index[start],
+            "extreme": index[extreme],
+            "end": index[end],
+        }
+        for direction, price, deviation, start, extreme, end in zip(
+            found["direction"], found["price"], found["deviation"],
+            found["start"], found["extreme"], found["end"]
+        )
+    ]
+
+
+def most_extreme_event(events: list):
+    """
+    The event whose extreme close went furthest beyond the range (earliest on ties), or None.
+    """
+    if not events:
+        return None
+    return max(events, key=lambda event: event["deviation"])
+
+
+def stacked_manipulation(closes: np.ndarray, range_low: np.ndarray, range_high: np.ndarray) -> dict:
+    """
+    Most extreme breakout-and-return per row of a 2D close array (one symbol per
+    row, NaN-padded), against per-row ranges; a NaN range finds nothing.
+    Returns per-row arrays; direction is +1/-1, or 0 with -1 positions when clean.
+    """
+    n_rows, width = closes.shape
+    found = _breakout_events(
+        np.asarray(closes, dtype=np.float64).ravel(),
+        np.repeat(np.asarray(range_low, dtype=np.float64), width),
+        np.repeat(np.asarray(range_high, dtype=np.float64), width),
+        rows=np.repeat(np.arange(n_rows), width),
+    )
+
+    result = {
+        "direction": np.zeros(n_rows, dtype=np.int64),
+        "price": np.full(n_rows, np.nan),
+        "deviation": np.full(n_rows, np.nan),
+        "extreme": np.full(n_rows, -1, dtype=np.int64),
+        "end": np.full(n_rows, -1, dtype=np.int64),
+    }
+    if len(found["row"]) == 0:
+        return result
+
+    # Largest deviation per row, earliest event on ties (as most_extreme_event)
+    order = np.lexsort((np.arange(len(found["row"])), -found["deviation"], found["row"]))
+    best = order[np.unique(found["row"][order], return_index=True)[1]]
+    rows = found["row"][best]
+    result["direction"][rows] = found["direction"][best]
+    result["price"][rows] = found["price"][best]
+    result["deviation"][rows] = found["deviation"][best]
+    result["extreme"][rows] = found["extreme"][best] % width
+    result["end"][rows] = found["end"][best] % width
+    return result
+
+
 def detect_manipulation(df: pd.DataFrame, range_info: dict) -> dict:
     """
     Detects the single most extreme manipulation event over the last 300 candles.
@@ -14,10 +170,9 @@ def detect_manipulation(df: pd.DataFrame, range_info: dict) -> dict:
             "timestamp": None, "price": None
         }
 
-    df_proc = df.copy().tail(300) # Process the last 300 candles as per user requirement
-    df_proc.columns = [str(col).lower() for col in df_proc.columns]
+    df_proc = df.tail(MANIPULATION_LOOKBACK) # Process the last 300 candles as per user requirement
 
-    if not all(col in df_proc.columns for col in ['close']):
+    if _close_array(df_proc) is None:
         return {
             "manipulated": False, "returned_to_range": False, "direction": None,
             "status": "error", "message": "DataFrame missing required 'close' column.",
@@ -32,93 +187,24 @@ def detect_manipulation(df: pd.DataFrame, range_info: dict) -> dict:
             "timestamp": None, "price": None
         }
 
-    range_low = range_info["range_low"]
-    range_high = range_info["range_high"]
-
-    overall_most_extreme_candle_details = None
-    overall_max_deviation = 0.0
-
-    in_breakout_sequence = False
-    current_sequence_direction = None
-    current_sequence_extreme_candle_timestamp = None
-    current_sequence_extreme_candle_close = None
-    current_sequence_max_deviation = 0.0
-
-    for timestamp, candle_row in df_proc.iterrows():
-        close_price = candle_row["close"]
-
-        if not in_breakout_sequence:
-            if close_price > range_high:
-                in_breakout_sequence = True
-                current_sequence_direction = "up"
-                current_sequence_max_deviation = close_price - range_high
-                current_sequence_extreme_candle_timestamp = timestamp
-                current_sequence_extreme_candle_close = close_price
-            elif close_price < range_low:
-                in_breakout_sequence = True
-                current_sequence_direction = "down"
-                current_sequence_max_deviation = range_low - close_price
-                current_sequence_extreme_candle_timestamp = timestamp
-                current_sequence_extreme_candle_close = close_price
-        else:  # We are in a breakout sequence
-            if current_sequence_direction == "up":
-                if close_price > range_high:  # Still outside (above)
-                    deviation = close_price - range_high
-                    if deviation > current_sequence_max_deviation:
-                        current_sequence_max_deviation = deviation
-                        current_sequence_extreme_candle_timestamp = timestamp
-                        current_sequence_extreme_candle_close = close_price
-                elif close_price < range_low:  # Crossed down through the range, new breakout sequence
-                    # UP sequence ended without returning *inside*. Start new DOWN sequence.
-                    in_breakout_sequence = True # Remains true, but for a new sequence
-                    current_sequence_direction = "down"
-                    current_sequence_max_deviation = range_low - close_price
-                    current_sequence_extreme_candle_timestamp = timestamp
-                    current_sequence_extreme_candle_close = close_price
-                elif range_low <= close_price <= range_high:  # Returned to inside the range
-                    if current_sequence_max_deviation > overall_max_deviation:
-                        overall_max_deviation = current_sequence_max_deviation
-                        overall_most_extreme_candle_details = {
-                            "timestamp": current_sequence_extreme_candle_timestamp,
-                            "price": current_sequence_extreme_candle_close,
-                            "direction": "up"
-                        }
-                    in_breakout_sequence = False # Reset for next potential breakout
-                # else: price is still outside but not more extreme, or within range but not a full return (e.g. on boundary)
-
-            elif current_sequence_direction == "down":
-                if close_price < range_low:  # Still outside (below)
-                    deviation = range_low - close_price
-                    if deviation > current_sequence_max_deviation:
-                        current_sequence_max_deviation = deviation
-                        current_sequence_extreme_candle_timestamp = timestamp
-                        current_sequence_extreme_candle_close = close_price
-                elif close_price > range_high:  # Crossed up through the range, new breakout sequence
-                    # DOWN sequence ended without returning *inside*. Start new UP sequence.
-                    in_breakout_sequence = True # Remains true, but for a new sequence
-                    current_sequence_direction = "up"
-                    current_sequence_max_deviation = close_price - range_high
-                    current_sequence_extreme_candle_timestamp = timestamp
-                    current_sequence_extreme_candle_close = close_price
-                elif range_low <= close_price <= range_high:  # Returned to inside the range
-                    if current_sequence_max_deviation > overall_max_deviation:
-                        overall_max_deviation = current_sequence_max_deviation
-                        overall_most_extreme_candle_details = {
-                            "timestamp": current_sequence_extreme_candle_timestamp,
-                            "price": current_sequence_extreme_candle_close,
-                            "direction": "down"
-                        }
-                    in_breakout_sequence = False # Reset for next potential breakout
-    
-    if overall_most_extreme_candle_details:
+    return summarize_manipulation(detect_manipulation_events(df_proc, range_info))
+
+
+def summarize_manipulation(events: list) -> dict:
+    """
+    Builds detect_manipulation's result from the events of its lookback window.
+    """
+    extreme = most_extreme_event(events)
+
+    if extreme:
         return {
             "manipulated": True,
-            "returned_to_range": True, 
-            "direction": overall_most_extreme_candle_details["direction"],
+            "returned_to_range": True,
+            "direction": extreme["direction"],
             "status": "manipulated",
-            "message": f"🟨 Manipulation detected. Most extreme close ({overall_most_extreme_candle_details['price']:.2f}) occurred during a breakout {overall_most_extreme_candle_details['direction']}.",
-            "timestamp": pd.to_datetime(overall_most_extreme_candle_details["timestamp"]),
-            "price": overall_most_extreme_candle_details["price"]
+            "message": f"🟨 Manipulation detected. Most extreme close ({extreme['price']:.2f}) occurred during a breakout {extreme['direction']}.",
+            "timestamp": pd.to_datetime(extreme["extreme"]),
+            "price": extreme["price"]
         }
     else:
         return {
@@ -130,4 +216,3 @@ def detect_manipulation(df: pd.DataFrame, range_info: dict) -> dict:
             "timestamp": None,
             "price": None
         }
-
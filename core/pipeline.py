@@ -0,0 +1,71 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from config.settings import ANALYSIS_THREADS
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_stage_pool():
+    """
+    Shared thread pool for analysis stages, or None when ANALYSIS_THREADS <= 1.
+    """
+    global _pool
+    if ANALYSIS_THREADS <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=ANALYSIS_THREADS, thread_name_prefix="kawaii-stage")
+        return _pool
+
+
+def _check_graph(stages: dict):
+    for name, (deps, _) in stages.items():
+        missing = [d for d in deps if d not in stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stage(s): {', '.join(missing)}")
+
+
+def run_stages(stages: dict, executor=None) -> dict:
+    """
+    Runs a dependency graph of stages and returns {name: result}.
+
+    `stages` maps name -> (dependencies, fn); fn is called with its
+    dependencies' results, in the order they are declared. Each stage is
+    submitted to `executor` as soon as its last dependency finishes, so
+    independent stages overlap. Without an executor the stages run inline in
+    dependency order. The first stage error is re-raised.
+    """
+    _check_graph(stages)
+    results = {}
+    pending = dict(stages)
+
+    def ready():
+        return [name for name, (deps, _) in pending.items() if all(d in results for d in deps)]
+
+    def call(name):
+        deps, fn = pending.pop(name)
+        return fn(*(results[d] for d in deps))
+
+    if executor is None:
+        while pending:
+            names = ready()
+            if not names:
+                raise ValueError(f"Stage graph has a cycle among: {', '.join(pending)}")
+            for name in names:
+                results[name] = call(name)
+        return results
+
+    running = {}
+    while pending or running:
+        for name in ready():
+            deps, fn = pending.pop(name)
+            running[executor.submit(fn, *(results[d] for d in deps))] = name
+        if not running:
+            raise ValueError(f"Stage graph has a cycle among: {', '.join(pending)}")
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[running.pop(future)] = future.result()
+    return results
@@ -1,13 +1,16 @@
 import pandas as pd
 import numpy as np
 
+from core.features import FeatureStore
+
 
 def detect_consolidation_hybrid(
     df: pd.DataFrame,
     window: int = 50,
     atr_multiplier: float = 1.25,
     tolerance_pct: float = 0.015,
-    min_bounces: int = 1
+    min_bounces: int = 1,
+    features: FeatureStore = None
 ) -> dict:
     """
     Hybrid consolidation detection:
@@ -23,27 +26,35 @@ def detect_consolidation_hybrid(
             "is_range": False
         }
 
-    recent = df[-window:]
-    high = recent["high"]
-    low = recent["low"]
-    close = recent["close"]
-
-    # ATR
-    tr = pd.concat([
-        high - low,
-        (high - close.shift()).abs(),
-        (low - close.shift()).abs()
-    ], axis=1).max(axis=1)
-    atr = tr.rolling(window).mean().iloc[-1]
-
-    range_high = high.max()
-    range_low = low.min()
+    if features is None:
+        features = FeatureStore(df)
+
+    high = features.column("high")[-window:]
+    low = features.column("low")[-window:]
+
+    # ATR over the window; its first bar has no previous close inside the window
+    tr = features.true_range()[-window:].astype(np.float64)
+    tr[0] = high[0] - low[0]
+    atr = tr.mean()
+
+    return consolidation_summary(
+        np.nanmax(high), np.nanmin(low), atr, low, high,
+        atr_multiplier=atr_multiplier, tolerance_pct=tolerance_pct, min_bounces=min_bounces
+    )
+
+
+def consolidation_summary(range_high, range_low, atr, lows, highs, atr_multiplier: float = 1.25,
+                          tolerance_pct: float = 0.015, min_bounces: int = 1) -> dict:
+    """
+    Scores a window whose extremes and ATR are already known; shared with the
+    streaming analyzer, which keeps those up to date bar by bar.
+    """
     range_width = range_high - range_low
     tolerance = range_width * tolerance_pct
 
     # Wick-based touch logic
-    low_touches = ((recent["low"] - range_low).abs() <= tolerance).sum()
-    high_touches = ((recent["high"] - range_high).abs() <= tolerance).sum()
+    low_touches = (np.abs(lows - range_low) <= tolerance).sum()
+    high_touches = (np.abs(highs - range_high) <= tolerance).sum()
 
     is_tight = range_width < atr * atr_multiplier
     is_bouncing = low_touches >= min_bounces and high_touches >= min_bounces
@@ -67,14 +78,200 @@ def detect_consolidation_hybrid(
     }
 
 
-def detect_body_range(df: pd.DataFrame, timeframe: str) -> dict:
+def stacked_consolidation(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, atr_multiplier: float = 1.25,
+                          tolerance_pct: float = 0.015, min_bounces: int = 1) -> dict:
+    """
+    detect_consolidation_hybrid for many symbols at once. Each row of the 2D
+    arrays holds one symbol's last `window` bars; rows with missing bars come
+    back with is_range False. Returns per-row arrays.
+    """
+    highs, lows, closes = (np.asarray(a, dtype=np.float64) for a in (highs, lows, closes))
+    complete = ~(np.isnan(highs) | np.isnan(lows) | np.isnan(closes)).any(axis=1)
+
+    # The window's first bar has no previous close, so it counts high - low only
+    tr = highs - lows
+    prev_close = closes[:, :-1]
+    tr[:, 1:] = np.fmax(tr[:, 1:], np.fmax(np.abs(highs[:, 1:] - prev_close), np.abs(lows[:, 1:] - prev_close)))
+
+    with np.errstate(invalid="ignore"):
+        atr = tr.mean(axis=1)
+        range_high = highs.max(axis=1)
+        range_low = lows.min(axis=1)
+        range_width = range_high - range_low
+        tolerance = (range_width * tolerance_pct)[:, None]
+        low_touches = (np.abs(lows - range_low[:, None]) <= tolerance).sum(axis=1)
+        high_touches = (np.abs(highs - range_high[:, None]) <= tolerance).sum(axis=1)
+        is_tight = range_width < atr * atr_multiplier
+
+    is_bouncing = (low_touches >= min_bounces) & (high_touches >= min_bounces)
+    return {
+        "range_low": range_low,
+        "range_high": range_high,
+        "atr": atr,
+        "low_touches": low_touches,
+        "high_touches": high_touches,
+        "is_range": complete & (is_tight | is_bouncing),
+    }
+
+
+def detect_consolidation_history(
+    df: pd.DataFrame,
+    window: int = 50,
+    atr_multiplier: float = 1.25,
+    tolerance_pct: float = 0.015,
+    min_bounces: int = 1,
+    min_bars: int = 10,
+    features: FeatureStore = None
+) -> dict:
+    """
+    detect_consolidation_hybrid evaluated at every bar of the series, each bar
+    scoring its own trailing `window`, plus the consolidation boxes they form.
+
+    Range extrema are O(n) rolling features and the ATR comes from a running
+    true-range sum. Wicks only need counting when min_bounces > 1 (a window's
+    extreme always touches itself); the min_bounces-th lowest low and highest
+    high of each window (_trailing_kth, O(n * min_bounces)) then tell whether
+    enough wicks lie within tolerance.
+
+    A box is a run of range bars that ends at the last one before the range
+    condition fails or a close leaves the previous bar's range; runs shorter
+    than `min_bars` are dropped. Its bounds span from the run's first window
+    (not before the previous box) to its last bar.
+    Returns per-bar arrays (range_low, range_high, atr, is_range; NaN/False
+    until `window` bars) and "boxes", oldest first.
+    """
+    n = 0 if df is None else len(df)
+    result = {
+        "range_low": np.full(n, np.nan),
+        "range_high": np.full(n, np.nan),
+        "atr": np.full(n, np.nan),
+        "is_range": np.zeros(n, dtype=bool),
+        "boxes": [],
+    }
+    if n < window:
+        return result
+
+    if features is None:
+        features = FeatureStore(df)
+    highs = features.column("high").astype(np.float64)
+    lows = features.column("low").astype(np.float64)
+    closes = features.column("close").astype(np.float64)
+    range_high = features.rolling_max("high", window).astype(np.float64)
+    range_low = features.rolling_min("low", window).astype(np.float64)
+
+    # ATR per window; its first bar has no previous close inside the window
+    tr_sum = np.r_[0.0, np.cumsum(np.nan_to_num(features.true_range().astype(np.float64)))]
+    first = np.arange(n - window + 1)
+    atr = np.full(n, np.nan)
+    atr[window - 1:] = (tr_sum[window:] - tr_sum[first + 1] + (highs[first] - lows[first])) / window
+
+    with np.errstate(invalid="ignore"):
+        range_width = range_high - range_low
+        is_range = range_width < atr * atr_multiplier
+        complete = np.isfinite(range_width)
+        if min_bounces <= 1:
+            is_range |= complete
+        else:
+            # min_bounces wicks within tolerance of the low: the min_bounces-th lowest low is
+            tolerance = range_width * tolerance_pct
+            low_touched = _trailing_kth(lows, window, min_bounces, largest=False) <= range_low + tolerance
+            high_touched = _trailing_kth(highs, window, min_bounces, largest=True) >= range_high - tolerance
+            is_range |= complete & low_touched & high_touched
+
+        # 📦 Runs of range bars, cut where a close leaves the previous bar's range
+        breakout = np.zeros(n, dtype=np.int64)
+        breakout[1:] = np.where(closes[1:] > range_high[:-1], 1, np.where(closes[1:] < range_low[:-1], -1, 0))
+    continues = np.zeros(n, dtype=bool)
+    continues[1:] = is_range[1:] & is_range[:-1] & (breakout[1:] == 0)
+    starts = np.flatnonzero(is_range & ~continues)
+    ends = np.flatnonzero(is_range & ~np.r_[continues[1:], False])
+
+    boxes = []
+    previous_end = -1
+    for run_start, end in zip(starts.tolist(), ends.tolist()):
+        if end - run_start + 1 < min_bars:
+            continue
+        start = max(run_start - window + 1, previous_end + 1)
+        box_lows, box_highs = lows[start:end + 1], highs[start:end + 1]
+        low, high = float(np.nanmin(box_lows)), float(np.nanmax(box_highs))
+        tolerance = (high - low) * tolerance_pct
+        exit_direction = breakout[end + 1] if end + 1 < n else 0
+        boxes.append({
+            "start": df.index[start],
+            "end": df.index[end],
+            "start_index": start,
+            "end_index": end,
+            "bars": end - start + 1,
+            "range_low": low,
+            "range_high": high,
+            "low_touches": int((np.abs(box_lows - low) <= tolerance).sum()),
+            "high_touches": int((np.abs(box_highs - high) <= tolerance).sum()),
+            "exit": "up" if exit_direction == 1 else "down" if exit_direction == -1 else None,
+        })
+        previous_end = end
+
+    result.update(range_low=range_low, range_high=range_high, atr=atr, is_range=is_range, boxes=boxes)
+    return result
+
+
+def _trailing_kth(values: np.ndarray, window: int, k: int, largest: bool) -> np.ndarray:
+    """
+    k-th smallest (largest) non-NaN value of each trailing window, +inf (-inf)
+    where the window holds fewer than k values; NaN until `window` bars.
+
+    A window holds at least k values at or below (at or above) a bound exactly
+    when this is within the bound, so it answers "k wick touches" in O(n * k):
+    the block prefix/suffix scheme of _trailing_extreme, each block position
+    carrying its k smallest values (kept sorted, one insertion per bar) instead
+    of one extreme.
+    """
+    n = len(values)
+    out = np.full(n, np.nan)
+    if n < window:
+        return out
+    sign = -1.0 if largest else 1.0
+    if k > window:
+        out[window - 1:] = sign * np.inf
+        return out
+
+    blocks = -(-n // window)
+    padded = np.full(blocks * window, np.inf)
+    padded[:n] = np.where(np.isnan(values), np.inf, sign * values)
+    padded = padded.reshape(blocks, window)
+
+    def running_smallest(columns):
+        # k smallest of each block's bars up to each column, sorted ascending
+        kept = np.full((blocks, k), np.inf)
+        running = np.empty((blocks, window, k))
+        for i in columns:
+            x = padded[:, i:i + 1]
+            kept = np.minimum(kept, np.maximum(np.c_[np.full(blocks, -np.inf), kept[:, :-1]], x))
+            running[:, i] = kept
+        return running.reshape(-1, k)
+
+    from_start = running_smallest(range(window))
+    from_end = running_smallest(range(window - 1, -1, -1))
+
+    # The window ending at t spans bars s..t: the tail of s's block and, unless
+    # s starts a block, the head of t's block
+    t = np.arange(window - 1, n)
+    s = t - window + 1
+    head = np.where((s % window == 0)[:, None], np.inf, from_start[t])
+    merged = np.concatenate([from_end[s], head], axis=1)
+    out[window - 1:] = sign * np.partition(merged, k - 1, axis=1)[:, k - 1]
+    return out
+
+
+def detect_body_range(df: pd.DataFrame, timeframe: str, features: FeatureStore = None, window: int = 50,
+                      atr_multiplier: float = 1.25, tolerance_pct: float = 0.015, min_bounces: int = 1) -> dict:
     """
-    Entry point used by analyzer.py.
+    Entry point used by analyzer.py; the parameters can be tuned per symbol (core/sweep.py).
     """
     return detect_consolidation_hybrid(
         df,
-        window=50,
-        atr_multiplier=1.25,
-        tolerance_pct=0.015,
-        min_bounces=1
+        window=window,
+        atr_multiplier=atr_multiplier,
+        tolerance_pct=tolerance_pct,
+        min_bounces=min_bounces,
+        features=features
     )
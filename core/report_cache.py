@@ -0,0 +1,99 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+from config.settings import REPORT_CACHE_SIZE
+from data.bar_cache import _to_utc
+from data.databento_client import TIMEFRAME_MAP, default_end_time
+
+
+def params_hash(params: dict) -> str:
+    """
+    Stable short hash of the parameters that shape a report.
+    """
+    blob = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode()).hexdigest()[:16]
+
+
+def closed_through(timeframe: str, end_time=None) -> pd.Timestamp:
+    """
+    Label of the `timeframe` bar in progress at `end_time` (default: the live
+    fetch end). Every bar before it is closed, so it only changes when a bar rolls.
+    """
+    end = _to_utc(end_time) if end_time is not None else _to_utc(default_end_time())
+    rule = TIMEFRAME_MAP.get(timeframe, timeframe)
+    try:
+        return pd.Series([0], index=pd.DatetimeIndex([end])).resample(rule).sum().index[0]
+    except ValueError:
+        # Rule this pandas cannot resample by: fall back to the minute, which only costs hits
+        return end.floor("min")
+
+
+def report_key(symbol_details: dict, timeframe: str, params: dict, end_time=None) -> tuple:
+    return (
+        symbol_details["db_symbol"],
+        symbol_details["dataset"],
+        timeframe,
+        closed_through(timeframe, end_time),
+        params_hash(params),
+    )
+
+
+class ReportCache:
+    """
+    Bounded LRU of finished Reports keyed by
+    (db_symbol, dataset, timeframe, bar in progress, parameter hash).
+
+    A newer bar for the same series drops the older entry, so reports expire as
+    soon as the bar rolls. A cached report without a chart (or whose chart file is
+    gone) does not satisfy a request that needs one.
+    """
+
+    def __init__(self, max_entries: int = REPORT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, need_chart: bool = False):
+        with self._lock:
+            report = self._entries.get(key)
+            if report is not None and need_chart and not (report.chart_path and os.path.exists(report.chart_path)):
+                report = None
+            if report is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return report
+
+    def put(self, key: tuple, report):
+        if self.max_entries <= 0:
+            return
+        series, bar = key[:3] + key[4:], key[3]
+        with self._lock:
+            stale = [k for k in self._entries if k[:3] + k[4:] == series and k[3] < bar]
+            for k in stale:
+                del self._entries[k]
+            self._entries[key] = report
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_default_cache = None
+
+
+def get_report_cache() -> ReportCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ReportCache()
+    return _default_cache
@@ -0,0 +1,152 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from config.settings import SCAN_UNIVERSE
+from data.databento_client import fetch_universe_bars
+from core.analyzer import _lookback_days
+from core.range_detector import stacked_consolidation
+from core.manipulation_detector import stacked_manipulation, MANIPULATION_LOOKBACK
+from core.irz_fib import irz_zone_bounds
+from core.detector_params import DEFAULT_PARAMS, load_detector_params
+from utils.symbols import ALL_CME_FUTURES_ROOTS, resolve_symbol_alias
+
+SCAN_COLUMNS = [
+    "symbol", "db_symbol", "last_bar", "close", "range_low", "range_high", "atr", "is_range",
+    "manipulation", "bars_since_return", "irz_low", "irz_high", "irz_distance_atr", "score",
+]
+
+
+def resolve_universe(spec: str = SCAN_UNIVERSE) -> list:
+    """
+    "all" for every CME futures root, a path to a file with one symbol per line,
+    or a comma-separated list.
+    """
+    spec = (spec or "all").strip()
+    if spec.lower() == "all":
+        return list(dict.fromkeys(ALL_CME_FUTURES_ROOTS))
+    if os.path.isfile(spec):
+        with open(spec) as f:
+            symbols = [line.split("#", 1)[0].strip() for line in f]
+    else:
+        symbols = spec.split(",")
+    return list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+
+
+def stack_bars(frames: list, depth: int) -> dict:
+    """
+    Right-aligns the last `depth` bars of each frame into (symbols x depth)
+    arrays, NaN-padded on the left for shorter histories.
+    """
+    stacked = {col: np.full((len(frames), depth), np.nan) for col in ("high", "low", "close")}
+    counts = np.zeros(len(frames), dtype=np.int64)
+    for i, df in enumerate(frames):
+        n = min(len(df), depth)
+        counts[i] = n
+        if n:
+            for col, block in stacked.items():
+                block[i, depth - n:] = df[col].to_numpy()[-n:]
+    stacked["count"] = counts
+    return stacked
+
+
+def scan_frames(frames: dict, symbol_details_list: list, range_params: dict = None) -> pd.DataFrame:
+    """
+    Screens {db_symbol: bars} for active consolidation, fresh manipulation and
+    price near the IRZ retracement zone, all detectors running on stacked arrays.
+    `range_params` ({db_symbol: detect_body_range params}) overrides the range
+    defaults per symbol, as the tuned params do in run_analysis.
+    Returns the ranked table (highest score first); symbols without bars are left out.
+
+    score = is_range + freshness of the manipulation (1 right after the return to
+    the range, 0 at the edge of the lookback) + IRZ proximity (1 / (1 + ATRs away)).
+    """
+    details = [d for d in symbol_details_list if not frames.get(d["db_symbol"], pd.DataFrame()).empty]
+    if not details:
+        return pd.DataFrame(columns=SCAN_COLUMNS)
+    dfs = [frames[d["db_symbol"]] for d in details]
+    range_params = range_params or {}
+    params = [{**DEFAULT_PARAMS["range"], **range_params.get(d["db_symbol"], {})} for d in details]
+
+    depth = min(max(len(df) for df in dfs), MANIPULATION_LOOKBACK)
+    bars = stack_bars(dfs, max(depth, max(p["window"] for p in params)))
+
+    # 🟥 Consolidation over each symbol's last `window` bars, one stacked pass per parameter set
+    ranges = {name: np.full(len(details), np.nan) for name in ("range_low", "range_high", "atr")}
+    is_range = np.zeros(len(details), dtype=bool)
+    groups = {}
+    for i, p in enumerate(params):
+        groups.setdefault(tuple(sorted(p.items())), []).append(i)
+    for group, rows in groups.items():
+        p = dict(group)
+        window = slice(bars["high"].shape[1] - p.pop("window"), None)
+        found = stacked_consolidation(bars["high"][rows, window], bars["low"][rows, window],
+                                      bars["close"][rows, window], **p)
+        for name in ranges:
+            ranges[name][rows] = found[name]
+        is_range[rows] = found["is_range"]
+
+    # 🟨 Manipulation over the lookback, only against active ranges (as the analyzer does)
+    range_low = np.where(is_range, ranges["range_low"], np.nan)
+    range_high = np.where(is_range, ranges["range_high"], np.nan)
+    closes = bars["close"][:, -depth:]
+    manipulation = stacked_manipulation(closes, range_low, range_high)
+    manipulated = manipulation["direction"] != 0
+    bars_since = np.where(manipulated, depth - 1 - manipulation["end"], -1)
+
+    # 🟪 Distance from the last close to the IRZ retracement zone, in ATRs
+    irz_low, irz_high = irz_zone_bounds(range_low, range_high, manipulation["direction"])
+    last_close = closes[:, -1]
+    gap = np.where(last_close < irz_low, irz_low - last_close,
+                   np.where(last_close > irz_high, last_close - irz_high, 0.0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        irz_distance = np.where(manipulated, gap / ranges["atr"], np.nan)
+
+    freshness = np.where(manipulated, 1.0 - bars_since / depth, 0.0)
+    proximity = np.where(manipulated & np.isfinite(irz_distance), 1.0 / (1.0 + irz_distance), 0.0)
+    score = is_range.astype(np.float64) + freshness + proximity
+
+    table = pd.DataFrame({
+        "symbol": [d.get("input_symbol", d["db_symbol"]) for d in details],
+        "db_symbol": [d["db_symbol"] for d in details],
+        "last_bar": [df.index[-1] for df in dfs],
+        "close": last_close,
+        "range_low": ranges["range_low"],
+        "range_high": ranges["range_high"],
+        "atr": ranges["atr"],
+        "is_range": is_range,
+        "manipulation": np.where(manipulation["direction"] > 0, "up",
+                                 np.where(manipulation["direction"] < 0, "down", None)),
+        "bars_since_return": bars_since,
+        "irz_low": irz_low,
+        "irz_high": irz_high,
+        "irz_distance_atr": irz_distance,
+        "score": score,
+    }, columns=SCAN_COLUMNS)
+    return table.sort_values("score", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def scan_universe(symbols: list = None, timeframe: str = "1h", source=None, end_time=None,
+                  top: int = None) -> pd.DataFrame:
+    """
+    Loads closed bars for the whole universe in batched requests (served from
+    the bar cache when warm) and returns scan_frames' ranked table.
+    """
+    started = time.perf_counter()
+    symbols = symbols if symbols is not None else resolve_universe()
+    symbol_details_list = list({d["db_symbol"]: d for d in map(resolve_symbol_alias, symbols)}.values())
+
+    # Same history run_analysis looks at, for the longest-session dataset in the universe
+    lookback_days = max(
+        _lookback_days(timeframe, {"dataset": dataset}, end_time)
+        for dataset in {d["dataset"] for d in symbol_details_list}
+    )
+    frames = fetch_universe_bars(symbol_details_list, timeframe, lookback_days, source=source, end_time=end_time)
+    loaded = time.perf_counter()
+
+    range_params = {d["db_symbol"]: load_detector_params(d, timeframe).get("range", {}) for d in symbol_details_list}
+    table = scan_frames(frames, symbol_details_list, range_params)
+    print(f"[🔭 Scanned {len(table)}/{len(symbol_details_list)} symbols on {timeframe}: "
+          f"load {loaded - started:.1f}s, detectors {time.perf_counter() - loaded:.2f}s]")
+    return table.head(top) if top else table
@@ -0,0 +1,391 @@
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from core.analyzer import build_report
+from core.support_resistance import support_resistance_candidates, cluster_levels
+from core.trendline_detector import describe_trendlines
+from core.range_detector import consolidation_summary
+from core.manipulation_detector import events_from_closes, summarize_manipulation, MANIPULATION_LOOKBACK
+from core.report_types import Report
+from core.detector_params import DEFAULT_PARAMS, load_detector_params
+
+# Fixed detector settings (not tuned per symbol), as in run_analysis
+SR_ATR_PERIOD = 14
+PIVOT_WINDOW = 5
+DEFAULT_MAX_BARS = 500
+
+
+class _Ring:
+    """
+    Fixed-capacity buffer; every value is written twice so the newest k values
+    are always one contiguous slice.
+    """
+
+    def __init__(self, capacity: int, dtype=np.float64, fill=np.nan):
+        self.capacity = capacity
+        self._buf = np.full(2 * capacity, fill, dtype=dtype)
+        self._pos = 0
+        self.count = 0
+
+    def append(self, value):
+        self._buf[self._pos] = value
+        self._buf[self._pos + self.capacity] = value
+        self._pos = (self._pos + 1) % self.capacity
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def tail(self, k: int) -> np.ndarray:
+        k = min(k, len(self))
+        end = self._pos + self.capacity
+        return self._buf[end - k:end]
+
+    def last(self):
+        return self._buf[self._pos + self.capacity - 1]
+
+
+class _RunningMax:
+    """
+    Sliding-window maximum (or minimum) via a monotonic deque of (index, value).
+    With `earliest`, ties keep the first index that reached the extreme.
+    """
+
+    def __init__(self, window: int, minimum: bool = False, earliest: bool = False):
+        self.window = window
+        self.sign = -1.0 if minimum else 1.0
+        self.earliest = earliest
+        self._items = deque()
+
+    def push(self, index: int, value: float):
+        key = self.sign * value
+        if self.earliest:
+            while self._items and self.sign * self._items[-1][1] < key:
+                self._items.pop()
+        else:
+            while self._items and self.sign * self._items[-1][1] <= key:
+                self._items.pop()
+        self._items.append((index, value))
+        while self._items[0][0] <= index - self.window:
+            self._items.popleft()
+
+    def value(self):
+        return self._items[0][1] if self._items else np.nan
+
+    def position(self) -> int:
+        return self._items[0][0] if self._items else -1
+
+
+class _RunningFit:
+    """
+    Least-squares sums over a sliding set of (x, y) points.
+
+    Sums are kept relative to an anchor point for precision and rebuilt when
+    the anchor falls far behind; distinct y values are counted so flat lines
+    are recognized exactly, like the batch fit.
+    """
+
+    REANCHOR_AFTER = 4096
+
+    def __init__(self):
+        self.points = deque()
+        self._y_counts = {}
+        self._reset(0, 0.0)
+
+    def _reset(self, x_anchor: int, y_anchor: float):
+        self.x_anchor, self.y_anchor = x_anchor, y_anchor
+        self.sx = self.sy = self.sxx = self.sxy = self.syy = 0.0
+        for x, y in self.points:
+            self._accumulate(x, y, 1.0)
+
+    def _accumulate(self, x: int, y: float, sign: float):
+        dx = float(x - self.x_anchor)
+        dy = y - self.y_anchor
+        self.sx += sign * dx
+        self.sy += sign * dy
+        self.sxx += sign * dx * dx
+        self.sxy += sign * dx * dy
+        self.syy += sign * dy * dy
+
+    def add(self, x: int, y: float):
+        if not self.points:
+            self._reset(x, y)
+        self.points.append((x, y))
+        self._y_counts[y] = self._y_counts.get(y, 0) + 1
+        self._accumulate(x, y, 1.0)
+
+    def drop_before(self, x_min: int):
+        while self.points and self.points[0][0] < x_min:
+            x, y = self.points.popleft()
+            self._accumulate(x, y, -1.0)
+            self._y_counts[y] -= 1
+            if not self._y_counts[y]:
+                del self._y_counts[y]
+        if self.points and self.points[0][0] - self.x_anchor > self.REANCHOR_AFTER:
+            self._reset(*self.points[0])
+
+    def fit(self):
+        """
+        Returns (slope, intercept at the first point, r_value), matching fit_trendline.
+        """
+        n = len(self.points)
+        first_x = self.points[0][0]
+        if len(self._y_counts) == 1:
+            # Flat pivots: horizontal line with undefined r
+            return 0.0, self.points[0][1], np.nan
+
+        mx, my = self.sx / n, self.sy / n
+        ssxm = self.sxx / n - mx * mx
+        ssxym = self.sxy / n - mx * my
+        ssym = self.syy / n - my * my
+        slope = ssxym / ssxm
+        intercept = (my + self.y_anchor) - slope * (mx + self.x_anchor - first_x)
+        r_value = 0.0 if ssym <= 0.0 else min(1.0, max(-1.0, ssxym / np.sqrt(ssxm * ssym)))
+        return slope, intercept, r_value
+
+
+class StreamingAnalyzer:
+    """
+    Keeps one (symbol, timeframe) analysis current as closed bars arrive.
+
+    Each `update` costs a fixed amount of work: the rolling ATR, this bar's
+    support/resistance candidate, the pivot confirmed five bars back, the
+    running trendline sums and the range extrema are advanced by one bar.
+    `report()` assembles a Report over the last `max_bars` bars, equivalent to
+    analyze_frame on that window with the same detector `params`, without
+    rerunning the detectors. `params` default to the symbol's tuned parameters
+    (load_detector_params) at construction.
+    """
+
+    def __init__(self, symbol_details: dict, timeframe: str, max_bars: int = DEFAULT_MAX_BARS,
+                 params: dict = None):
+        if params is None:
+            params = load_detector_params(symbol_details, timeframe)
+        sr = {**DEFAULT_PARAMS["support_resistance"], **params.get("support_resistance", {})}
+        self.range_params = {**DEFAULT_PARAMS["range"], **params.get("range", {})}
+        self.sr_params = {name: sr[name] for name in ("tolerance", "min_reversal_atr", "min_bounces") if name in sr}
+        self.sr_window = sr["window"]
+        self.range_window = self.range_params.pop("window")
+        self.r_threshold = params.get("trendline", {}).get("r_threshold", DEFAULT_PARAMS["trendline"]["r_threshold"])
+        if max_bars < self.range_window:
+            raise ValueError(f"max_bars must be at least {self.range_window}")
+        self.symbol_details = symbol_details
+        self.timeframe = timeframe
+        self.max_bars = max_bars
+        self._lock = threading.Lock()
+
+        self._ts = _Ring(max_bars, dtype=np.int64, fill=0)
+        self._open = _Ring(max_bars)
+        self._high = _Ring(max_bars)
+        self._low = _Ring(max_bars)
+        self._close = _Ring(max_bars)
+        self._volume = _Ring(max_bars)
+
+        # Support/resistance: rolling high-low ATR and one candidate per bar
+        self._hl = deque(maxlen=SR_ATR_PERIOD)
+        self._hl_sum = 0.0
+        self._support = _Ring(max_bars)
+        self._resistance = _Ring(max_bars)
+
+        # Trendlines: confirmed pivots and their running fits
+        self._pivot_highs = _RunningFit()
+        self._pivot_lows = _RunningFit()
+
+        # Range: window extrema and true-range sum
+        self._range_high = _RunningMax(self.range_window)
+        self._range_low = _RunningMax(self.range_window, minimum=True)
+        self._tr = _Ring(max_bars)
+        self._tr_sum = 0.0
+
+    @property
+    def count(self) -> int:
+        return self._close.count
+
+    def _frame_start(self) -> int:
+        return self.count - len(self._close)
+
+    def update(self, ts, open_: float, high: float, low: float, close: float, volume: float):
+        """
+        Ingests one closed bar.
+        """
+        with self._lock:
+            prev_close = self._close.last() if self.count else np.nan
+            index = self.count
+
+            self._ts.append(pd.Timestamp(ts).value)
+            self._open.append(open_)
+            self._high.append(high)
+            self._low.append(low)
+            self._close.append(close)
+            self._volume.append(volume)
+
+            self._update_support_resistance(index, high - low)
+            self._update_pivots(index)
+            self._update_range(index, high, low, prev_close)
+
+    def update_frame(self, df: pd.DataFrame):
+        """
+        Ingests every bar of `df` in order (e.g. to seed from history).
+        """
+        for ts, o, h, l, c, v in zip(df.index, df["open"].to_numpy(), df["high"].to_numpy(),
+                                     df["low"].to_numpy(), df["close"].to_numpy(), df["volume"].to_numpy()):
+            self.update(ts, o, h, l, c, v)
+
+    def _update_support_resistance(self, index: int, hl: float):
+        if len(self._hl) == SR_ATR_PERIOD:
+            self._hl_sum -= self._hl[0]
+        self._hl.append(hl)
+        self._hl_sum += hl
+        if index % (SR_ATR_PERIOD * 64) == 0:
+            self._hl_sum = float(np.sum(self._hl))
+
+        support = resistance = np.nan
+        if index >= self.sr_window and len(self._hl) == SR_ATR_PERIOD:
+            k = self.sr_window + 1
+            atr = np.array([self._hl_sum / SR_ATR_PERIOD])
+            level_low, is_support, level_high, is_resistance = support_resistance_candidates(
+                self._open.tail(k), self._high.tail(k), self._low.tail(k),
+                self._close.tail(k), self._volume.tail(k), atr, window=self.sr_window, **self.sr_params,
+            )
+            if is_support[0]:
+                support = level_low[0]
+            if is_resistance[0]:
+                resistance = level_high[0]
+        self._support.append(support)
+        self._resistance.append(resistance)
+
+    def _update_pivots(self, index: int):
+        # The bar PIVOT_WINDOW back now has both sides of its window
+        first_allowed = self._frame_start() + PIVOT_WINDOW
+        self._pivot_highs.drop_before(first_allowed)
+        self._pivot_lows.drop_before(first_allowed)
+
+        center = index - PIVOT_WINDOW
+        if center < first_allowed:
+            return
+        k = 2 * PIVOT_WINDOW + 1
+        highs = self._high.tail(k)
+        lows = self._low.tail(k)
+        if highs[PIVOT_WINDOW] == highs.max():
+            self._pivot_highs.add(center, highs[PIVOT_WINDOW])
+        if lows[PIVOT_WINDOW] == lows.min():
+            self._pivot_lows.add(center, lows[PIVOT_WINDOW])
+
+    def _update_range(self, index: int, high: float, low: float, prev_close: float):
+        self._range_high.push(index, high)
+        self._range_low.push(index, low)
+
+        tr = np.nanmax([high - low, abs(high - prev_close), abs(low - prev_close)])
+        window = self.range_window
+        if len(self._tr) >= window:
+            self._tr_sum -= self._tr.tail(window)[0]
+        self._tr.append(tr)
+        self._tr_sum += tr
+        if index % (window * 64) == 0:
+            self._tr_sum = float(np.sum(self._tr.tail(window)))
+
+    def _trend(self, fit: _RunningFit, kind: str):
+        if len(fit.points) < 3:
+            return None
+        slope, intercept, r_value = fit.fit()
+        if abs(r_value) < self.r_threshold:
+            return None
+        frame_start = self._frame_start()
+        points = [(x - frame_start, y) for x, y in fit.points]
+        return {
+            "slope": slope,
+            "intercept": intercept,
+            "start_index": np.int64(points[0][0]),
+            "points": points,
+            "source": kind
+        }
+
+    def _range_info(self) -> dict:
+        window = self.range_window
+        if len(self._close) < window:
+            return {
+                "range_low": np.nan,
+                "range_high": np.nan,
+                "message": f"Not enough data to detect consolidation (requires {window} candles).",
+                "is_range": False
+            }
+        # The window's first bar has no previous close inside the window, so it counts high - low only
+        first_tr = self._tr.tail(window)[0]
+        first_hl = self._high.tail(window)[0] - self._low.tail(window)[0]
+        atr = (self._tr_sum - first_tr + first_hl) / window
+        return consolidation_summary(
+            self._range_high.value(), self._range_low.value(), atr,
+            self._low.tail(window), self._high.tail(window), **self.range_params,
+        )
+
+    def frame(self) -> pd.DataFrame:
+        """
+        The buffered bars as an OHLCV DataFrame.
+        """
+        n = len(self._close)
+        index = pd.DatetimeIndex(pd.to_datetime(self._ts.tail(n), unit="ns", utc=True), name="ts_event")
+        return pd.DataFrame({
+            "open": self._open.tail(n).copy(),
+            "high": self._high.tail(n).copy(),
+            "low": self._low.tail(n).copy(),
+            "close": self._close.tail(n).copy(),
+            "volume": self._volume.tail(n).copy(),
+        }, index=index)
+
+    def report(self, render_chart: bool = False) -> Report:
+        with self._lock:
+            input_symbol = self.symbol_details.get("input_symbol", self.symbol_details.get("db_symbol", "Unknown"))
+            n = len(self._close)
+            if n == 0:
+                raise ValueError(f"No bars ingested for {input_symbol} on {self.timeframe}")
+
+            evaluated = max(0, n - self.sr_window)
+            tolerance = self.sr_params["tolerance"]
+            supports = self._support.tail(evaluated)
+            resistances = self._resistance.tail(evaluated)
+            supports = cluster_levels(supports[~np.isnan(supports)], tolerance)
+            resistances = cluster_levels(resistances[~np.isnan(resistances)], tolerance)
+
+            trendline_data = describe_trendlines(
+                self._trend(self._pivot_lows, "support"),
+                self._trend(self._pivot_highs, "resistance"),
+                self._close.tail(n),
+                self.timeframe,
+            )
+
+            range_info = self._range_info()
+            manipulation = None
+            if range_info.get("is_range", False):
+                k = min(n, MANIPULATION_LOOKBACK)
+                index = pd.to_datetime(self._ts.tail(k), unit="ns", utc=True)
+                manipulation = summarize_manipulation(events_from_closes(
+                    self._close.tail(k), index, range_info["range_low"], range_info["range_high"]
+                ))
+
+            last_ts = pd.Timestamp(int(self._ts.last()), unit="ns", tz="UTC")
+            return build_report(
+                input_symbol, self.timeframe, supports, resistances, trendline_data, range_info,
+                manipulation, float(self._close.last()), last_ts.isoformat(),
+                chart_df=self.frame() if render_chart else None,
+            )
+
+
+_analyzers = {}
+_analyzers_lock = threading.Lock()
+
+
+def get_streaming_analyzer(symbol_details: dict, timeframe: str, max_bars: int = DEFAULT_MAX_BARS) -> StreamingAnalyzer:
+    """
+    One shared analyzer per (dataset, db_symbol, timeframe), using the tuned
+    detector parameters found when it is first created.
+    """
+    key = (symbol_details.get("dataset"), symbol_details.get("db_symbol"), timeframe)
+    with _analyzers_lock:
+        analyzer = _analyzers.get(key)
+        if analyzer is None:
+            analyzer = StreamingAnalyzer(symbol_details, timeframe, max_bars=max_bars)
+            _analyzers[key] = analyzer
+        return analyzer
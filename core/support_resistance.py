@@ -1,5 +1,100 @@
+import warnings
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from core.features import FeatureStore
+
+
+def _trailing_windows(values: np.ndarray, window: int) -> np.ndarray:
+    # Row k is values[k:k + window], i.e. the `window` bars before bar k + window
+    if len(values) == window + 1:
+        # Single bar (streaming updates): skip the strided-view setup
+        return values[None, :window]
+    return sliding_window_view(values, window)[:-1]
+
+
+def _cluster(levels, tolerance: float) -> list:
+    # Levels are visited in ascending order, so the last kept level is always the nearest one
+    clustered = []
+    for level in sorted(set(levels)):
+        if not clustered or abs(level - clustered[-1]) / clustered[-1] > tolerance:
+            clustered.append(level)
+    return clustered
+
+
+def support_resistance_candidates(opens, highs, lows, closes, volumes, atr, window: int = 20,
+                                  tolerance: float = 0.002, min_bounces: int = 2,
+                                  min_reversal_atr: float = 1.5, use_volume: bool = True,
+                                  level_low=None, level_high=None, local_vol=None):
+    """
+    Evaluates bars `window`..n-1 against the `window` bars before each.
+    `atr` is aligned with those bars. Window body extremes and mean volume are
+    derived here unless passed in precomputed (same alignment).
+    Returns (level_low, is_support, level_high, is_resistance).
+    """
+    current_close = closes[window:]
+
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+
+        # Body extremes of the lookback window
+        if level_high is None:
+            level_high = np.nanmax(_trailing_windows(np.fmax(opens, closes), window), axis=1)
+        if level_low is None:
+            level_low = np.nanmin(_trailing_windows(np.fmin(opens, closes), window), axis=1)
+
+        volume_ok = np.ones(len(current_close), dtype=bool)
+        if use_volume:
+            if local_vol is None:
+                local_vol = np.nanmean(_trailing_windows(volumes.astype(np.float64), window), axis=1)
+            volume_ok = volumes[window:] > local_vol * 1.5
+
+        # -- Filter: Wick touches and reversal bounce from LOW --
+        support_touch = np.abs(_trailing_windows(lows, window) - level_low[:, None]) / level_low[:, None] < tolerance
+        support_bounces = support_touch.sum(axis=1)
+        support_body_rejected = (support_touch & _trailing_windows(closes > opens, window)).any(axis=1)
+        reversed_up = (current_close - level_low) > (atr * min_reversal_atr)
+
+        # -- Filter: Wick touches and reversal bounce from HIGH --
+        resistance_touch = np.abs(_trailing_windows(highs, window) - level_high[:, None]) / level_high[:, None] < tolerance
+        resistance_bounces = resistance_touch.sum(axis=1)
+        resistance_body_rejected = (resistance_touch & _trailing_windows(closes < opens, window)).any(axis=1)
+        reversed_down = (level_high - current_close) > (atr * min_reversal_atr)
+
+    is_support = (support_bounces >= min_bounces) & support_body_rejected & reversed_up & volume_ok
+    is_resistance = (resistance_bounces >= min_bounces) & resistance_body_rejected & reversed_down & volume_ok
+    return level_low, is_support, level_high, is_resistance
+
+
+def cluster_levels(levels, tolerance: float = 0.002) -> list:
+    """
+    Rounds candidate levels to cents and merges those within `tolerance` of each other.
+    """
+    return _cluster(np.round(np.asarray(levels), 2), tolerance)
+
+
+def frame_candidates(df: pd.DataFrame, window: int = 20, tolerance: float = 0.002, min_bounces: int = 2,
+                     min_reversal_atr: float = 1.5, use_volume: bool = True, features: FeatureStore = None):
+    """
+    support_resistance_candidates for every bar of `df` after the first `window`,
+    with ATR and window extremes read from `features`.
+    """
+    if features is None:
+        features = FeatureStore(df)
+
+    # Window features end at the bar before each evaluated bar
+    previous = slice(window - 1, -1)
+    return support_resistance_candidates(
+        features.column("open"), features.column("high"), features.column("low"),
+        features.column("close"), features.column("volume"), features.atr(14)[window:],
+        window=window, tolerance=tolerance, min_bounces=min_bounces,
+        min_reversal_atr=min_reversal_atr, use_volume=use_volume,
+        level_low=features.rolling_min("body_low", window)[previous],
+        level_high=features.rolling_max("body_high", window)[previous],
+        local_vol=features.rolling_mean("volume", window, skipna=True)[previous] if use_volume else None,
+    )
+
 
 def detect_support_resistance(
     df: pd.DataFrame,
@@ -7,7 +102,8 @@ def detect_support_resistance(
     tolerance: float = 0.002,
     min_bounces: int = 2,
     min_reversal_atr: float = 1.5,
-    use_volume: bool = True
+    use_volume: bool = True,
+    features: FeatureStore = None
 ):
     """
     Detects high-confidence support/resistance zones based on:
@@ -16,72 +112,22 @@ def detect_support_resistance(
     - Optional volume spike confirmation
     - Clustering logic to reduce noise
 
+    Every bar is evaluated at once over sliding windows of the previous
+    `window` bars, so long 1min histories stay cheap. ATR and window extremes
+    come from `features` (a FeatureStore over `df`) when given.
+
     Returns:
         (support_levels, resistance_levels): Cleaned key price levels
     """
-    highs = df["high"]
-    lows = df["low"]
-    closes = df["close"]
-    opens = df["open"]
-    volumes = df["volume"]
-
-    atr = (highs - lows).rolling(window=14).mean()
-
-    potential_supports = []
-    potential_resistances = []
-
-    for i in range(window, len(df)):
-        slice_df = df.iloc[i - window:i]
-        current_atr = atr.iloc[i]
-        level_high = slice_df[['open', 'close']].max(axis=1).max()
-        level_low = slice_df[['open', 'close']].min(axis=1).min()
-
-        # -- Filter: Wick touches and reversal bounce from LOW --
-        support_bounces = 0
-        support_body_rejected = False
-        for j in range(i - window, i):
-            if abs(df["low"].iloc[j] - level_low) / level_low < tolerance:
-                support_bounces += 1
-                if df["close"].iloc[j] > df["open"].iloc[j]:  # body rejection upward
-                    support_body_rejected = True
-
-        reversed_up = (df["close"].iloc[i] - level_low) > (current_atr * min_reversal_atr)
-
-        volume_ok = True
-        if use_volume:
-            local_vol = volumes.iloc[i - window:i]
-            volume_ok = volumes.iloc[i] > local_vol.mean() * 1.5
-
-        if support_bounces >= min_bounces and support_body_rejected and reversed_up and volume_ok:
-            potential_supports.append(round(level_low, 2))
-
-        # -- Filter: Wick touches and reversal bounce from HIGH --
-        resistance_bounces = 0
-        resistance_body_rejected = False
-        for j in range(i - window, i):
-            if abs(df["high"].iloc[j] - level_high) / level_high < tolerance:
-                resistance_bounces += 1
-                if df["close"].iloc[j] < df["open"].iloc[j]:  # body rejection downward
-                    resistance_body_rejected = True
-
-        reversed_down = (level_high - df["close"].iloc[i]) > (current_atr * min_reversal_atr)
-
-        volume_ok = True
-        if use_volume:
-            local_vol = volumes.iloc[i - window:i]
-            volume_ok = volumes.iloc[i] > local_vol.mean() * 1.5
-
-        if resistance_bounces >= min_bounces and resistance_body_rejected and reversed_down and volume_ok:
-            potential_resistances.append(round(level_high, 2))
+    if len(df) <= window:
+        return [], []
 
-    def cluster(levels):
-        clustered = []
-        for level in sorted(set(levels)):
-            if not clustered or all(abs(level - x) / x > tolerance for x in clustered):
-                clustered.append(level)
-        return clustered
+    level_low, is_support, level_high, is_resistance = frame_candidates(
+        df, window=window, tolerance=tolerance, min_bounces=min_bounces,
+        min_reversal_atr=min_reversal_atr, use_volume=use_volume, features=features,
+    )
 
-    support_levels = cluster(potential_supports)
-    resistance_levels = cluster(potential_resistances)
+    support_levels = cluster_levels(level_low[is_support], tolerance)
+    resistance_levels = cluster_levels(level_high[is_resistance], tolerance)
 
     return support_levels, resistance_levels
@@ -0,0 +1,317 @@
+import time
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+from config.settings import SWEEP_MAX_WORKERS, BACKTEST_HORIZON_BARS
+from core.detector_params import DEFAULT_PARAMS, save_detector_params
+
+# Grids swept per detector family; every combination is one task
+DEFAULT_GRIDS = {
+    "support_resistance": {
+        "window": [10, 14, 20, 30, 40],
+        "tolerance": [0.001, 0.002, 0.003, 0.005],
+        "min_reversal_atr": [1.0, 1.5, 2.0, 2.5],
+    },
+    # With min_bounces 1 every complete window is a range (its extremes touch themselves),
+    # so only window is live there; atr_multiplier and tolerance_pct matter from 2 bounces up
+    "range": {
+        "window": [30, 40, 50, 75, 100],
+        "min_bounces": [1, 2, 3],
+        "atr_multiplier": [1.0, 1.25, 1.5, 2.0],
+        "tolerance_pct": [0.01, 0.015, 0.025],
+    },
+    "trendline": {
+        "r_threshold": [0.5, 0.6, 0.7, 0.8, 0.9],
+    },
+}
+
+MIN_SAMPLES = 20        # fewer scored levels/signals/lines than this and a setting is not eligible
+LEVEL_HORIZON = 100     # bars a support/resistance candidate has to be retested in
+RETEST_ATR = 0.25       # a bar this close to a level retests it ...
+HOLD_ATR = 1.0          # ... and the level held if price then got this far away before this far through
+TRENDLINE_TRAIN = 300   # bars a trendline is fitted on ...
+TRENDLINE_TEST = 50     # ... and the bars after it that it is checked against
+TRENDLINE_STEP = 50
+PIVOT_WINDOW = 5        # detect_pivots' default
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+
+def expand_grid(grid: dict) -> list:
+    """
+    {param: [values]} -> [{param: value}, ...], every combination.
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def live_points(family: str, points: list) -> list:
+    """
+    Drops grid points that cannot score differently from a kept one: range
+    points with min_bounces <= 1 only differ by window, so the others keep the
+    default atr_multiplier and tolerance_pct.
+    """
+    if family != "range":
+        return points
+    defaults = DEFAULT_PARAMS["range"]
+    return [
+        point for point in points
+        if point.get("min_bounces", defaults["min_bounces"]) > 1
+        or all(point.get(name, defaults[name]) == defaults[name] for name in ("atr_multiplier", "tolerance_pct"))
+    ]
+
+
+# 📐 Objectives: higher is better; each returns {"score", "samples"}
+def score_support_resistance(df: pd.DataFrame, params: dict, horizon: int = LEVEL_HORIZON) -> dict:
+    """
+    Share of support/resistance candidates that held when price came back:
+    after the first later bar within RETEST_ATR of the level, price moved
+    HOLD_ATR away from it before it moved HOLD_ATR through it (through on the
+    same bar counts as broken). Candidates not retested, or undecided, within
+    `horizon` bars are not scored. ATR is the candidate bar's.
+    """
+    from core.features import FeatureStore
+    from core.support_resistance import frame_candidates
+
+    window = params["window"]
+    if len(df) <= window + 1:
+        return {"score": np.nan, "samples": 0}
+    features = FeatureStore(df)
+    level_low, is_support, level_high, is_resistance = frame_candidates(
+        df, window=window, tolerance=params["tolerance"], min_reversal_atr=params["min_reversal_atr"],
+        features=features,
+    )
+    highs = features.column("high").astype(np.float64)
+    lows = features.column("low").astype(np.float64)
+    atr = features.atr(14)
+
+    held = decided = 0
+    for levels, flags, side in ((level_low, is_support, 1.0), (level_high, is_resistance, -1.0)):
+        for offset in np.flatnonzero(flags):
+            bar, level = window + offset, float(levels[offset])
+            after = slice(bar + 1, bar + 1 + horizon)
+            # Distance of each later bar's near and far extreme from the level, positive on the level's side
+            near = side * ((lows if side > 0 else highs)[after] - level)
+            far = side * ((highs if side > 0 else lows)[after] - level)
+            retest = np.flatnonzero(near <= RETEST_ATR * atr[bar])
+            if len(retest) == 0:
+                continue
+            first = retest[0]
+            broken = np.flatnonzero(near[first:] <= -HOLD_ATR * atr[bar])
+            bounced = np.flatnonzero(far[first + 1:] >= HOLD_ATR * atr[bar]) + 1
+            if len(broken) == 0 and len(bounced) == 0:
+                continue
+            decided += 1
+            held += len(bounced) > 0 and (len(broken) == 0 or bounced[0] < broken[0])
+    return {"score": held / decided if decided else np.nan, "samples": decided}
+
+
+def score_range(df: pd.DataFrame, params: dict, horizon: int = BACKTEST_HORIZON_BARS) -> dict:
+    """
+    Mean hit rate of the IRZ retracements and targets in a walk-forward backtest.
+    """
+    from core.backtest import run_backtest
+
+    result = run_backtest(df, horizon=horizon, range_params=params)
+    levels = result["levels"]
+    return {"score": float(levels["hit"].mean()) if len(levels) else np.nan, "samples": result["signals"]}
+
+
+def score_trendline(df: pd.DataFrame, params: dict, train: int = TRENDLINE_TRAIN,
+                    test: int = TRENDLINE_TEST, step: int = TRENDLINE_STEP) -> dict:
+    """
+    Every `step` bars a trendline is fitted on the pivots confirmed in the last
+    `train` bars; its score is the share of the next `test` closes on the line's
+    side (above support, below resistance). Returns the mean over fitted lines.
+    """
+    from core.trendline_detector import detect_pivots, fit_trendline
+
+    closes = df["close"].to_numpy(dtype=np.float64)
+    pivot_highs, pivot_lows = detect_pivots(df)
+    respected = []
+    for pivots, kind, side in ((pivot_lows, "support", 1.0), (pivot_highs, "resistance", -1.0)):
+        positions = np.array([x for x, _ in pivots], dtype=np.int64)
+        for end in range(train, len(df) - test + 1, step):
+            # A pivot is only known once the bars after it have closed
+            lo, hi = np.searchsorted(positions, [end - train, end - PIVOT_WINDOW])
+            trend = fit_trendline(pivots[lo:hi], kind, r_threshold=params["r_threshold"])
+            if trend is None:
+                continue
+            x = np.arange(end, end + test)
+            line = trend["intercept"] + trend["slope"] * (x - trend["start_index"])
+            respected.append(np.mean(side * (closes[end:end + test] - line) >= 0))
+    return {"score": float(np.mean(respected)) if respected else np.nan, "samples": len(respected)}
+
+
+OBJECTIVES = {
+    "support_resistance": score_support_resistance,
+    "range": score_range,
+    "trendline": score_trendline,
+}
+
+
+# 🧠 Bars shared with the workers through shared memory
+def share_frame(df: pd.DataFrame):
+    """
+    Copies the OHLCV columns and timestamps into shared memory once.
+    Returns (spec, blocks): `spec` is all a worker needs to attach; the caller
+    owns `blocks` and must release_frame them when the sweep ends. Pool workers
+    share the creating process's resource tracker, so attaching adds no cleanup.
+    """
+    dtype = np.result_type(*(df[col].dtype for col in OHLCV_COLUMNS))
+    n = len(df)
+    values = shared_memory.SharedMemory(create=True, size=max(1, 5 * n * dtype.itemsize))
+    stamps = shared_memory.SharedMemory(create=True, size=max(1, n * 8))
+    block = np.ndarray((5, n), dtype=dtype, buffer=values.buf)
+    for i, col in enumerate(OHLCV_COLUMNS):
+        block[i] = df[col].to_numpy()
+    np.ndarray(n, dtype=np.int64, buffer=stamps.buf)[:] = df.index.asi8
+    spec = {"values": values.name, "stamps": stamps.name, "dtype": dtype.str, "n": n,
+            "unit": df.index.unit, "tz": str(df.index.tz) if df.index.tz is not None else None}
+    return spec, (values, stamps)
+
+
+def release_frame(blocks):
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+
+def attach_frame(spec: dict):
+    """
+    DataFrame over the shared blocks; the OHLCV values are not copied.
+    Returns (df, handles); keep the handles alive as long as df is used.
+    """
+    values = shared_memory.SharedMemory(name=spec["values"])
+    stamps = shared_memory.SharedMemory(name=spec["stamps"])
+    n = spec["n"]
+    block = np.ndarray((5, n), dtype=np.dtype(spec["dtype"]), buffer=values.buf)
+    stamps_view = np.ndarray(n, dtype=np.int64, buffer=stamps.buf).view(f"M8[{spec['unit']}]")
+    index = pd.DatetimeIndex(stamps_view, name="ts_event")
+    if spec["tz"] is not None:
+        index = index.tz_localize(spec["tz"])
+    df = pd.DataFrame(block.T, columns=OHLCV_COLUMNS, index=index, copy=False)
+    return df, (values, stamps)
+
+
+_worker_frame = None
+_worker_handles = None
+
+
+def _init_worker(spec: dict):
+    global _worker_frame, _worker_handles
+    _worker_frame, _worker_handles = attach_frame(spec)
+
+
+def _evaluate(task: tuple) -> tuple:
+    family, params = task
+    started = time.perf_counter()
+    try:
+        result = OBJECTIVES[family](_worker_frame, params)
+        error = None
+    except Exception as e:
+        result, error = {"score": np.nan, "samples": 0}, f"{type(e).__name__}: {e}"
+    return family, params, result, error, time.perf_counter() - started
+
+
+def sweep_frame(df: pd.DataFrame, grids: dict = None, max_workers: int = SWEEP_MAX_WORKERS,
+                on_result=None) -> dict:
+    """
+    Scores every grid point of every family on `df` over a process pool.
+
+    The bars are placed in shared memory once and every worker attaches to
+    them, so tasks only carry their parameters. `max_workers` <= 1 runs inline.
+    `on_result(family, params, result, error)` is called as points finish.
+    Returns {family: DataFrame of params, score, samples, error, changed}, best first.
+    """
+    global _worker_frame
+    grids = DEFAULT_GRIDS if grids is None else grids
+    tasks = [(family, params) for family, grid in grids.items() for params in live_points(family, expand_grid(grid))]
+    rows = {family: [] for family in grids}
+
+    def collect(outcome):
+        family, params, result, error, elapsed = outcome
+        rows[family].append({**params, **result, "error": error, "elapsed": elapsed})
+        if on_result is not None:
+            on_result(family, params, result, error)
+
+    if max_workers <= 1 or len(tasks) <= 1:
+        previous, _worker_frame = _worker_frame, df
+        try:
+            for task in tasks:
+                collect(_evaluate(task))
+        finally:
+            _worker_frame = previous
+    else:
+        from core.batch import _pool_context
+
+        spec, blocks = share_frame(df)
+        try:
+            workers = min(max_workers, len(tasks))
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(),
+                                     initializer=_init_worker, initargs=(spec,)) as pool:
+                # Slow families first so the pool drains evenly
+                tasks.sort(key=lambda task: task[0] != "range")
+                for outcome in pool.map(_evaluate, tasks, chunksize=1):
+                    collect(outcome)
+        finally:
+            release_frame(blocks)
+
+    return {family: _rank(family, family_rows) for family, family_rows in rows.items()}
+
+
+def _rank(family: str, family_rows: list) -> pd.DataFrame:
+    # Best score first; among equal scores more samples, then the fewest changes from the defaults
+    table = pd.DataFrame(family_rows)
+    defaults = DEFAULT_PARAMS.get(family, {})
+    table["changed"] = sum((table[name] != value).astype(int) for name, value in defaults.items() if name in table)
+    return table.sort_values(["score", "samples", "changed"], ascending=[False, False, True],
+                             na_position="last", kind="stable").reset_index(drop=True)
+
+
+def best_params(results: dict) -> tuple:
+    """
+    The top-scoring eligible setting per family (at least MIN_SAMPLES samples).
+    Returns (params, scores); families with no eligible setting are left out.
+    """
+    params, scores = {}, {}
+    for family, table in results.items():
+        eligible = table[(table["samples"] >= MIN_SAMPLES) & table["score"].notna()]
+        if eligible.empty:
+            continue
+        best = eligible.iloc[0]
+        params[family] = {name: best[name].item() if hasattr(best[name], "item") else best[name]
+                          for name in DEFAULT_PARAMS[family] if name in best}
+        scores[family] = {"score": float(best["score"]), "samples": int(best["samples"])}
+    return params, scores
+
+
+def sweep_symbol(symbol_details: dict, timeframe: str, lookback_days: int, grids: dict = None,
+                 max_workers: int = SWEEP_MAX_WORKERS, save: bool = True, source=None, end_time=None,
+                 on_result=None) -> dict:
+    """
+    Fetches `lookback_days` of bars, sweeps them and (with `save`) stores the
+    winners where run_analysis loads them from.
+    Returns {"results", "params", "scores", "path", "bars", "elapsed"}.
+    """
+    from data.databento_client import fetch_ohlcv
+
+    started = time.perf_counter()
+    df = fetch_ohlcv(symbol_details, timeframe, lookback_days=lookback_days, source=source, end_time=end_time)
+    if df is None or df.empty:
+        raise ValueError(f"No data for {symbol_details.get('db_symbol')} on {timeframe}")
+
+    results = sweep_frame(df, grids=grids, max_workers=max_workers, on_result=on_result)
+    params, scores = best_params(results)
+    path = save_detector_params(symbol_details, timeframe, params, scores) if save and params else None
+    return {
+        "results": results,
+        "params": params,
+        "scores": scores,
+        "path": path,
+        "bars": len(df),
+        "elapsed": time.perf_counter() - started,
+    }
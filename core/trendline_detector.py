@@ -1,23 +1,45 @@
 import numpy as np
 import pandas as pd
-from scipy.stats import linregress
 
+from core.features import FeatureStore
 
-def detect_pivots(df, window=5):
-    highs = df["high"]
-    lows = df["low"]
-    pivot_highs = []
-    pivot_lows = []
 
-    for i in range(window, len(df) - window):
-        if highs.iloc[i] == max(highs.iloc[i - window:i + window + 1]):
-            pivot_highs.append((i, highs.iloc[i]))
-        if lows.iloc[i] == min(lows.iloc[i - window:i + window + 1]):
-            pivot_lows.append((i, lows.iloc[i]))
+def detect_pivots(df, window=5, features: FeatureStore = None):
+    if len(df) <= 2 * window:
+        return [], []
 
+    if features is None:
+        features = FeatureStore(df)
+
+    # Bar i is a pivot when it equals the extreme of bars i - window .. i + window
+    highs = features.column("high")
+    lows = features.column("low")
+    high_idx = np.flatnonzero(highs == features.centered_max("high", window))
+    low_idx = np.flatnonzero(lows == features.centered_min("low", window))
+
+    pivot_highs = list(zip(high_idx.tolist(), highs[high_idx]))
+    pivot_lows = list(zip(low_idx.tolist(), lows[low_idx]))
     return pivot_highs, pivot_lows
 
 
+def _least_squares(x: np.ndarray, y: np.ndarray):
+    """
+    Closed-form ordinary least squares; returns (slope, intercept, r_value).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    ssxm, ssxym, _, ssym = np.cov(x, y, bias=True).flat
+    slope = ssxym / ssxm
+    intercept = np.mean(y) - slope * np.mean(x)
+
+    if ssxm == 0.0 or ssym == 0.0:
+        # Flat pivots have no defined r and pass the threshold as a horizontal line
+        r_value = np.nan if ssxym == 0 else 0.0
+    else:
+        r_value = min(1.0, max(-1.0, ssxym / np.sqrt(ssxm * ssym)))
+    return slope, intercept, r_value
+
+
 def fit_trendline(points, kind="support", r_threshold=0.7):
     if len(points) < 3:
         return None
@@ -25,7 +47,7 @@ def fit_trendline(points, kind="support", r_threshold=0.7):
     x_raw = np.array([pt[0] for pt in points])
     y = np.array([pt[1] for pt in points])
     x = x_raw - x_raw[0]
-    slope, intercept, r_value, _, _ = linregress(x, y)
+    slope, intercept, r_value = _least_squares(x, y)
 
     if abs(r_value) < r_threshold:
         return None
@@ -39,7 +61,7 @@ def fit_trendline(points, kind="support", r_threshold=0.7):
     }
 
 
-def classify_trendline(df, trend_meta, timeframe="1h"):
+def classify_trendline(df, trend_meta, timeframe="1h", closes=None):
     slope = trend_meta["slope"]
     intercept = trend_meta["intercept"]
     start_idx = trend_meta["start_index"]
@@ -50,12 +72,15 @@ def classify_trendline(df, trend_meta, timeframe="1h"):
         "12h": 2, "1d": 1,
     }
 
+    if closes is None:
+        closes = df["close"].to_numpy()
+
     candles_per_day = tf_map.get(timeframe.lower(), 24)
-    lookback = min(3 * candles_per_day, len(df))
+    lookback = min(3 * candles_per_day, len(closes))
 
-    recent_df = df.tail(lookback)
-    closes = recent_df["close"].values
-    x_vals = np.arange(len(df) - lookback, len(df)) - start_idx
+    n = len(closes)
+    closes = closes[n - lookback:]
+    x_vals = np.arange(n - lookback, n) - start_idx
     trend_values = slope * x_vals + intercept
 
     above_ratio = np.mean(closes > trend_values)
@@ -73,17 +98,16 @@ def classify_trendline(df, trend_meta, timeframe="1h"):
         return "Ambiguous"
 
 
-def detect_trendline(df: pd.DataFrame, timeframe: str = "1h", symbol: str = "ES"):
-    pivot_highs, pivot_lows = detect_pivots(df)
-
-    support_trend = fit_trendline(pivot_lows, "support")
-    resistance_trend = fit_trendline(pivot_highs, "resistance")
-
+def describe_trendlines(support_trend, resistance_trend, closes, timeframe: str = "1h"):
+    """
+    Classifies fitted support/resistance lines against recent closes and builds
+    the report messages. Returns {"messages", "vectors"}.
+    """
     messages = []
     vectors = {}
 
     if support_trend:
-        role = classify_trendline(df, support_trend, timeframe=timeframe)
+        role = classify_trendline(None, support_trend, timeframe=timeframe, closes=closes)
         if "Support" in role:
             vectors["Support"] = support_trend
             levels = [f"{lvl:.2f}" for _, lvl in support_trend["points"]]
@@ -91,7 +115,7 @@ def detect_trendline(df: pd.DataFrame, timeframe: str = "1h", symbol: str = "ES"
             messages.append(f"    Touch points: {', '.join(levels)}")
 
     if resistance_trend:
-        role = classify_trendline(df, resistance_trend, timeframe=timeframe)
+        role = classify_trendline(None, resistance_trend, timeframe=timeframe, closes=closes)
         if "Resistance" in role or "flipped" in role:
             vectors["Resistance"] = resistance_trend
             levels = [f"{lvl:.2f}" for _, lvl in resistance_trend["points"]]
@@ -105,3 +129,13 @@ def detect_trendline(df: pd.DataFrame, timeframe: str = "1h", symbol: str = "ES"
         "messages": messages,
         "vectors": vectors
     }
+
+
+def detect_trendline(df: pd.DataFrame, timeframe: str = "1h", symbol: str = "ES", features: FeatureStore = None,
+                     r_threshold: float = 0.7):
+    pivot_highs, pivot_lows = detect_pivots(df, features=features)
+
+    support_trend = fit_trendline(pivot_lows, "support", r_threshold=r_threshold)
+    resistance_trend = fit_trendline(pivot_highs, "resistance", r_threshold=r_threshold)
+
+    return describe_trendlines(support_trend, resistance_trend, df["close"].to_numpy(), timeframe)
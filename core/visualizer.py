@@ -5,9 +5,26 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 import matplotlib.dates as mdates
 import datetime
+import threading
 
-def plot_full_analysis(df, symbol, timeframe, support_levels, resistance_levels, trendlines, fib_data, range_data):
+from core.features import FeatureStore
+
+# pyplot keeps global figure state, so charts from concurrent analyses are drawn one at a time
+_PLOT_LOCK = threading.Lock()
+
+def plot_full_analysis(df, symbol, timeframe, support_levels, resistance_levels, trendlines, fib_data, range_data,
+                       features: FeatureStore = None, range_boxes: list = None):
+    with _PLOT_LOCK:
+        return _plot_full_analysis(df, symbol, timeframe, support_levels, resistance_levels, trendlines,
+                                   fib_data, range_data, features, range_boxes)
+
+def _plot_full_analysis(df, symbol, timeframe, support_levels, resistance_levels, trendlines, fib_data, range_data,
+                        features, range_boxes=None):
+    if features is None:
+        features = FeatureStore(df)
+    hidden = max(len(df) - 300, 0)
     df = df.copy().tail(300)
+    shown = len(df)
     
     est_time_available = False
     df_est_index = df.index
@@ -36,13 +53,18 @@ def plot_full_analysis(df, symbol, timeframe, support_levels, resistance_levels,
     ax.set_facecolor("#d8bfe6")
 
     width = 0.6
-    for i, (_, row) in enumerate(df.iterrows()):
-        color = "white" if row["close"] >= row["open"] else "black"
-        ax.plot([i, i], [row["low"], row["high"]], color="black", linewidth=1, zorder=1)
+    candles = zip(
+        features.column("low")[-shown:], features.column("high")[-shown:],
+        features.body_low()[-shown:], features.body_high()[-shown:],
+        features.column("close")[-shown:] >= features.column("open")[-shown:],
+    )
+    for i, (low, high, body_low, body_high, is_up) in enumerate(candles):
+        color = "white" if is_up else "black"
+        ax.plot([i, i], [low, high], color="black", linewidth=1, zorder=1)
         body_patch = plt.Rectangle(
-            (i - width / 2, min(row["open"], row["close"])),
+            (i - width / 2, body_low),
             width,
-            abs(row["close"] - row["open"]),
+            body_high - body_low,
             facecolor=color,
             edgecolor="black",
             zorder=2
@@ -76,6 +98,23 @@ def plot_full_analysis(df, symbol, timeframe, support_levels, resistance_levels,
             ax.plot([anchor_index, future_index], [fib_data["anchor"], fib_data["anchor"]],
                     color="gray", linestyle="-", linewidth=1.2, zorder=2.3)
 
+    # 📦 Historical consolidation boxes (detect_consolidation_history) inside the shown bars
+    for box in range_boxes or []:
+        left = max(box["start_index"] - hidden, 0)
+        right = box["end_index"] - hidden
+        if right < 0:
+            continue
+        ax.add_patch(patches.Rectangle(
+            (left - 0.5, box["range_low"]),
+            width=right - left + 1,
+            height=box["range_high"] - box["range_low"],
+            linewidth=1,
+            linestyle="--",
+            edgecolor=(0.5, 0.0, 0.5, 0.5),
+            facecolor=(0.5, 0.0, 0.5, 0.06),
+            zorder=0
+        ))
+
     if range_data.get("is_range", False):
         range_low = range_data["range_low"]
         range_high = range_data["range_high"]
@@ -0,0 +1,158 @@
+# data/async_client.py
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from databento import Historical
+
+from config.settings import FETCH_MAX_IN_FLIGHT, FETCH_RATE_LIMIT_PER_SEC
+from data.databento_client import API_KEY, fetch_ohlcv, fetch_ohlcv_multi
+from data.sources import DatabentoSource, get_data_source
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by every pooled client.
+    """
+
+    def __init__(self, rate_per_sec: float, burst: int = None):
+        self.rate = rate_per_sec
+        self.capacity = burst if burst is not None else max(1, int(rate_per_sec))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _RateLimited:
+    # Every method call on the wrapped endpoint (timeseries, metadata) takes a token first
+    def __init__(self, endpoint, limiter: RateLimiter):
+        self._endpoint = endpoint
+        self._limiter = limiter
+
+    def __getattr__(self, name):
+        attr = getattr(self._endpoint, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self._limiter.acquire()
+            return attr(*args, **kwargs)
+        return call
+
+
+class PooledClient:
+    """
+    A long-lived Historical client whose requests (data and metadata) go through
+    the shared rate limiter.
+    """
+
+    def __init__(self, client, limiter: RateLimiter):
+        self.client = client
+        self.timeseries = _RateLimited(client.timeseries, limiter)
+        metadata = getattr(client, "metadata", None)
+        self.metadata = _RateLimited(metadata, limiter) if metadata is not None else None
+
+
+class ClientPool:
+    def __init__(self, size: int, limiter: RateLimiter, client_factory=None):
+        client_factory = client_factory or (lambda: Historical(key=API_KEY))
+        self._clients = queue.Queue()
+        for _ in range(size):
+            self._clients.put(PooledClient(client_factory(), limiter))
+
+    def acquire(self) -> PooledClient:
+        return self._clients.get()
+
+    def release(self, client: PooledClient):
+        self._clients.put(client)
+
+
+class AsyncFetcher:
+    """
+    Runs blocking fetches off the event loop on a fixed set of worker threads.
+
+    Fetches read from `source` (the configured data source by default). For a
+    Databento source at most `max_in_flight` fetches run at once, each on its
+    own pooled client, and every API call, metadata included, is throttled by
+    one shared rate limiter; other sources are called directly and need no key.
+    """
+
+    def __init__(self, max_in_flight: int = FETCH_MAX_IN_FLIGHT,
+                 rate_limit_per_sec: float = FETCH_RATE_LIMIT_PER_SEC, client_factory=None, source=None):
+        self.source = source if source is not None else get_data_source()
+        self.max_in_flight = max_in_flight
+        self.limiter = RateLimiter(rate_limit_per_sec)
+        self.pool = None
+        if isinstance(self.source, DatabentoSource):
+            if client_factory is None and not API_KEY:
+                raise ValueError("DATABENTO_API_KEY not found in environment or .env file.")
+            self.pool = ClientPool(max_in_flight, self.limiter, client_factory)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="kawaii-fetch")
+
+    def _call_with_client(self, fn, args, kwargs):
+        if self.pool is None:
+            return fn(*args, source=self.source, **kwargs)
+        client = self.pool.acquire()
+        try:
+            return fn(*args, client=client, **kwargs)
+        finally:
+            self.pool.release(client)
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Awaits `fn(*args, client=<pooled client>, **kwargs)` on the fetch pool,
+        or `fn(*args, source=<source>, **kwargs)` for sources without clients.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(self._call_with_client, fn, args, kwargs))
+
+    async def fetch_ohlcv(self, symbol_details: dict, timeframe: str, lookback_days: int = None,
+                          with_quotes: bool = False):
+        return await self.run(fetch_ohlcv, symbol_details, timeframe, lookback_days=lookback_days,
+                              with_quotes=with_quotes)
+
+    async def fetch_ohlcv_multi(self, symbol_details: dict, timeframes: list, lookback_days: dict,
+                                with_quotes: bool = False):
+        return await self.run(fetch_ohlcv_multi, symbol_details, timeframes, lookback_days,
+                              with_quotes=with_quotes)
+
+    async def fetch_many(self, requests: list, return_exceptions: bool = True) -> list:
+        """
+        Fetches [(symbol_details, timeframe, lookback_days), ...] concurrently.
+        Results come back in request order; failures are returned as exceptions.
+        """
+        return await asyncio.gather(
+            *(self.fetch_ohlcv(details, tf, lookback) for details, tf, lookback in requests),
+            return_exceptions=return_exceptions
+        )
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_default_fetcher = None
+
+
+def get_async_fetcher() -> AsyncFetcher:
+    global _default_fetcher
+    if _default_fetcher is None:
+        _default_fetcher = AsyncFetcher()
+    return _default_fetcher
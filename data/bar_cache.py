@@ -0,0 +1,295 @@
+# data/bar_cache.py
+
+import os
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+from config.settings import BAR_CACHE_DIR, BAR_CACHE_MEMORY_BARS
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+# One parquet file per partition, sized so a tail update rewrites a small file
+PARTITION_UNITS = {"ohlcv-1s": "D", "ohlcv-1m": "M", "ohlcv-1h": "Y", "ohlcv-1d": "Y"}
+DEFAULT_PARTITION_UNIT = "M"
+
+BAR_DURATIONS = {
+    "ohlcv-1s": pd.Timedelta(seconds=1),
+    "ohlcv-1m": pd.Timedelta(minutes=1),
+    "ohlcv-1h": pd.Timedelta(hours=1),
+    "ohlcv-1d": pd.Timedelta(days=1),
+}
+# Windows ending this close to the dataset's available end (or now, if unknown) may still get bars
+EDGE_SLACK = pd.Timedelta(days=1)
+
+
+def _to_utc(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        return ts.tz_localize("UTC")
+    return ts.tz_convert("UTC")
+
+
+def _empty_bars() -> pd.DataFrame:
+    df = pd.DataFrame(columns=OHLCV_COLUMNS, dtype="float64")
+    df.index = pd.DatetimeIndex([], tz="UTC", name="ts_event")
+    return df
+
+
+def make_key(symbol_details: dict, schema: str) -> tuple:
+    return (
+        symbol_details["dataset"],
+        symbol_details["db_symbol"],
+        symbol_details["stype_in"],
+        schema,
+    )
+
+
+def merge_intervals(intervals: list) -> list:
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def subtract_intervals(start, end, covered: list) -> list:
+    """
+    Returns the pieces of [start, end) that are not inside any covered interval.
+    """
+    missing = []
+    cursor = start
+    for cov_start, cov_end in covered:
+        if cov_end <= cursor:
+            continue
+        if cov_start >= end:
+            break
+        if cov_start > cursor:
+            missing.append((cursor, cov_start))
+        cursor = max(cursor, cov_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+def _partition_labels(timestamps: np.ndarray, unit: str) -> np.ndarray:
+    # UTC datetime64[ns] -> "2024-03-05" / "2024-03" / "2024"
+    return timestamps.astype(f"datetime64[{unit}]").astype(str)
+
+
+class FrameLRU:
+    """
+    Bar frames held in memory up to `max_bars` rows in total, least recently used
+    dropped first. The newest frame always stays, however large.
+    """
+
+    def __init__(self, max_bars: int):
+        self.max_bars = max_bars
+        self._frames = OrderedDict()
+        self._bars = 0
+
+    def __contains__(self, entry):
+        return entry in self._frames
+
+    def get(self, entry):
+        df = self._frames.get(entry)
+        if df is not None:
+            self._frames.move_to_end(entry)
+        return df
+
+    def put(self, entry, df: pd.DataFrame):
+        previous = self._frames.pop(entry, None)
+        if previous is not None:
+            self._bars -= len(previous)
+        self._frames[entry] = df
+        self._bars += len(df)
+        while self._bars > self.max_bars and len(self._frames) > 1:
+            _, evicted = self._frames.popitem(last=False)
+            self._bars -= len(evicted)
+
+
+def _write_parquet(path: str, df: pd.DataFrame):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    df.to_parquet(tmp)
+    os.replace(tmp, path)
+
+
+class BarCache:
+    """
+    On-disk store of raw Databento bars keyed by (dataset, db_symbol, stype_in, schema).
+
+    Alongside the bars it records which [start, end) windows have already been
+    requested, so an empty stretch (weekend, halt) is not mistaken for a hole.
+    Bars are split into day/month/year parquet partitions (PARTITION_UNITS), so
+    a gap fill only rewrites the partitions it touches. Loaded partitions are
+    kept in memory up to `memory_bars` bars, least recently used dropped first.
+    """
+
+    def __init__(self, root: str = BAR_CACHE_DIR, memory_bars: int = BAR_CACHE_MEMORY_BARS):
+        self.root = root
+        self.memory_bars = memory_bars
+        self._frames = FrameLRU(memory_bars)  # (key, partition) -> bars
+        self._coverage = {}
+        self._lock = threading.RLock()
+
+    def _paths(self, key: tuple):
+        # (partition folder, coverage file, single-file layout of older caches)
+        dataset, db_symbol, stype_in, schema = key
+        safe_symbol = db_symbol.replace("/", "_").replace(" ", "_")
+        folder = os.path.join(self.root, dataset, stype_in, schema)
+        return (
+            os.path.join(folder, safe_symbol),
+            os.path.join(folder, f"{safe_symbol}.json"),
+            os.path.join(folder, f"{safe_symbol}.parquet"),
+        )
+
+    @staticmethod
+    def _unit(key: tuple) -> str:
+        return PARTITION_UNITS.get(key[3], DEFAULT_PARTITION_UNIT)
+
+    def _load_coverage(self, key: tuple) -> list:
+        if key in self._coverage:
+            return self._coverage[key]
+
+        folder, meta_path, legacy_path = self._paths(key)
+        coverage = []
+        if os.path.exists(meta_path):
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                coverage = [(_to_utc(s), _to_utc(e)) for s, e in meta.get("coverage", [])]
+                if os.path.exists(legacy_path):
+                    self._split_legacy(key, pd.read_parquet(legacy_path))
+                    os.remove(legacy_path)
+            except Exception as e:
+                print(f"[Warning] Discarding unreadable bar cache for {key}: {e}")
+                coverage = []
+        self._coverage[key] = coverage
+        return coverage
+
+    def _split_legacy(self, key: tuple, df: pd.DataFrame):
+        # Older caches kept one parquet file per key
+        if df.empty:
+            return
+        labels = _partition_labels(df.index.tz_convert(None).to_numpy(), self._unit(key))
+        for label in np.unique(labels):
+            self._write_partition(key, label, df[labels == label])
+
+    def _partition(self, key: tuple, label: str, on_disk: set = None) -> pd.DataFrame:
+        cached = self._frames.get((key, label))
+        if cached is not None:
+            return cached
+        folder = self._paths(key)[0]
+        path = os.path.join(folder, f"{label}.parquet")
+        df = None
+        if on_disk is None or f"{label}.parquet" in on_disk:
+            try:
+                df = pd.read_parquet(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"[Warning] Discarding unreadable bar cache partition {path}: {e}")
+        if df is None:
+            return _empty_bars()
+        self._frames.put((key, label), df)
+        return df
+
+    def _write_partition(self, key: tuple, label: str, df: pd.DataFrame):
+        _write_parquet(os.path.join(self._paths(key)[0], f"{label}.parquet"), df)
+
+    def _write_coverage(self, key: tuple):
+        _, meta_path, _ = self._paths(key)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        tmp_meta = meta_path + ".tmp"
+        with open(tmp_meta, "w") as f:
+            json.dump({
+                "coverage": [[s.isoformat(), e.isoformat()] for s, e in self._coverage[key]]
+            }, f)
+        os.replace(tmp_meta, meta_path)
+
+    def coverage(self, key: tuple) -> list:
+        with self._lock:
+            return list(self._load_coverage(key))
+
+    def missing_ranges(self, key: tuple, start, end) -> list:
+        start, end = _to_utc(start), _to_utc(end)
+        if start >= end:
+            return []
+        with self._lock:
+            return subtract_intervals(start, end, self._load_coverage(key))
+
+    def store(self, key: tuple, df: pd.DataFrame, start, end, available_end=None):
+        """
+        Merges freshly fetched bars for [start, end) into the cache and persists
+        the partitions they fall in.
+
+        Near the dataset's available end (`available_end`, or now when unknown)
+        bars may still be published, so coverage there only runs to the end of
+        the last bar returned.
+        """
+        start, end = _to_utc(start), _to_utc(end)
+        with self._lock:
+            self._load_coverage(key)
+
+            fresh = None
+            if df is not None and not df.empty:
+                fresh = df[[c for c in OHLCV_COLUMNS if c in df.columns]].copy()
+                fresh.index = pd.DatetimeIndex(fresh.index).tz_convert("UTC")
+                fresh.index.name = "ts_event"
+                fresh = fresh[(fresh.index >= start) & (fresh.index < end)].sort_index()
+                fresh = fresh[~fresh.index.duplicated(keep="last")]
+
+            if fresh is not None and not fresh.empty:
+                labels = _partition_labels(fresh.index.tz_convert(None).to_numpy(), self._unit(key))
+                for label in np.unique(labels):
+                    part = fresh[labels == label]
+                    cached = self._partition(key, label)
+                    if not cached.empty:
+                        part = pd.concat([cached, part])
+                        part = part[~part.index.duplicated(keep="last")].sort_index()
+                    self._write_partition(key, label, part)
+                    self._frames.put((key, label), part)
+
+            covered_end = end
+            duration = BAR_DURATIONS.get(key[3], pd.Timedelta(0))
+            edge = _to_utc(available_end) if available_end is not None else pd.Timestamp.now(tz="UTC")
+            if end >= edge - max(duration, EDGE_SLACK):
+                last_bar = fresh.index[-1] if fresh is not None and not fresh.empty else None
+                covered_end = start if last_bar is None else min(end, last_bar + max(duration, pd.Timedelta(1)))
+            if covered_end > start:
+                self._coverage[key] = merge_intervals(self._coverage[key] + [(start, covered_end)])
+                self._write_coverage(key)
+
+    def read(self, key: tuple, start, end) -> pd.DataFrame:
+        start, end = _to_utc(start), _to_utc(end)
+        if start >= end:
+            return _empty_bars()
+        with self._lock:
+            self._load_coverage(key)
+            folder = self._paths(key)[0]
+            on_disk = set(os.listdir(folder)) if os.path.isdir(folder) else set()
+            unit = self._unit(key)
+            first, last = (np.datetime64(ts.tz_convert(None), unit) for ts in (start, end - pd.Timedelta(1)))
+            parts = [self._partition(key, label, on_disk) for label in np.arange(first, last + 1).astype(str)]
+            parts = [p for p in parts if not p.empty]
+        if not parts:
+            return _empty_bars()
+        df = pd.concat(parts) if len(parts) > 1 else parts[0]
+        return df[(df.index >= start) & (df.index < end)].copy()
+
+
+_default_cache = None
+
+
+def get_bar_cache() -> BarCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = BarCache()
+    return _default_cache
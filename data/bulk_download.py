@@ -0,0 +1,203 @@
+# data/bulk_download.py
+
+import os
+import json
+import argparse
+import threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from databento import Historical
+
+from config.settings import (
+    DATA_FILES_DIR, BULK_CHUNK_DAYS, BULK_MAX_WORKERS, FETCH_RATE_LIMIT_PER_SEC,
+)
+from data.sources import API_KEY, DatabentoSource
+from data.bar_cache import _to_utc
+from data.async_client import RateLimiter, PooledClient
+
+MANIFEST_NAME = "_manifest.json"
+DAY = pd.Timedelta(days=1)
+
+
+def partition_dir(root: str, symbol_details: dict, schema: str) -> str:
+    # Same layout FileSource reads: <root>/<dataset>/<schema>/<db_symbol>/*.parquet
+    return os.path.join(root, symbol_details["dataset"], schema, symbol_details["db_symbol"])
+
+
+def day_partitions(start_time, end_time) -> list:
+    """
+    UTC days touched by [start_time, end_time), as Timestamps at midnight.
+    """
+    start, end = _to_utc(start_time), _to_utc(end_time)
+    if end <= start:
+        return []
+    return list(pd.date_range(start.floor("D"), (end - pd.Timedelta(nanoseconds=1)).floor("D"), freq="D"))
+
+
+def group_chunks(days: list, chunk_days: int) -> list:
+    """
+    Groups pending days into runs of at most `chunk_days` consecutive days,
+    so each run is one request.
+    """
+    chunks, current = [], []
+    for day in days:
+        if current and (day - current[-1] != DAY or len(current) >= chunk_days):
+            chunks.append(current)
+            current = []
+        current.append(day)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class Manifest:
+    """
+    Checkpoint of finished day partitions, stored next to them as _manifest.json.
+    A day is only marked complete once its whole UTC day was inside the request.
+    """
+
+    def __init__(self, folder: str):
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self.partitions = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.partitions = json.load(f).get("partitions", {})
+            except (OSError, ValueError) as e:
+                print(f"[Warning] Ignoring unreadable manifest {self.path}: {e}")
+
+    def is_complete(self, day: pd.Timestamp) -> bool:
+        entry = self.partitions.get(day.strftime("%Y-%m-%d"))
+        return bool(entry and entry.get("complete"))
+
+    def mark(self, entries: dict):
+        with self._lock:
+            self.partitions.update(entries)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"partitions": self.partitions}, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+def _write_partition(folder: str, day: pd.Timestamp, df: pd.DataFrame):
+    path = os.path.join(folder, day.strftime("%Y-%m-%d") + ".parquet")
+    tmp = path + ".tmp"
+    df.to_parquet(tmp)
+    os.replace(tmp, path)
+
+
+class BulkDownloader:
+    """
+    Downloads long histories as one Parquet file per symbol and UTC day.
+
+    Pending days are grouped into `chunk_days` requests that run `max_workers`
+    at a time; every finished chunk is checkpointed in the manifest, so re-running
+    an interrupted job only requests the days still missing. Pass `client` (or a
+    ready `source`) to run against a stand-in for the Historical client.
+    """
+
+    def __init__(self, root: str = DATA_FILES_DIR, source=None, client=None,
+                 max_workers: int = BULK_MAX_WORKERS, chunk_days: int = BULK_CHUNK_DAYS,
+                 rate_limit_per_sec: float = FETCH_RATE_LIMIT_PER_SEC):
+        if source is None:
+            if client is None:
+                if not API_KEY:
+                    raise ValueError("DATABENTO_API_KEY not found in environment or .env file.")
+                client = Historical(key=API_KEY)
+            source = DatabentoSource(PooledClient(client, RateLimiter(rate_limit_per_sec)))
+        self.root = root
+        self.source = source
+        self.max_workers = max(1, max_workers)
+        self.chunk_days = max(1, chunk_days)
+
+    def _fetch_chunk(self, symbol_details: dict, schema: str, folder: str, manifest: Manifest,
+                     days: list, end_time: pd.Timestamp) -> int:
+        chunk_start = days[0]
+        chunk_end = min(days[-1] + DAY, end_time)
+        df = self.source.get_range(symbol_details, schema, chunk_start, chunk_end)
+
+        by_day = {}
+        if not df.empty:
+            by_day = {day: part for day, part in df.groupby(df.index.floor("D"))}
+
+        entries = {}
+        for day in days:
+            part = by_day.get(day)
+            rows = 0 if part is None else len(part)
+            if rows:
+                _write_partition(folder, day, part)
+            entries[day.strftime("%Y-%m-%d")] = {"rows": rows, "complete": day + DAY <= end_time}
+        manifest.mark(entries)
+        return len(df)
+
+    def download(self, symbol_details: dict, schema: str, start_time, end_time) -> dict:
+        """
+        Fills <root>/<dataset>/<schema>/<db_symbol>/ for [start_time, end_time).
+        Returns a summary dict; failed chunks are reported, not raised.
+        """
+        start, end = _to_utc(start_time), _to_utc(end_time)
+        available_end = self.source.available_end(symbol_details["dataset"])
+        if available_end is not None and end > available_end:
+            end = available_end
+
+        folder = partition_dir(self.root, symbol_details, schema)
+        os.makedirs(folder, exist_ok=True)
+        manifest = Manifest(folder)
+
+        days = day_partitions(start, end)
+        pending = [d for d in days if not manifest.is_complete(d)]
+        chunks = group_chunks(pending, self.chunk_days)
+        summary = {
+            "symbol": symbol_details["db_symbol"],
+            "schema": schema,
+            "days": len(days),
+            "skipped": len(days) - len(pending),
+            "chunks": len(chunks),
+            "rows": 0,
+            "failed": [],
+        }
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="kawaii-bulk") as pool:
+            futures = {
+                pool.submit(self._fetch_chunk, symbol_details, schema, folder, manifest, days_, end): days_
+                for days_ in chunks
+            }
+            for future in as_completed(futures):
+                days_ = futures[future]
+                try:
+                    summary["rows"] += future.result()
+                except Exception as e:
+                    span = f"{days_[0]:%Y-%m-%d}..{days_[-1]:%Y-%m-%d}"
+                    print(f"[Warning] Bulk chunk {summary['symbol']} {span} failed: {e}")
+                    summary["failed"].append(span)
+        return summary
+
+
+def main(argv=None):
+    from utils.symbols import resolve_symbol_alias
+
+    parser = argparse.ArgumentParser(description="Download history into the local FileSource store.")
+    parser.add_argument("symbols", help="Comma-separated symbols, e.g. ES,NQ,AAPL")
+    parser.add_argument("--start", required=True, help="Start date/time (UTC)")
+    parser.add_argument("--end", default=None, help="End date/time (UTC), defaults to now")
+    parser.add_argument("--schema", default="ohlcv-1m")
+    parser.add_argument("--root", default=DATA_FILES_DIR)
+    parser.add_argument("--workers", type=int, default=BULK_MAX_WORKERS)
+    parser.add_argument("--chunk-days", type=int, default=BULK_CHUNK_DAYS)
+    args = parser.parse_args(argv)
+
+    end = args.end or pd.Timestamp.now(tz="UTC").floor("min")
+    downloader = BulkDownloader(args.root, max_workers=args.workers, chunk_days=args.chunk_days)
+
+    for symbol_input in [s.strip().upper() for s in args.symbols.split(",") if s.strip()]:
+        symbol_details = resolve_symbol_alias(symbol_input)
+        print(f"\n[📦 Downloading {symbol_details['db_symbol']} {args.schema} {args.start} → {end}]")
+        summary = downloader.download(symbol_details, args.schema, args.start, end)
+        print(f"  {summary['days']} days, {summary['skipped']} already done, "
+              f"{summary['chunks']} requests, {summary['rows']} rows, {len(summary['failed'])} failed")
+
+
+if __name__ == "__main__":
+    main()
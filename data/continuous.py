@@ -0,0 +1,159 @@
+# data/continuous.py
+
+import pandas as pd
+from datetime import timedelta
+
+from data.bar_cache import _to_utc
+from utils.symbols import contract_chain
+
+ROLL_OVERLAP_DAYS = 30
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+
+
+def contract_windows(chain: list, start_time, end_time, overlap_days: int = ROLL_OVERLAP_DAYS) -> list:
+    """
+    Returns [(contract, window_start, window_end), ...]: each contract is read from
+    `overlap_days` before the previous expiry (so volume rolls can compare both
+    sides) up to its own expiry, clipped to [start_time, end_time).
+    """
+    windows = []
+    prev_expiry = None
+    for contract in chain:
+        window_start = start_time if prev_expiry is None else max(start_time, prev_expiry - timedelta(days=overlap_days))
+        window_end = min(end_time, contract["expiry"] + timedelta(days=1))
+        if window_start < window_end:
+            windows.append((contract, window_start, window_end))
+        prev_expiry = contract["expiry"]
+    return windows
+
+
+def volume_roll_schedule(bars: dict, chain: list) -> list:
+    """
+    Rolls to the next contract on the UTC day after its daily volume first exceeds
+    the current contract's. Returns [(segment_start, symbol), ...]; the first
+    segment starts at None (open-ended).
+    """
+    daily = {
+        symbol: df["volume"].groupby(df.index.floor("D")).sum()
+        for symbol, df in bars.items() if not df.empty
+    }
+    symbols = [c["symbol"] for c in chain if c["symbol"] in daily]
+    if not symbols:
+        return []
+
+    schedule = [(None, symbols[0])]
+    days = sorted(set().union(*(series.index for series in daily.values())))
+    current = 0
+    for day in days:
+        while current + 1 < len(symbols):
+            front, nxt = symbols[current], symbols[current + 1]
+            if daily[nxt].get(day, 0) <= daily[front].get(day, 0):
+                break
+            current += 1
+            schedule.append((day + pd.Timedelta(days=1), nxt))
+    return schedule
+
+
+def calendar_roll_schedule(bars: dict, chain: list, roll_days_before: int) -> list:
+    """
+    Rolls a fixed number of days before each contract's expiry.
+    """
+    contracts = [c for c in chain if c["symbol"] in bars and not bars[c["symbol"]].empty]
+    if not contracts:
+        return []
+
+    schedule = [(None, contracts[0]["symbol"])]
+    for prev, contract in zip(contracts, contracts[1:]):
+        roll_at = pd.Timestamp(prev["expiry"]).floor("D") - pd.Timedelta(days=roll_days_before)
+        schedule.append((roll_at, contract["symbol"]))
+    return schedule
+
+
+def _roll_reference(old: pd.DataFrame, new: pd.DataFrame, roll_at: pd.Timestamp):
+    # Compare closes at the last bar both contracts printed before the roll
+    common = old.index[old.index < roll_at].intersection(new.index[new.index < roll_at])
+    if common.empty:
+        return None
+    ts = common[-1]
+    return float(old.at[ts, "close"]), float(new.at[ts, "close"])
+
+
+def stitch_contracts(bars: dict, schedule: list, adjustment: str = "back") -> pd.DataFrame:
+    """
+    Joins per-contract bars along `schedule`.
+
+    adjustment:
+        "back"  -> add each roll gap to all earlier bars (price differences preserved)
+        "ratio" -> scale earlier bars by each roll ratio (percent moves preserved)
+        "none"  -> raw prices, gaps left in place
+    The newest segment is never adjusted, so the series ends at live prices.
+    """
+    segments = []
+    for i, (segment_start, symbol) in enumerate(schedule):
+        segment_end = schedule[i + 1][0] if i + 1 < len(schedule) else None
+        df = bars[symbol]
+        if segment_start is not None:
+            df = df[df.index >= segment_start]
+        if segment_end is not None:
+            df = df[df.index < segment_end]
+        df = df.astype({col: "float64" for col in PRICE_COLUMNS})
+        df["contract"] = symbol
+        segments.append(df)
+
+    if adjustment in ("back", "ratio"):
+        offset, factor = 0.0, 1.0
+        for i in range(len(schedule) - 1, 0, -1):
+            roll_at, new_symbol = schedule[i]
+            old_symbol = schedule[i - 1][1]
+            reference = _roll_reference(bars[old_symbol], bars[new_symbol], roll_at)
+            if reference is None:
+                print(f"[Warning] No overlapping bars to adjust the {old_symbol} → {new_symbol} roll.")
+            else:
+                old_close, new_close = reference
+                if adjustment == "back":
+                    offset += new_close - old_close
+                elif old_close:
+                    factor *= new_close / old_close
+            earlier = segments[i - 1]
+            if adjustment == "back":
+                earlier[PRICE_COLUMNS] = earlier[PRICE_COLUMNS] + offset
+            else:
+                earlier[PRICE_COLUMNS] = earlier[PRICE_COLUMNS] * factor
+
+    segments = [s for s in segments if not s.empty]
+    if not segments:
+        return pd.DataFrame()
+    df = pd.concat(segments)
+    df.index.name = "ts_event"
+    return df
+
+
+def build_continuous(fetch_bars, root: str, start_time, end_time, roll: str = "volume",
+                     adjustment: str = "back", roll_days_before: int = 8) -> pd.DataFrame:
+    """
+    Builds a front-month continuous series for `root` over [start_time, end_time)
+    from individual contracts.
+
+    `fetch_bars(contract_symbol, window_start, window_end)` returns that contract's
+    bars; routing it through the bar cache means each contract is downloaded once
+    and reused by every later roll and rebuild. Adds a `contract` column naming
+    the contract behind each bar.
+    """
+    start_time, end_time = _to_utc(start_time), _to_utc(end_time)
+    chain = contract_chain(root, start_time.to_pydatetime(), end_time.to_pydatetime())
+
+    bars = {}
+    for contract, window_start, window_end in contract_windows(chain, start_time, end_time):
+        bars[contract["symbol"]] = fetch_bars(contract["symbol"], window_start, window_end)
+
+    if roll == "calendar":
+        schedule = calendar_roll_schedule(bars, chain, roll_days_before)
+    else:
+        schedule = volume_roll_schedule(bars, chain)
+    if not schedule:
+        return pd.DataFrame()
+
+    df = stitch_contracts(bars, schedule, adjustment=adjustment)
+    if df.empty:
+        return df
+    return df[(df.index >= start_time) & (df.index < end_time)]
@@ -4,10 +4,24 @@ import os
 import math
 import pandas as pd
 from datetime import datetime, timedelta, timezone
-from databento import Historical
 from dotenv import load_dotenv
 import sys
 
+from config.settings import (
+    BAR_CACHE_ENABLED, ROLLUP_STORE_ENABLED,
+    CONTINUOUS_ADJUSTMENT, CONTINUOUS_ROLL_RULE, CONTINUOUS_ROLL_DAYS,
+)
+from data.sources import get_data_source
+from data.bar_cache import get_bar_cache, make_key, _to_utc
+from data.fetch_planner import (
+    plan_fetch, native_schema_for, common_base_timeframe, SCHEMA_FLOOR_RULES, TIMEFRAME_BASE_SECONDS,
+)
+from data.stream_aggregator import stream_ohlcv, stream_quote_state, resample_quote_state, quote_bars
+from data.rollup_store import get_rollup_store, BASE_TIMEFRAME, ROLLUP_PARENTS
+from data.continuous import build_continuous
+from utils.symbols import continuous_root, has_contract_calendar
+from utils.sessions import get_calendar, lookback_start
+
 load_dotenv()
 API_KEY = os.getenv("DATABENTO_API_KEY")
 
@@ -22,6 +36,8 @@ TIMEFRAME_MAP = {
     "1month": "1M"
 }
 
+ROLLUP_TIMEFRAMES = [BASE_TIMEFRAME] + list(ROLLUP_PARENTS)
+
 TIMEFRAME_SECONDS = {
     "1min": 60,
     "5min": 300,
@@ -33,9 +49,23 @@ TIMEFRAME_SECONDS = {
     "1month": 2592000
 }
 
-def get_dynamic_lookback(timeframe: str, target_candles: int = None) -> int:
+def get_dynamic_lookback(timeframe: str, target_candles: int = None, dataset: str = None,
+                         end_time=None) -> int:
+    """
+    Calendar days to request so that `target_candles` bars of `timeframe` end at `end_time`.
+
+    With a known `dataset`, trading sessions are walked backwards (overnight
+    breaks, weekends and exchange holidays hold no bars); otherwise bars are
+    assumed to print around the clock.
+    """
     if target_candles is not None:
         seconds = TIMEFRAME_SECONDS.get(timeframe)
+        calendar = get_calendar(dataset) if dataset else None
+        if seconds and calendar is not None:
+            end_time = _to_utc(end_time) if end_time is not None else pd.Timestamp(default_end_time())
+            start = lookback_start(calendar, timeframe, seconds, target_candles, end_time)
+            if start is not None:
+                return max(1, math.ceil((end_time - start) / pd.Timedelta(days=1)))
         if seconds:
             return max(1, math.ceil((target_candles * seconds) / 86400))
 
@@ -51,117 +81,221 @@ def get_dynamic_lookback(timeframe: str, target_candles: int = None) -> int:
         return 360
     return 7
 
-def fetch_ohlcv(symbol_details: dict, timeframe: str, lookback_days: int = None) -> pd.DataFrame:
-    if not API_KEY:
-        raise ValueError("DATABENTO_API_KEY not found in environment or .env file.")
+def resample_ohlcv(df: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    rule = TIMEFRAME_MAP.get(timeframe)
+    if not rule:
+        raise ValueError(f"Unsupported timeframe for resampling: {timeframe}")
+
+    df = df.resample(rule).agg({
+        "open": "first",
+        "high": "max",
+        "low": "min",
+        "close": "last",
+        "volume": "sum"
+    }).dropna(subset=["open", "high", "low", "close"], how="all")
+    df["volume"] = df["volume"].fillna(0)
+    return df
+
+def fetch_cached_bars(source, symbol_details: dict, schema: str, start_time, end_time) -> pd.DataFrame:
+    """
+    Returns bars for [start_time, end_time), requesting only the windows the local
+    bar cache has not seen yet (the new tail plus any holes).
+    """
+    if not BAR_CACHE_ENABLED or not source.cacheable:
+        return source.get_range(symbol_details, schema, start_time, end_time)
+
+    cache = get_bar_cache()
+    key = make_key(symbol_details, schema)
+    for gap_start, gap_end in cache.missing_ranges(key, start_time, end_time):
+        fetched = source.get_range(symbol_details, schema, gap_start, gap_end)
+        cache.store(key, fetched, gap_start, gap_end, available_end=source.available_end(symbol_details["dataset"]))
+    return cache.read(key, start_time, end_time)
+
+def fetch_planned_bars(source, symbol_details: dict, timeframe: str, start_time, end_time) -> pd.DataFrame:
+    """
+    Fetches the window using the coarsest native schema that rolls up exactly into
+    `timeframe`. Returns an empty frame when the planned schemas have no data.
+    """
+    plan = plan_fetch(timeframe, start_time, end_time)
+    parts = [
+        fetch_cached_bars(source, symbol_details, schema, seg_start, seg_end)
+        for schema, seg_start, seg_end in plan
+    ]
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        print(f"[Warning] No bars returned from {', '.join(seg[0] for seg in plan)}.")
+        return pd.DataFrame()
+    df = pd.concat(parts) if len(parts) > 1 else parts[0]
+    return df[~df.index.duplicated(keep="last")].sort_index()
+
+def stitches_locally(symbol_details: dict) -> bool:
+    # Roots without a known contract calendar keep the provider's continuous series
+    root = continuous_root(symbol_details["db_symbol"])
+    return CONTINUOUS_ADJUSTMENT != "off" and root is not None and has_contract_calendar(root)
+
+def fetch_continuous_bars(source, symbol_details: dict, timeframe: str, start_time, end_time) -> pd.DataFrame:
+    """
+    Builds ROOT.c.0 from individually cached contracts instead of the provider's
+    continuous series, so a roll only costs the new contract's bars.
+    """
+    def fetch_contract(contract: str, window_start, window_end):
+        details = {**symbol_details, "db_symbol": contract, "stype_in": "raw_symbol"}
+        return fetch_planned_bars(source, details, timeframe, window_start, window_end)
+
+    return build_continuous(
+        fetch_contract,
+        continuous_root(symbol_details["db_symbol"]),
+        start_time,
+        end_time,
+        roll=CONTINUOUS_ROLL_RULE,
+        adjustment=CONTINUOUS_ADJUSTMENT,
+        roll_days_before=CONTINUOUS_ROLL_DAYS,
+    )
+
+def fetch_series_bars(source, symbol_details: dict, timeframe: str, start_time, end_time) -> pd.DataFrame:
+    if stitches_locally(symbol_details):
+        return fetch_continuous_bars(source, symbol_details, timeframe, start_time, end_time)
+    if CONTINUOUS_ADJUSTMENT != "off" and continuous_root(symbol_details["db_symbol"]) is not None:
+        print(f"[Warning] No contract calendar for {symbol_details['db_symbol']}; "
+              f"using the provider's continuous series instead of stitching.")
+    return fetch_planned_bars(source, symbol_details, timeframe, start_time, end_time)
+
+def sync_rollups(source, symbol_details: dict, start_time, end_time):
+    """
+    Extends the symbol's rollup store so its 1-minute base covers [start_time, end_time).
+    Only the missing head and tail are requested.
+    """
+    store = get_rollup_store()
+    key = (symbol_details["dataset"], symbol_details["db_symbol"], symbol_details["stype_in"])
+    have_start, have_end = store.covered_range(key)
+
+    if have_start is None:
+        windows = [(start_time, end_time)]
+    else:
+        windows = []
+        if start_time < have_start:
+            windows.append((start_time, have_start))
+        if end_time > have_end:
+            windows.append((have_end, end_time))
+
+    for window_start, window_end in windows:
+        bars = source.get_range(symbol_details, "ohlcv-1m", window_start, window_end)
+        store.append(key, bars, window_start, window_end)
+    return store, key
 
-    client = Historical(key=API_KEY)
+def join_quote_bars(df: pd.DataFrame, quote_state: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds spread/bid/ask/imbalance next to OHLCV; bars without quotes get NaN.
+    """
+    return df.join(quote_bars(quote_state), how="left")
+
+def fetch_quote_state(source, symbol_details: dict, timeframe: str, start_time, end_time) -> pd.DataFrame:
+    rule = "1s" if timeframe == "1s" else TIMEFRAME_MAP.get(timeframe)
+    if not rule:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return stream_quote_state(source, symbol_details, rule, start_time, end_time)
+
+def default_end_time() -> datetime:
+    return datetime.now(timezone.utc).replace(second=0, microsecond=0) - timedelta(minutes=12)
+
+def fetch_ohlcv(symbol_details: dict, timeframe: str, lookback_days: int = None, client=None,
+                source=None, end_time=None, with_quotes: bool = False) -> pd.DataFrame:
+    """
+    Returns OHLCV bars for `timeframe` over `lookback_days` ending at `end_time`
+    (default: now minus the publication delay).
+
+    `with_quotes` also streams mbp-1 for the window and adds per-bar spread,
+    closing bid/ask and book imbalance columns.
+
+    Records come from `source` (see data/sources.py); by default that is the
+    configured source, or a Databento source bound to `client` when one is given.
+    """
+    if source is None:
+        source = get_data_source(client)
 
     db_symbol = symbol_details["db_symbol"]
     db_dataset = symbol_details["dataset"]
     db_stype_in = symbol_details["stype_in"]
     asset_class = symbol_details.get("asset_class", "unknown")
 
-    end_time = datetime.now(timezone.utc).replace(second=0, microsecond=0) - timedelta(minutes=12)
+    if end_time is None:
+        end_time = default_end_time()
+    else:
+        end_time = _to_utc(end_time)
     if lookback_days is None:
         lookback_days = get_dynamic_lookback(timeframe)
+
+    # Clamp to what the dataset can actually serve instead of failing the request first
+    available_end = source.available_end(db_dataset)
+    if available_end is not None and end_time > available_end:
+        end_time = available_end
     start_time = end_time - timedelta(days=lookback_days)
 
     sys.stdout.flush()
 
     df = pd.DataFrame()
-    df_trades = pd.DataFrame()
 
     try:
+        if ROLLUP_STORE_ENABLED and source.cacheable and timeframe in ROLLUP_TIMEFRAMES \
+                and not stitches_locally(symbol_details):
+            # Every supported timeframe is already materialized; just slice it
+            store, key = sync_rollups(source, symbol_details, start_time, end_time)
+            df = store.read(key, timeframe, start_time, end_time)
+            if df.empty:
+                print(f"[Warning] Final DataFrame is empty after processing for {db_symbol} on {timeframe}.")
+            elif with_quotes:
+                df = join_quote_bars(df, fetch_quote_state(source, symbol_details, timeframe, start_time, end_time))
+            return df
+
         try:
-            data = client.timeseries.get_range(
-                dataset=db_dataset,
-                symbols=[db_symbol],
-                stype_in=db_stype_in,
-                schema="ohlcv-1s",
-                start=start_time,
-                end=end_time,
-            )
-            df = data.to_df() if data else pd.DataFrame()
+            df = fetch_series_bars(source, symbol_details, timeframe, start_time, end_time)
         except Exception as e:
             error_message = str(e)
             if "data_end_after_available_end" in error_message:
                 actual_end_str_start = error_message.find("available up to ") + len("available up to ")
                 actual_end_str_end = error_message.find(".", actual_end_str_start)
                 if 0 <= actual_end_str_start < actual_end_str_end:
+                    # Metadata was unavailable or stale; remember what the error told us
                     corrected_end = error_message[actual_end_str_start:actual_end_str_end]
-                    end_time = pd.to_datetime(corrected_end)
+                    end_time = _to_utc(corrected_end)
+                    source.note_available_end(db_dataset, end_time)
                     start_time = end_time - timedelta(days=lookback_days)
-                    data = client.timeseries.get_range(
-                        dataset=db_dataset,
-                        symbols=[db_symbol],
-                        stype_in=db_stype_in,
-                        schema="ohlcv-1s",
-                        start=start_time,
-                        end=end_time,
-                    )
-                    df = data.to_df() if data else pd.DataFrame()
+                    df = fetch_series_bars(source, symbol_details, timeframe, start_time, end_time)
             else:
                 raise
 
+        stream_rule = "1s" if timeframe == "1s" else TIMEFRAME_MAP.get(timeframe)
+
+        if df.empty and native_schema_for(timeframe) != "ohlcv-1s":
+            print(f"[Warning] No native OHLCV bars — falling back to streamed ohlcv-1s.")
+            sys.stdout.flush()
+            if not stream_rule:
+                raise ValueError(f"Unsupported timeframe: {timeframe}")
+            df = stream_ohlcv(source, symbol_details, "ohlcv-1s", stream_rule, start_time, end_time)
+
         if df.empty:
             print(f"[Warning] No OHLCV data — falling back to trades.")
             sys.stdout.flush()
 
-            data_trades = client.timeseries.get_range(
-                dataset=db_dataset,
-                symbols=[db_symbol],
-                stype_in=db_stype_in,
-                schema="trades",
-                start=start_time,
-                end=end_time,
-            )
-            df_trades = data_trades.to_df() if data_trades else pd.DataFrame()
-
-            if df_trades.empty:
-                print(f"[Warning] Still no trade data.")
-                return pd.DataFrame()
-
-            if "ts_event" not in df_trades.columns:
-                if "hd.ts_event" in df_trades.columns:
-                    df_trades.rename(columns={"hd.ts_event": "ts_event"}, inplace=True)
-                else:
-                    raise KeyError("Missing ts_event or hd.ts_event in trades data.")
-
-            df_trades["price"] = pd.to_numeric(df_trades["price"])
-            df_trades["size"] = pd.to_numeric(df_trades["size"])
-            df_trades.set_index(pd.to_datetime(df_trades["ts_event"]), inplace=True)
-
-            rule = TIMEFRAME_MAP.get(timeframe)
-            if not rule:
+            if not stream_rule:
                 raise ValueError(f"Unsupported timeframe: {timeframe}")
 
-            ohlc = df_trades["price"].resample(rule).ohlc()
-            volume = df_trades["size"].resample(rule).sum()
-            df = pd.concat([ohlc, volume], axis=1)
-            df.rename(columns={"size": "volume"}, inplace=True)
-            df.dropna(subset=["open", "high", "low", "close"], how="all", inplace=True)
-            df["volume"] = df["volume"].fillna(0)
+            df = stream_ohlcv(source, symbol_details, "trades", stream_rule, start_time, end_time)
+
+            if df.empty:
+                print(f"[Warning] Still no trade data.")
+                return pd.DataFrame()
 
         if not isinstance(df.index, pd.DatetimeIndex):
             raise ValueError("Expected OHLCV/trade data to have a DatetimeIndex.")
 
         if timeframe != "1s":
-            rule = TIMEFRAME_MAP.get(timeframe)
-            if not rule:
-                raise ValueError(f"Unsupported timeframe for resampling: {timeframe}")
-
-            df = df.resample(rule).agg({
-                "open": "first",
-                "high": "max",
-                "low": "min",
-                "close": "last",
-                "volume": "sum"
-            }).dropna(subset=["open", "high", "low", "close"], how="all")
-            df["volume"] = df["volume"].fillna(0)
+            df = resample_ohlcv(df, timeframe)
 
         if df.empty:
             print(f"[Warning] Final DataFrame is empty after processing for {db_symbol} on {timeframe}.")
+        elif with_quotes:
+            df = join_quote_bars(df, fetch_quote_state(source, symbol_details, timeframe, start_time, end_time))
         return df
 
     except Exception as e:
@@ -174,3 +308,148 @@ def fetch_ohlcv(symbol_details: dict, timeframe: str, lookback_days: int = None)
             error_message = f"Symbol: {err_sym_display} (Dataset: {db_dataset}) - {error_message}"
 
         raise RuntimeError(f"[Databento Fetch Error] {error_message}")
+
+
+def fetch_ohlcv_multi(symbol_details: dict, timeframes: list, lookback_days: dict, client=None,
+                      source=None, end_time=None, with_quotes: bool = False) -> dict:
+    """
+    Fetches one base series that rolls up exactly into every requested timeframe
+    and derives each timeframe from it in memory.
+
+    `lookback_days` maps each timeframe to its own window; every derived frame is
+    trimmed to that window so it matches what a single-timeframe fetch returns.
+    With `with_quotes`, mbp-1 is streamed once at the base timeframe and its quote
+    state rolled up for every timeframe.
+
+    Timeframes fail on their own: one that cannot be fetched or derived comes
+    back as its exception instead of a frame, and the others are unaffected.
+    Timeframes the shared base cannot roll up into are fetched one by one.
+    """
+    if source is None:
+        source = get_data_source(client)
+
+    def fetch_single(tf):
+        try:
+            return fetch_ohlcv(symbol_details, tf, lookback_days=lookback_days[tf], source=source,
+                               end_time=end_time)
+        except Exception as e:
+            return e
+
+    if ROLLUP_STORE_ENABLED and source.cacheable and all(tf in ROLLUP_TIMEFRAMES for tf in timeframes) \
+            and not stitches_locally(symbol_details):
+        # The first call syncs the store; the rest are slice reads
+        frames = {tf: fetch_single(tf) for tf in timeframes}
+        return _join_multi_quotes(source, symbol_details, frames, BASE_TIMEFRAME, lookback_days, end_time) \
+            if with_quotes else frames
+
+    shared = [tf for tf in timeframes if tf in TIMEFRAME_BASE_SECONDS and tf in TIMEFRAME_MAP]
+    frames = {tf: fetch_single(tf) for tf in timeframes if tf not in shared}
+    base_timeframe = common_base_timeframe(shared) if shared else BASE_TIMEFRAME
+    if shared:
+        try:
+            base = fetch_ohlcv(symbol_details, base_timeframe, lookback_days=max(lookback_days[tf] for tf in shared),
+                               source=source, end_time=end_time)
+        except Exception as e:
+            base = e
+        for tf in shared:
+            if isinstance(base, Exception) or base.empty:
+                frames[tf] = base
+                continue
+            try:
+                cutoff = base.index[-1] - timedelta(days=lookback_days[tf])
+                window = base[base.index >= cutoff]
+                frames[tf] = window if tf == base_timeframe else resample_ohlcv(window, tf)
+            except Exception as e:
+                frames[tf] = e
+
+    frames = {tf: frames[tf] for tf in timeframes}
+    if with_quotes:
+        frames = _join_multi_quotes(source, symbol_details, frames, base_timeframe, lookback_days, end_time)
+    return frames
+
+def _join_multi_quotes(source, symbol_details: dict, frames: dict, base_timeframe: str,
+                       lookback_days: dict, end_time=None) -> dict:
+    # Quotes are joined onto the frames that were fetched; failed timeframes keep their error
+    fetched = {tf: df for tf, df in frames.items() if not isinstance(df, Exception)}
+    if fetched:
+        fetched = join_multi_quote_bars(source, symbol_details, fetched, base_timeframe, lookback_days, end_time)
+    return {tf: fetched.get(tf, df) for tf, df in frames.items()}
+
+def join_multi_quote_bars(source, symbol_details: dict, frames: dict, base_timeframe: str,
+                          lookback_days: dict, end_time=None) -> dict:
+    """
+    Streams mbp-1 once at `base_timeframe` and joins rolled-up quote columns onto every frame.
+    """
+    if all(df.empty for df in frames.values()):
+        return frames
+
+    end_time = default_end_time() if end_time is None else _to_utc(end_time)
+    available_end = source.available_end(symbol_details["dataset"])
+    if available_end is not None and end_time > available_end:
+        end_time = available_end
+    start_time = end_time - timedelta(days=max(lookback_days[tf] for tf in frames))
+
+    state = fetch_quote_state(source, symbol_details, base_timeframe, start_time, end_time)
+    joined = {}
+    for tf, df in frames.items():
+        if df.empty:
+            joined[tf] = df
+            continue
+        tf_state = state if tf == base_timeframe else resample_quote_state(state, TIMEFRAME_MAP[tf])
+        joined[tf] = join_quote_bars(df, tf_state)
+    return joined
+
+def fetch_universe_bars(symbol_details_list: list, timeframe: str, lookback_days: int,
+                        source=None, end_time=None) -> dict:
+    """
+    Closed `timeframe` bars for many symbols at once, as {db_symbol: DataFrame}.
+
+    Only the timeframe's native schema is read, up to its last closed bar (no
+    forming-bar tail, no streamed fallbacks). Symbols missing the same window in
+    the bar cache share one batched request, so a warm cache only asks again for
+    the stretch after the last bar published.
+    """
+    if source is None:
+        source = get_data_source()
+    schema = native_schema_for(timeframe)
+    schema_rule = SCHEMA_FLOOR_RULES.get(schema, "1s")
+
+    end_time = _to_utc(end_time) if end_time is not None else _to_utc(default_end_time())
+    windows = {}
+    available_ends = {}
+    for dataset in {details["dataset"] for details in symbol_details_list}:
+        available_end = available_ends[dataset] = source.available_end(dataset)
+        dataset_end = min(end_time, available_end) if available_end is not None else end_time
+        # A coarse bar is only published once it closes
+        dataset_end = dataset_end.floor(schema_rule)
+        windows[dataset] = (dataset_end - timedelta(days=lookback_days), dataset_end)
+
+    if BAR_CACHE_ENABLED and source.cacheable:
+        cache = get_bar_cache()
+        pending = {}
+        for details in symbol_details_list:
+            start, end = windows[details["dataset"]]
+            for gap in cache.missing_ranges(make_key(details, schema), start, end):
+                pending.setdefault(gap, []).append(details)
+        for (gap_start, gap_end), group in pending.items():
+            fetched = source.get_range_multi(group, schema, gap_start, gap_end)
+            for details in group:
+                cache.store(make_key(details, schema), fetched.get(details["db_symbol"]), gap_start, gap_end,
+                            available_end=available_ends[details["dataset"]])
+        raw = {
+            details["db_symbol"]: cache.read(make_key(details, schema), *windows[details["dataset"]])
+            for details in symbol_details_list
+        }
+    else:
+        raw = {}
+        by_window = {}
+        for details in symbol_details_list:
+            by_window.setdefault(windows[details["dataset"]], []).append(details)
+        for (start, end), group in by_window.items():
+            raw.update(source.get_range_multi(group, schema, start, end))
+
+    same_rule = TIMEFRAME_MAP.get(timeframe) == schema_rule
+    return {
+        symbol: df if df.empty or same_rule else resample_ohlcv(df, timeframe)
+        for symbol, df in raw.items()
+    }
@@ -0,0 +1,88 @@
+# data/dbn_decode.py
+
+import numpy as np
+import pandas as pd
+from databento.common.symbology import InstrumentMap
+
+FIXED_PRICE_SCALE = 1e-9
+UNDEF_PRICE = np.iinfo(np.int64).max
+PRICE_FIELDS = ["open", "high", "low", "close"]
+
+
+def compact_prices(fixed: np.ndarray) -> np.ndarray:
+    """
+    Converts 1e-9 fixed-point prices to float32 when every value survives the
+    round trip exactly (e.g. quarter-point futures ticks), otherwise to float64.
+    """
+    as_float = fixed * FIXED_PRICE_SCALE
+    as_f32 = as_float.astype(np.float32)
+    round_trip = np.rint(as_f32.astype(np.float64) / FIXED_PRICE_SCALE).astype(np.int64)
+    if np.array_equal(round_trip, fixed):
+        return as_f32
+    return as_float
+
+
+def compact_volume(volume: np.ndarray) -> np.ndarray:
+    if len(volume) == 0 or volume.max() <= np.iinfo(np.uint32).max:
+        return volume.astype(np.uint32)
+    return volume.astype(np.int64)
+
+
+def bar_arrays(records: np.ndarray, price_type: str = "compact") -> dict:
+    """
+    Pulls only ts_event/open/high/low/close/volume out of DBN OHLCV records.
+
+    price_type:
+        "compact" -> float32 where exact, else float64
+        "float"   -> float64
+        "fixed"   -> int64 fixed-point (1e-9 units), untouched
+    """
+    columns = {"ts_event": records["ts_event"].view("datetime64[ns]")}
+    for field in PRICE_FIELDS:
+        fixed = records[field]
+        if price_type == "fixed":
+            columns[field] = np.ascontiguousarray(fixed)
+        elif price_type == "float":
+            columns[field] = fixed * FIXED_PRICE_SCALE
+        else:
+            columns[field] = compact_prices(fixed)
+    columns["volume"] = compact_volume(records["volume"]) if price_type == "compact" \
+        else records["volume"].astype(np.int64)
+    return columns
+
+
+def bar_frame(records: np.ndarray, price_type: str = "compact") -> pd.DataFrame:
+    """
+    Slim OHLCV DataFrame indexed by ts_event, without the rtype/publisher/instrument/
+    symbol columns DBNStore.to_df() adds.
+    """
+    columns = bar_arrays(records, price_type=price_type)
+    index = pd.DatetimeIndex(columns.pop("ts_event"), name="ts_event").tz_localize("UTC")
+    return pd.DataFrame(columns, index=index)
+
+
+def decode_ohlcv_store(store, price_type: str = "compact") -> pd.DataFrame:
+    return bar_frame(store.to_ndarray(), price_type=price_type)
+
+
+def decode_ohlcv_store_by_symbol(store, price_type: str = "compact") -> dict:
+    """
+    decode_ohlcv_store for a multi-symbol response: {symbol: slim frame}, with
+    each record's instrument_id mapped to the requested symbol on its date.
+    """
+    records = store.to_ndarray()
+    if len(records) == 0:
+        return {}
+    instrument_map = InstrumentMap()
+    instrument_map.insert_metadata(store.metadata)
+    dates = records["ts_event"].view("datetime64[ns]").astype("datetime64[D]")
+    symbols = instrument_map.resolve_many(records["instrument_id"], dates)
+
+    mapped = np.flatnonzero(symbols != None)  # noqa: E711 (elementwise on an object array)
+    names, groups = np.unique(symbols[mapped].astype(str), return_inverse=True)
+    order = mapped[np.argsort(groups, kind="stable")]
+    bounds = np.r_[0, np.cumsum(np.bincount(groups, minlength=len(names)))]
+    return {
+        name: bar_frame(records[order[bounds[i]:bounds[i + 1]]], price_type=price_type)
+        for i, name in enumerate(names.tolist())
+    }
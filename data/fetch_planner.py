@@ -0,0 +1,99 @@
+# data/fetch_planner.py
+
+import pandas as pd
+
+# Native Databento bar schemas, finest first, with their bar width in seconds.
+NATIVE_OHLCV_SCHEMAS = [
+    ("ohlcv-1s", 1),
+    ("ohlcv-1m", 60),
+    ("ohlcv-1h", 3600),
+    ("ohlcv-1d", 86400),
+]
+
+SCHEMA_FLOOR_RULES = {
+    "ohlcv-1s": "1s",
+    "ohlcv-1m": "1min",
+    "ohlcv-1h": "1h",
+    "ohlcv-1d": "1D",
+}
+
+# Timeframes whose buckets are aligned to UTC midnight/epoch, so any schema whose
+# width divides them rolls up exactly.
+TIMEFRAME_BASE_SECONDS = {
+    "1s": 1,
+    "1min": 60,
+    "5min": 300,
+    "15min": 900,
+    "1h": 3600,
+    "4h": 14400,
+    "1d": 86400,
+    "1w": 86400,      # calendar weeks are whole UTC days
+    "1month": 86400,  # calendar months are whole UTC days
+}
+
+# Closed 1m bars are always available up to our minute-aligned end time.
+TAIL_SCHEMA = "ohlcv-1m"
+
+
+def native_schema_for(timeframe: str) -> str:
+    """
+    Returns the coarsest native OHLCV schema that rolls up exactly into `timeframe`.
+    """
+    seconds = TIMEFRAME_BASE_SECONDS.get(timeframe)
+    if seconds is None:
+        return "ohlcv-1s"
+
+    best = "ohlcv-1s"
+    for schema, schema_seconds in NATIVE_OHLCV_SCHEMAS:
+        if seconds % schema_seconds == 0:
+            best = schema
+    return best
+
+
+def plan_fetch(timeframe: str, start_time, end_time) -> list:
+    """
+    Returns the fetch plan: a list of (schema, start, end) segments that
+    together cover [start_time, end_time).
+
+    A coarse bar is only published once it closes, so the still-forming bar at
+    the end of the window is filled from 1-minute bars. The streamed ohlcv-1s
+    and trades paths are the caller's fallbacks when these come back empty.
+    """
+    start_time = pd.Timestamp(start_time)
+    end_time = pd.Timestamp(end_time)
+
+    schema = native_schema_for(timeframe)
+    if schema == "ohlcv-1s":
+        return [("ohlcv-1s", start_time, end_time)]
+
+    rule = SCHEMA_FLOOR_RULES[schema]
+    body_start = start_time.floor(rule)
+    body_end = end_time.floor(rule)
+
+    plan = []
+    if body_start < body_end:
+        plan.append((schema, body_start, body_end))
+    if body_end < end_time:
+        plan.append((TAIL_SCHEMA, max(body_end, start_time), end_time))
+
+    return plan
+
+
+# Timeframes that can serve as a shared base series, finest first.
+BASE_TIMEFRAME_CANDIDATES = ["1min", "5min", "15min", "1h", "4h", "1d"]
+
+
+def common_base_timeframe(timeframes: list) -> str:
+    """
+    Returns the coarsest timeframe that rolls up exactly into every timeframe in
+    `timeframes`, e.g. ["5min", "15min", "1h"] -> "5min", ["1w", "1month"] -> "1d".
+    """
+    best = BASE_TIMEFRAME_CANDIDATES[0]
+    for candidate in BASE_TIMEFRAME_CANDIDATES:
+        candidate_seconds = TIMEFRAME_BASE_SECONDS[candidate]
+        if all(
+            tf in TIMEFRAME_BASE_SECONDS and TIMEFRAME_BASE_SECONDS[tf] % candidate_seconds == 0
+            for tf in timeframes
+        ):
+            best = candidate
+    return best
@@ -0,0 +1,246 @@
+# data/rollup_store.py
+
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+
+from config.settings import ROLLUP_STORE_DIR, ROLLUP_STORE_MEMORY_BARS
+from data.bar_cache import OHLCV_COLUMNS, FrameLRU, _empty_bars, _partition_labels, _to_utc, _write_parquet
+
+BASE_TIMEFRAME = "1min"
+
+# Each materialized level and the level it is rolled up from.
+ROLLUP_PARENTS = {
+    "5min": "1min",
+    "15min": "5min",
+    "1h": "15min",
+    "4h": "1h",
+    "1d": "4h",
+    "1w": "1d",
+    "1month": "1d",
+}
+
+LEVELS = [BASE_TIMEFRAME] + list(ROLLUP_PARENTS)
+
+# One parquet file per partition of each level, so an append rewrites small files
+LEVEL_PARTITION_UNITS = {
+    "1min": "M",
+    "5min": "Y",
+    "15min": "Y",
+    "1h": "Y",
+    "4h": "Y",
+    "1d": "Y",
+    "1w": "Y",
+    "1month": "Y",
+}
+
+# Longest bucket per level, used to pull enough parent bars to rebuild a partial bucket.
+ROLLUP_SPANS = {
+    "5min": pd.Timedelta(minutes=5),
+    "15min": pd.Timedelta(minutes=15),
+    "1h": pd.Timedelta(hours=1),
+    "4h": pd.Timedelta(hours=4),
+    "1d": pd.Timedelta(days=1),
+    "1w": pd.Timedelta(days=7),
+    "1month": pd.Timedelta(days=31),
+}
+
+
+def _rollup(df: pd.DataFrame, rule: str) -> pd.DataFrame:
+    out = df.resample(rule).agg({
+        "open": "first",
+        "high": "max",
+        "low": "min",
+        "close": "last",
+        "volume": "sum"
+    }).dropna(subset=["open", "high", "low", "close"], how="all")
+    out["volume"] = out["volume"].fillna(0)
+    out.index.name = "ts_event"
+    return out
+
+
+def _merge(current: pd.DataFrame, rows: pd.DataFrame, drop_from=None, drop_to=None) -> pd.DataFrame:
+    # current minus its rows in [drop_from, drop_to], plus `rows` (which win on equal timestamps)
+    if drop_from is not None and not current.empty:
+        current = current[(current.index < drop_from) | (current.index > drop_to)]
+    if current.empty:
+        return rows
+    merged = pd.concat([current, rows])
+    return merged[~merged.index.duplicated(keep="last")].sort_index()
+
+
+class RollupStore:
+    """
+    Persistent per-symbol pyramid of 1-minute base bars with materialized
+    5min/15min/1h/4h/1d/1w/1month levels.
+
+    Every level is split into parquet partitions (LEVEL_PARTITION_UNITS) like the
+    bar cache. Appending base bars only rebuilds, on every level, the buckets the
+    new bars fall into, and only rewrites the partitions holding them. Loaded
+    partitions are kept in memory up to `memory_bars` bars, least recently used
+    dropped first.
+    """
+
+    def __init__(self, root: str = ROLLUP_STORE_DIR, timeframe_map: dict = None,
+                 memory_bars: int = ROLLUP_STORE_MEMORY_BARS):
+        if timeframe_map is None:
+            from data.databento_client import TIMEFRAME_MAP
+            timeframe_map = TIMEFRAME_MAP
+        self.root = root
+        self.rules = {tf: timeframe_map[tf] for tf in ROLLUP_PARENTS}
+        self._frames = FrameLRU(memory_bars)  # (key, timeframe, partition) -> bars
+        self._meta = {}
+        self._lock = threading.RLock()
+
+    def _folder(self, key: tuple) -> str:
+        dataset, db_symbol, stype_in = key
+        return os.path.join(self.root, dataset, stype_in, db_symbol.replace("/", "_").replace(" ", "_"))
+
+    def _load(self, key: tuple) -> dict:
+        if key in self._meta:
+            return self._meta[key]
+
+        folder = self._folder(key)
+        meta = {}
+        try:
+            meta_path = os.path.join(folder, "meta.json")
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    raw = json.load(f)
+                meta = {k: _to_utc(v) for k, v in raw.items()}
+            for tf in LEVELS:
+                # Older stores kept one parquet file per level
+                legacy_path = os.path.join(folder, f"{tf}.parquet")
+                if os.path.exists(legacy_path):
+                    self._write(key, tf, pd.read_parquet(legacy_path))
+                    os.remove(legacy_path)
+        except Exception as e:
+            print(f"[Warning] Discarding unreadable rollup store for {key}: {e}")
+            meta = {}
+
+        self._meta[key] = meta
+        return meta
+
+    def _partition(self, key: tuple, tf: str, label: str) -> pd.DataFrame:
+        cached = self._frames.get((key, tf, label))
+        if cached is not None:
+            return cached
+        path = os.path.join(self._folder(key), tf, f"{label}.parquet")
+        df = None
+        try:
+            df = pd.read_parquet(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[Warning] Discarding unreadable rollup partition {path}: {e}")
+        if df is None:
+            return _empty_bars()
+        self._frames.put((key, tf, label), df)
+        return df
+
+    def _labels(self, tf: str, index: pd.DatetimeIndex) -> np.ndarray:
+        return _partition_labels(index.tz_convert(None).to_numpy(), LEVEL_PARTITION_UNITS[tf])
+
+    def _slice(self, key: tuple, tf: str, start, end) -> pd.DataFrame:
+        # Bars of one level in [start, end), reading only the partitions that window spans
+        folder = os.path.join(self._folder(key), tf)
+        on_disk = set(os.listdir(folder)) if os.path.isdir(folder) else set()
+        unit = LEVEL_PARTITION_UNITS[tf]
+        first, last = (np.datetime64(ts.tz_convert(None), unit) for ts in (start, end - pd.Timedelta(1)))
+        parts = [
+            self._partition(key, tf, label) for label in np.arange(first, last + 1).astype(str)
+            if (key, tf, label) in self._frames or f"{label}.parquet" in on_disk
+        ]
+        parts = [p for p in parts if not p.empty]
+        if not parts:
+            return _empty_bars()
+        df = pd.concat(parts) if len(parts) > 1 else parts[0]
+        return df[(df.index >= start) & (df.index < end)]
+
+    def _write(self, key: tuple, tf: str, rows: pd.DataFrame, drop_from=None, drop_to=None):
+        # Merges `rows` into the partitions they fall in, replacing that partition's
+        # rows in [drop_from, drop_to]; untouched partitions are left as they are
+        if rows.empty:
+            return
+        labels = self._labels(tf, rows.index)
+        for label in np.unique(labels):
+            merged = _merge(self._partition(key, tf, label), rows[labels == label], drop_from, drop_to)
+            _write_parquet(os.path.join(self._folder(key), tf, f"{label}.parquet"), merged)
+            self._frames.put((key, tf, label), merged)
+
+    def _save_meta(self, key: tuple):
+        folder = self._folder(key)
+        os.makedirs(folder, exist_ok=True)
+        meta_path = os.path.join(folder, "meta.json")
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump({k: v.isoformat() for k, v in self._meta[key].items()}, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def covered_range(self, key: tuple):
+        """
+        Returns (start, end) of the base window already ingested, or (None, None).
+        """
+        with self._lock:
+            meta = self._load(key)
+            return meta.get("start"), meta.get("end")
+
+    def append(self, key: tuple, base_bars: pd.DataFrame, start, end):
+        """
+        Merges 1-minute bars fetched for [start, end) and rolls the change up
+        through every level.
+        """
+        start, end = _to_utc(start), _to_utc(end)
+        with self._lock:
+            meta = self._load(key)
+
+            fresh = base_bars[[c for c in OHLCV_COLUMNS if c in base_bars.columns]].copy() \
+                if base_bars is not None and not base_bars.empty else _empty_bars()
+            if not fresh.empty:
+                fresh.index = pd.DatetimeIndex(fresh.index).tz_convert("UTC")
+                fresh.index.name = "ts_event"
+                fresh = fresh[~fresh.index.duplicated(keep="last")].sort_index()
+                self._write(key, BASE_TIMEFRAME, fresh)
+
+                changed = {BASE_TIMEFRAME: (fresh.index[0], fresh.index[-1])}
+                for tf, parent in ROLLUP_PARENTS.items():
+                    changed[tf] = self._refresh_level(key, tf, parent, *changed[parent])
+
+            meta["start"] = min(meta.get("start", start), start)
+            meta["end"] = max(meta.get("end", end), end)
+            self._save_meta(key)
+
+    def _refresh_level(self, key: tuple, tf: str, parent: str, changed_from, changed_to):
+        # Rebuilds the buckets of `tf` holding parent bars changed_from..changed_to
+        # and returns the first and last bucket label rebuilt
+        rule = self.rules[tf]
+        span = ROLLUP_SPANS[tf]
+        window = self._slice(key, parent, changed_from - span, changed_to + span + pd.Timedelta(1))
+        edges = window.loc[[changed_from, changed_to]]
+        first_label, last_label = _rollup(edges.iloc[:1], rule).index[0], _rollup(edges.iloc[1:], rule).index[0]
+
+        rebuilt = _rollup(window, rule)
+        rebuilt = rebuilt[(rebuilt.index >= first_label) & (rebuilt.index <= last_label)]
+        self._write(key, tf, rebuilt, first_label, last_label)
+        return first_label, last_label
+
+    def read(self, key: tuple, timeframe: str, start, end) -> pd.DataFrame:
+        start, end = _to_utc(start), _to_utc(end)
+        if timeframe not in LEVEL_PARTITION_UNITS:
+            raise ValueError(f"Unsupported timeframe for rollup store: {timeframe}")
+        if start >= end:
+            return _empty_bars()
+        with self._lock:
+            self._load(key)
+            return self._slice(key, timeframe, start, end).copy()
+
+
+_default_store = None
+
+
+def get_rollup_store() -> RollupStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = RollupStore()
+    return _default_store
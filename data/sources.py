@@ -0,0 +1,320 @@
+# data/sources.py
+
+import abc
+import os
+import glob
+import tempfile
+import threading
+import time
+import pandas as pd
+from databento import Historical, DBNStore
+from dotenv import load_dotenv
+
+from config.settings import (
+    DATA_SOURCE, DATA_FILES_DIR, BAR_PRICE_TYPE, AVAILABILITY_TTL_SEC, AVAILABILITY_RETRY_SEC,
+    STREAM_CHUNK_RECORDS,
+)
+from data.bar_cache import _to_utc
+from data.dbn_decode import decode_ohlcv_store, decode_ohlcv_store_by_symbol
+
+load_dotenv()
+API_KEY = os.getenv("DATABENTO_API_KEY")
+
+MAX_SYMBOLS_PER_REQUEST = 2000
+
+
+class AvailabilityCache:
+    """
+    Per-dataset end of available data, refreshed from the metadata endpoint on a TTL
+    so requests can be clamped before they are sent. A failed lookup is not
+    retried for `retry_sec`; requests go out unclamped meanwhile.
+    """
+
+    def __init__(self, ttl_sec: float = AVAILABILITY_TTL_SEC, retry_sec: float = AVAILABILITY_RETRY_SEC):
+        self.ttl_sec = ttl_sec
+        self.retry_sec = retry_sec
+        self._entries = {}
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def get(self, dataset: str):
+        with self._lock:
+            entry = self._entries.get(dataset)
+            if entry and time.monotonic() - entry[1] < self.ttl_sec:
+                return entry[0]
+        return None
+
+    def put(self, dataset: str, available_end):
+        with self._lock:
+            self._entries[dataset] = (_to_utc(available_end), time.monotonic())
+            self._failures.pop(dataset, None)
+
+    def _recently_failed(self, dataset: str) -> bool:
+        with self._lock:
+            failed_at = self._failures.get(dataset)
+            return failed_at is not None and time.monotonic() - failed_at < self.retry_sec
+
+    def _fail(self, dataset: str):
+        with self._lock:
+            self._failures[dataset] = time.monotonic()
+
+    def refresh(self, metadata, dataset: str):
+        available_end = self.get(dataset)
+        if available_end is not None or metadata is None or self._recently_failed(dataset):
+            return available_end
+        try:
+            dataset_range = metadata.get_dataset_range(dataset=dataset)
+        except Exception as e:
+            print(f"[Warning] Could not read available range for {dataset}; "
+                  f"not clamping requests for {self.retry_sec:.0f}s: {e}")
+            self._fail(dataset)
+            return None
+        end = dataset_range.get("end") or dataset_range.get("end_date")
+        if not end:
+            self._fail(dataset)
+            return None
+        self.put(dataset, end)
+        return self.get(dataset)
+
+
+_availability = AvailabilityCache()
+
+
+class DataSource(abc.ABC):
+    """
+    Where fetch_ohlcv gets its records from.
+
+    `get_range` returns the schema's records for [start, end) as a DataFrame indexed
+    by ts_event; `iter_chunks` yields the same records in bounded pieces for the
+    streaming aggregation paths. `cacheable` tells the bar cache and rollup store
+    whether results are worth persisting locally.
+    """
+
+    cacheable = False
+
+    @abc.abstractmethod
+    def get_range(self, symbol_details: dict, schema: str, start_time, end_time) -> pd.DataFrame:
+        ...
+
+    @abc.abstractmethod
+    def iter_chunks(self, symbol_details: dict, schema: str, start_time, end_time,
+                    chunk_records: int = STREAM_CHUNK_RECORDS):
+        ...
+
+    def get_range_multi(self, symbol_details_list: list, schema: str, start_time, end_time) -> dict:
+        """
+        Records for several symbols over one window, as {db_symbol: DataFrame}.
+        Sources that can batch symbols into one request override this.
+        """
+        return {
+            details["db_symbol"]: self.get_range(details, schema, start_time, end_time)
+            for details in symbol_details_list
+        }
+
+    def available_end(self, dataset: str):
+        """
+        Latest timestamp the source can serve for `dataset`, or None if unbounded/unknown.
+        """
+        return None
+
+    def note_available_end(self, dataset: str, available_end):
+        pass
+
+
+class DatabentoSource(DataSource):
+    """
+    Live Databento Historical API.
+    """
+
+    cacheable = True
+
+    def __init__(self, client=None):
+        if client is None:
+            if not API_KEY:
+                raise ValueError("DATABENTO_API_KEY not found in environment or .env file.")
+            client = Historical(key=API_KEY)
+        self.client = client
+
+    def available_end(self, dataset: str):
+        return _availability.refresh(getattr(self.client, "metadata", None), dataset)
+
+    def note_available_end(self, dataset: str, available_end):
+        _availability.put(dataset, available_end)
+
+    def _request(self, symbol_details: dict, schema: str, start_time, end_time, **kwargs):
+        return self.client.timeseries.get_range(
+            dataset=symbol_details["dataset"],
+            symbols=[symbol_details["db_symbol"]],
+            stype_in=symbol_details["stype_in"],
+            schema=schema,
+            start=start_time,
+            end=end_time,
+            **kwargs
+        )
+
+    def get_range(self, symbol_details: dict, schema: str, start_time, end_time) -> pd.DataFrame:
+        data = self._request(symbol_details, schema, start_time, end_time)
+        if not data:
+            return pd.DataFrame()
+        if schema.startswith("ohlcv-"):
+            # Straight from DBN records to a slim OHLCV frame
+            return decode_ohlcv_store(data, price_type=BAR_PRICE_TYPE)
+        return data.to_df()
+
+    def get_range_multi(self, symbol_details_list: list, schema: str, start_time, end_time) -> dict:
+        """
+        One request per dataset/stype_in group and MAX_SYMBOLS_PER_REQUEST symbols,
+        split back into per-symbol frames.
+        """
+        groups = {}
+        for details in symbol_details_list:
+            groups.setdefault((details["dataset"], details["stype_in"]), []).append(details["db_symbol"])
+
+        frames = {details["db_symbol"]: pd.DataFrame() for details in symbol_details_list}
+        for (dataset, stype_in), symbols in groups.items():
+            for i in range(0, len(symbols), MAX_SYMBOLS_PER_REQUEST):
+                batch = symbols[i:i + MAX_SYMBOLS_PER_REQUEST]
+                data = self.client.timeseries.get_range(
+                    dataset=dataset, symbols=batch, stype_in=stype_in,
+                    schema=schema, start=start_time, end=end_time,
+                )
+                if not data:
+                    continue
+                if schema.startswith("ohlcv-"):
+                    # Same slim frames as get_range, split by the symbol each instrument_id maps to
+                    parts = decode_ohlcv_store_by_symbol(data, price_type=BAR_PRICE_TYPE)
+                else:
+                    df = data.to_df()
+                    if df.empty or "symbol" not in df.columns:
+                        continue
+                    parts = {symbol: part.drop(columns=["symbol"]) for symbol, part in df.groupby("symbol", sort=False)}
+                for symbol, part in parts.items():
+                    if symbol in frames:
+                        frames[symbol] = part
+        return frames
+
+    def iter_chunks(self, symbol_details: dict, schema: str, start_time, end_time,
+                    chunk_records: int = STREAM_CHUNK_RECORDS):
+        # Spool the response to disk so only one chunk is decoded at a time
+        fd, path = tempfile.mkstemp(suffix=".dbn.zst")
+        os.close(fd)
+        try:
+            store = self._request(symbol_details, schema, start_time, end_time, path=path)
+            if store:
+                yield from store.to_ndarray(count=chunk_records)
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class FileSource(DataSource):
+    """
+    Serves time-range queries from local `.dbn.zst`/`.dbn` or Parquet files, with no network.
+
+    Files are looked up by the same (dataset, schema, db_symbol) that
+    resolve_symbol_alias produces, either as a single file or a folder of
+    partitions:
+
+        <root>/<dataset>/<schema>/<db_symbol>.dbn.zst
+        <root>/<dataset>/<schema>/<db_symbol>/*.parquet
+
+    Decoded files stay in memory (refreshed when their mtime changes), so repeated
+    research runs only pay for slicing.
+    """
+
+    PATTERNS = ("*.dbn.zst", "*.dbn", "*.parquet")
+
+    def __init__(self, root: str = DATA_FILES_DIR):
+        self.root = root
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def _files(self, symbol_details: dict, schema: str) -> list:
+        folder = os.path.join(self.root, symbol_details["dataset"], schema)
+        stem = os.path.join(folder, symbol_details["db_symbol"])
+        paths = [stem + ext for ext in (".dbn.zst", ".dbn", ".parquet") if os.path.exists(stem + ext)]
+        if os.path.isdir(stem):
+            for pattern in self.PATTERNS:
+                paths.extend(glob.glob(os.path.join(stem, pattern)))
+        return sorted(paths)
+
+    @staticmethod
+    def _read(path: str, db_symbol: str) -> pd.DataFrame:
+        if path.endswith(".parquet"):
+            df = pd.read_parquet(path)
+        else:
+            store = DBNStore.from_file(path)
+            single_symbol = len(store.symbols) <= 1
+            if single_symbol and store.schema is not None and str(store.schema).startswith("ohlcv-"):
+                return decode_ohlcv_store(store, price_type=BAR_PRICE_TYPE).sort_index()
+            df = store.to_df()
+            if "symbol" in df.columns and (df["symbol"] == db_symbol).any():
+                df = df[df["symbol"] == db_symbol]
+
+        if "ts_event" in df.columns:
+            df = df.set_index(pd.to_datetime(df["ts_event"], utc=True)).drop(columns=["ts_event"])
+        index = pd.DatetimeIndex(df.index)
+        df.index = index.tz_localize("UTC") if index.tz is None else index.tz_convert("UTC")
+        df.index.name = "ts_event"
+        return df.sort_index()
+
+    def _load(self, symbol_details: dict, schema: str) -> pd.DataFrame:
+        paths = self._files(symbol_details, schema)
+        signature = tuple((p, os.path.getmtime(p)) for p in paths)
+        key = (symbol_details["dataset"], symbol_details["db_symbol"], schema)
+
+        with self._lock:
+            cached = self._frames.get(key)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+
+        frames = [self._read(p, symbol_details["db_symbol"]) for p in paths]
+        frames = [f for f in frames if not f.empty]
+        if frames:
+            df = pd.concat(frames).sort_index() if len(frames) > 1 else frames[0]
+            df = df[~df.index.duplicated(keep="last")]
+        else:
+            df = pd.DataFrame()
+
+        with self._lock:
+            self._frames[key] = (signature, df)
+        return df
+
+    def get_range(self, symbol_details: dict, schema: str, start_time, end_time) -> pd.DataFrame:
+        df = self._load(symbol_details, schema)
+        if df.empty:
+            return df
+        lo = df.index.searchsorted(_to_utc(start_time), side="left")
+        hi = df.index.searchsorted(_to_utc(end_time), side="left")
+        return df.iloc[lo:hi]
+
+    def iter_chunks(self, symbol_details: dict, schema: str, start_time, end_time,
+                    chunk_records: int = STREAM_CHUNK_RECORDS):
+        df = self.get_range(symbol_details, schema, start_time, end_time)
+        for i in range(0, len(df), chunk_records):
+            yield df.iloc[i:i + chunk_records]
+
+
+_default_source = None
+
+
+def get_data_source(client=None) -> DataSource:
+    """
+    Returns the configured source, or a Databento source bound to `client`.
+    """
+    global _default_source
+    if client is not None:
+        return DatabentoSource(client)
+    if _default_source is None:
+        if DATA_SOURCE == "files":
+            _default_source = FileSource(DATA_FILES_DIR)
+        else:
+            _default_source = DatabentoSource()
+    return _default_source
+
+
+def set_data_source(source: DataSource):
+    global _default_source
+    _default_source = source
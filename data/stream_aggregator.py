@@ -0,0 +1,268 @@
+# data/stream_aggregator.py
+
+import numpy as np
+import pandas as pd
+
+from config.settings import STREAM_CHUNK_RECORDS
+from data.dbn_decode import FIXED_PRICE_SCALE, UNDEF_PRICE
+
+QUOTE_SCHEMA = "mbp-1"
+QUOTE_COLUMNS = ["spread", "bid", "ask", "imbalance"]
+
+# Per-bar quote state: sums and counts merge exactly across chunks and coarser bars
+QUOTE_STATE_AGG = {
+    "spread_sum": "sum",
+    "quotes": "sum",
+    "imbalance_sum": "sum",
+    "imbalance_quotes": "sum",
+    "bid": "last",
+    "ask": "last",
+}
+
+
+class BarAggregator:
+    """
+    Folds time-ordered chunks of bars or trades into OHLCV bars of `rule`.
+
+    Only the finished bars and the one bar still being built are kept, so memory
+    grows with the number of output bars rather than the number of input records.
+    """
+
+    def __init__(self, rule: str):
+        self.rule = rule
+        self._finished = []
+        self._open_bar = None
+
+    def _fold(self, bars: pd.DataFrame):
+        bars = bars.dropna(subset=["open", "high", "low", "close"], how="all")
+        if bars.empty:
+            return
+
+        if self._open_bar is not None:
+            if bars.index[0] == self._open_bar.index[0]:
+                head = bars.iloc[:1].copy()
+                prev = self._open_bar.iloc[0]
+                head.iloc[0, head.columns.get_loc("open")] = prev["open"]
+                head.iloc[0, head.columns.get_loc("high")] = max(prev["high"], head["high"].iloc[0])
+                head.iloc[0, head.columns.get_loc("low")] = min(prev["low"], head["low"].iloc[0])
+                head.iloc[0, head.columns.get_loc("volume")] = prev["volume"] + head["volume"].iloc[0]
+                bars = pd.concat([head, bars.iloc[1:]])
+            else:
+                self._finished.append(self._open_bar)
+
+        if len(bars) > 1:
+            self._finished.append(bars.iloc[:-1])
+        self._open_bar = bars.iloc[-1:]
+
+    def add_bars(self, ts, open_, high, low, close, volume):
+        chunk = pd.DataFrame(
+            {"open": open_, "high": high, "low": low, "close": close, "volume": volume},
+            index=ts,
+        )
+        self._fold(chunk.resample(self.rule).agg({
+            "open": "first",
+            "high": "max",
+            "low": "min",
+            "close": "last",
+            "volume": "sum"
+        }))
+
+    def add_trades(self, ts, price, size):
+        prices = pd.Series(price, index=ts)
+        ohlc = prices.resample(self.rule).ohlc()
+        ohlc["volume"] = pd.Series(size, index=ts).resample(self.rule).sum()
+        self._fold(ohlc)
+
+    def result(self) -> pd.DataFrame:
+        parts = self._finished + ([self._open_bar] if self._open_bar is not None else [])
+        if not parts:
+            return pd.DataFrame()
+        df = pd.concat(parts)
+        df.index.name = "ts_event"
+        df["volume"] = df["volume"].fillna(0)
+        return df
+
+
+class QuoteAggregator:
+    """
+    Folds time-ordered chunks of top-of-book quotes into per-bar quote state
+    (spread and imbalance sums, closing bid/ask), carrying the open bar across
+    chunks the same way BarAggregator does.
+    """
+
+    def __init__(self, rule: str):
+        self.rule = rule
+        self._finished = []
+        self._open_bar = None
+
+    def add_quotes(self, ts, bid, ask, bid_size, ask_size):
+        depth = bid_size + ask_size
+        with np.errstate(invalid="ignore", divide="ignore"):
+            imbalance = np.where(depth > 0, (bid_size - ask_size) / depth, np.nan)
+
+        quotes = pd.DataFrame({"spread": ask - bid, "imbalance": imbalance, "bid": bid, "ask": ask}, index=ts)
+        resampler = quotes.resample(self.rule)
+        bars = pd.DataFrame({
+            "spread_sum": resampler["spread"].sum(),
+            "quotes": resampler["spread"].count(),
+            "imbalance_sum": resampler["imbalance"].sum(),
+            "imbalance_quotes": resampler["imbalance"].count(),
+            "bid": resampler["bid"].last(),
+            "ask": resampler["ask"].last(),
+        })
+        self._fold(bars[bars["quotes"] > 0])
+
+    def _fold(self, bars: pd.DataFrame):
+        if bars.empty:
+            return
+
+        if self._open_bar is not None:
+            if bars.index[0] == self._open_bar.index[0]:
+                head = bars.iloc[:1].copy()
+                prev = self._open_bar.iloc[0]
+                for col in ("spread_sum", "quotes", "imbalance_sum", "imbalance_quotes"):
+                    head.iloc[0, head.columns.get_loc(col)] = prev[col] + head[col].iloc[0]
+                bars = pd.concat([head, bars.iloc[1:]])
+            else:
+                self._finished.append(self._open_bar)
+
+        if len(bars) > 1:
+            self._finished.append(bars.iloc[:-1])
+        self._open_bar = bars.iloc[-1:]
+
+    def result(self) -> pd.DataFrame:
+        parts = self._finished + ([self._open_bar] if self._open_bar is not None else [])
+        if not parts:
+            return pd.DataFrame(columns=list(QUOTE_STATE_AGG))
+        df = pd.concat(parts)
+        df.index.name = "ts_event"
+        return df
+
+
+def resample_quote_state(state: pd.DataFrame, rule: str) -> pd.DataFrame:
+    """
+    Rolls per-bar quote state up to a coarser `rule` without losing exactness.
+    """
+    if state.empty:
+        return state
+    state = state.resample(rule).agg(QUOTE_STATE_AGG)
+    return state[state["quotes"] > 0]
+
+
+def quote_bars(state: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turns quote state into the columns joined next to OHLCV:
+    spread (mean over quote updates), closing bid/ask and mean book imbalance
+    in [-1, 1] (positive = more size bid than offered).
+    """
+    if state.empty:
+        return pd.DataFrame(columns=QUOTE_COLUMNS, dtype="float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.DataFrame({
+            "spread": state["spread_sum"] / state["quotes"],
+            "bid": state["bid"],
+            "ask": state["ask"],
+            "imbalance": state["imbalance_sum"] / state["imbalance_quotes"].where(state["imbalance_quotes"] > 0),
+        }, index=state.index)
+
+
+def _fold_quote_chunk(aggregator: QuoteAggregator, records):
+    if isinstance(records, pd.DataFrame):
+        aggregator.add_quotes(
+            records.index,
+            records["bid_px_00"].to_numpy(dtype="float64"),
+            records["ask_px_00"].to_numpy(dtype="float64"),
+            records["bid_sz_00"].to_numpy(dtype="float64"),
+            records["ask_sz_00"].to_numpy(dtype="float64"),
+        )
+        return
+
+    # One-sided or empty books carry the undefined price sentinel
+    records = records[(records["bid_px_00"] != UNDEF_PRICE) & (records["ask_px_00"] != UNDEF_PRICE)]
+    if len(records) == 0:
+        return
+    aggregator.add_quotes(
+        _ts_index(records),
+        records["bid_px_00"] * FIXED_PRICE_SCALE,
+        records["ask_px_00"] * FIXED_PRICE_SCALE,
+        records["bid_sz_00"].astype("float64"),
+        records["ask_sz_00"].astype("float64"),
+    )
+
+
+def stream_quote_state(source, symbol_details: dict, rule: str, start_time, end_time,
+                       chunk_records: int = STREAM_CHUNK_RECORDS) -> pd.DataFrame:
+    """
+    Folds mbp-1 records for the window into per-bar quote state chunk by chunk;
+    the raw quotes are never held as one frame.
+    """
+    aggregator = QuoteAggregator(rule)
+    for records in source.iter_chunks(symbol_details, QUOTE_SCHEMA, start_time, end_time,
+                                      chunk_records=chunk_records):
+        if len(records) == 0:
+            continue
+        _fold_quote_chunk(aggregator, records)
+    return aggregator.result()
+
+
+def _ts_index(records) -> pd.DatetimeIndex:
+    return pd.to_datetime(records["ts_event"].astype("int64"), unit="ns", utc=True)
+
+
+def _fold_chunk(aggregator: BarAggregator, records, schema: str):
+    # Local files arrive as float-priced DataFrames, Databento as fixed-point records
+    if isinstance(records, pd.DataFrame):
+        if schema == "trades":
+            aggregator.add_trades(records.index, records["price"].to_numpy(), records["size"].to_numpy())
+        else:
+            aggregator.add_bars(
+                records.index,
+                records["open"].to_numpy(),
+                records["high"].to_numpy(),
+                records["low"].to_numpy(),
+                records["close"].to_numpy(),
+                records["volume"].to_numpy(),
+            )
+        return
+
+    if schema == "trades":
+        records = records[records["price"] != UNDEF_PRICE]
+        if len(records) == 0:
+            return
+        aggregator.add_trades(
+            _ts_index(records),
+            records["price"] * FIXED_PRICE_SCALE,
+            records["size"].astype("int64"),
+        )
+    else:
+        aggregator.add_bars(
+            _ts_index(records),
+            records["open"] * FIXED_PRICE_SCALE,
+            records["high"] * FIXED_PRICE_SCALE,
+            records["low"] * FIXED_PRICE_SCALE,
+            records["close"] * FIXED_PRICE_SCALE,
+            records["volume"].astype("int64"),
+        )
+
+
+def aggregate_chunks(chunks, schema: str, rule: str) -> pd.DataFrame:
+    """
+    Folds an iterable of time-ordered record chunks into OHLCV bars for `rule`.
+    Supports the ohlcv-* and trades schemas.
+    """
+    aggregator = BarAggregator(rule)
+    for records in chunks:
+        if len(records) == 0:
+            continue
+        _fold_chunk(aggregator, records, schema)
+    return aggregator.result()
+
+
+def stream_ohlcv(source, symbol_details: dict, schema: str, rule: str, start_time, end_time,
+                 chunk_records: int = STREAM_CHUNK_RECORDS) -> pd.DataFrame:
+    """
+    Folds `schema` records for the window into `rule` bars chunk by chunk, so the
+    raw records are never held as one frame.
+    """
+    chunks = source.iter_chunks(symbol_details, schema, start_time, end_time, chunk_records=chunk_records)
+    return aggregate_chunks(chunks, schema, rule)
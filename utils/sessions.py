@@ -0,0 +1,224 @@
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from utils.symbols import EQUITY_DATASETS
+
+MAX_LOOKBACK_DAYS = 3 * 366
+
+
+# -- Holiday rules -----------------------------------------------------------
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    first = date(year, month, 1)
+    offset = (weekday - first.weekday()) % 7
+    return first + timedelta(days=offset + 7 * (n - 1))
+
+
+def _last_weekday(year: int, month: int, weekday: int) -> date:
+    last = date(year, month + 1, 1) - timedelta(days=1) if month < 12 else date(year, 12, 31)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    # Anonymous Gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(day: date) -> date:
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def us_market_holidays(year: int) -> dict:
+    """
+    Returns {date: name} for the US exchange holidays observed in `year`.
+    """
+    holidays = {
+        _nth_weekday(year, 1, 0, 3): "Martin Luther King Jr. Day",
+        _nth_weekday(year, 2, 0, 3): "Presidents' Day",
+        _easter(year) - timedelta(days=2): "Good Friday",
+        _last_weekday(year, 5, 0): "Memorial Day",
+        _observed(date(year, 7, 4)): "Independence Day",
+        _nth_weekday(year, 9, 0, 1): "Labor Day",
+        _nth_weekday(year, 11, 3, 4): "Thanksgiving",
+        _observed(date(year, 12, 25)): "Christmas",
+    }
+    # New Year's Day is not moved back into the previous year when it falls on a Saturday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays[_observed(new_year)] = "New Year's Day"
+    if year >= 2022:
+        holidays[_observed(date(year, 6, 19))] = "Juneteenth"
+    return holidays
+
+
+# -- Calendars ---------------------------------------------------------------
+
+class SessionCalendar:
+    """
+    Trading sessions of one venue, one per trading day.
+
+    A session for trading day D runs from `open_time` on D - `open_offset_days`
+    to `close_time` on D, in the venue's local time zone.
+    """
+
+    def __init__(self, name: str, tz: str, open_time: time, close_time: time,
+                 open_offset_days: int = 0, closed_holidays=None,
+                 early_close_holidays=None, early_close_time: time = None,
+                 early_close_days=None):
+        self.name = name
+        self.tz = ZoneInfo(tz)
+        self.open_time = open_time
+        self.close_time = close_time
+        self.open_offset_days = open_offset_days
+        self.closed_holidays = set(closed_holidays or [])
+        self.early_close_holidays = set(early_close_holidays or [])
+        self.early_close_time = early_close_time
+        self.early_close_days = early_close_days
+        self._holiday_cache = {}
+
+    def _holidays(self, year: int) -> dict:
+        if year not in self._holiday_cache:
+            self._holiday_cache[year] = us_market_holidays(year)
+        return self._holiday_cache[year]
+
+    def session(self, day: date):
+        """
+        Returns (open_utc, close_utc) for trading day `day`, or None if the venue is closed.
+        """
+        if day.weekday() >= 5:
+            return None
+        holiday = self._holidays(day.year).get(day)
+        if holiday in self.closed_holidays:
+            return None
+
+        close_time = self.close_time
+        if holiday in self.early_close_holidays or (self.early_close_days and self.early_close_days(day)):
+            close_time = self.early_close_time
+
+        open_day = day - timedelta(days=self.open_offset_days)
+        open_local = datetime.combine(open_day, self.open_time, tzinfo=self.tz)
+        close_local = datetime.combine(day, close_time, tzinfo=self.tz)
+        return open_local.astimezone(timezone.utc), close_local.astimezone(timezone.utc)
+
+    def sessions_before(self, end_time: datetime, max_days: int = MAX_LOOKBACK_DAYS):
+        """
+        Yields (open_utc, close_utc) sessions that start before `end_time`, newest first,
+        with the close clipped to `end_time`.
+        """
+        day = end_time.astimezone(self.tz).date() + timedelta(days=self.open_offset_days)
+        for _ in range(max_days):
+            window = self.session(day)
+            day -= timedelta(days=1)
+            if window is None:
+                continue
+            open_utc, close_utc = window
+            if open_utc >= end_time:
+                continue
+            yield open_utc, min(close_utc, end_time)
+
+
+def _day_after_thanksgiving(day: date) -> bool:
+    return day == _nth_weekday(day.year, 11, 3, 4) + timedelta(days=1)
+
+
+def _equity_early_close(day: date) -> bool:
+    return _day_after_thanksgiving(day) or (day.month == 12 and day.day == 24)
+
+
+# CME Globex: Sunday-Friday 17:00-16:00 CT with a daily one-hour break. Most US
+# holidays are shortened sessions (12:00 CT halt) rather than full closures.
+CME_GLOBEX = SessionCalendar(
+    name="CME Globex",
+    tz="America/Chicago",
+    open_time=time(17, 0),
+    close_time=time(16, 0),
+    open_offset_days=1,
+    closed_holidays={"New Year's Day", "Good Friday", "Christmas"},
+    early_close_holidays={
+        "Martin Luther King Jr. Day", "Presidents' Day", "Memorial Day", "Juneteenth",
+        "Independence Day", "Labor Day", "Thanksgiving",
+    },
+    early_close_time=time(12, 0),
+)
+
+# US cash equities, regular trading hours only.
+US_EQUITY_RTH = SessionCalendar(
+    name="US equities RTH",
+    tz="America/New_York",
+    open_time=time(9, 30),
+    close_time=time(16, 0),
+    closed_holidays={
+        "New Year's Day", "Martin Luther King Jr. Day", "Presidents' Day", "Good Friday",
+        "Memorial Day", "Juneteenth", "Independence Day", "Labor Day", "Thanksgiving", "Christmas",
+    },
+    early_close_time=time(13, 0),
+    early_close_days=_equity_early_close,
+)
+
+DATASET_CALENDARS = {"GLBX.MDP3": CME_GLOBEX}
+DATASET_CALENDARS.update({dataset: US_EQUITY_RTH for dataset in EQUITY_DATASETS})
+
+
+def get_calendar(dataset: str):
+    return DATASET_CALENDARS.get(dataset)
+
+
+# -- Lookback ----------------------------------------------------------------
+
+def _bucket_bounds(ts: pd.Timestamp, bar_seconds: int, timeframe: str):
+    """
+    Returns (bucket_id, bucket_start) of the UTC-aligned bar containing `ts`.
+    """
+    if timeframe == "1w":
+        start = (ts - pd.Timedelta(days=ts.weekday())).normalize()
+        return start.value, start
+    if timeframe == "1month":
+        start = ts.normalize().replace(day=1)
+        return start.value, start
+    bucket = ts.value // (bar_seconds * 10**9)
+    return bucket, pd.Timestamp(bucket * bar_seconds * 10**9, tz="UTC")
+
+
+def lookback_start(calendar: SessionCalendar, timeframe: str, bar_seconds: int,
+                   target_candles: int, end_time: datetime):
+    """
+    Walks sessions backwards from `end_time` and returns the earliest timestamp that
+    still leaves `target_candles` bars of `timeframe` in [start, end_time).
+    Returns None if the calendar runs out before enough bars are found.
+    """
+    end_time = pd.Timestamp(end_time)
+    if end_time.tzinfo is None:
+        end_time = end_time.tz_localize("UTC")
+    counted = 0
+    last_bucket = None
+
+    for open_utc, close_utc in calendar.sessions_before(end_time.to_pydatetime()):
+        session_open = pd.Timestamp(open_utc)
+        cursor = pd.Timestamp(close_utc) - pd.Timedelta(nanoseconds=1)
+
+        # Step back one bar at a time; bars straddling the daily break are counted once
+        while cursor >= session_open:
+            bucket, bucket_start = _bucket_bounds(cursor, bar_seconds, timeframe)
+            if bucket != last_bucket:
+                counted += 1
+                last_bucket = bucket
+                if counted >= target_candles:
+                    return max(bucket_start, session_open)
+            cursor = bucket_start - pd.Timedelta(nanoseconds=1)
+    return None
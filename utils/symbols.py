@@ -1,4 +1,4 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 
 ALL_CME_FUTURES_ROOTS = [  "AAK", "ABH", "ABI", "ABS", "ABT", "ABX", "ABY", "ACB", "ACD", "ADB", "ADE", "ADJ", "ADR", "ADT", "AEB", 
     "AEP", "AET", "AEZ", "AFE", "AFF", "AFH", "AFI", "AFK", "AFR", "AFT", "AFY", "AGA", "AGE", "AGF", "AGT", 
@@ -77,6 +77,177 @@ EQUITY_DATASETS = {
 }
 DEFAULT_EQUITY_DATASET = "XNAS.ITCH"
 
+# 📅 Futures contract months
+MONTH_CODES = {1: "F", 2: "G", 3: "H", 4: "J", 5: "K", 6: "M", 7: "N", 8: "Q", 9: "U", 10: "V", 11: "X", 12: "Z"}
+QUARTERLY_MONTHS = (3, 6, 9, 12)
+ALL_MONTHS = tuple(range(1, 13))
+
+
+def continuous_root(db_symbol: str):
+    """
+    Returns the root of a front-month continuous symbol like "ES.c.0", else None.
+    """
+    parts = db_symbol.split(".")
+    if len(parts) == 3 and parts[1] == "c" and parts[2] == "0":
+        return parts[0]
+    return None
+
+
+def contract_symbol(root: str, year: int, month: int) -> str:
+    # Globex raw symbols carry a single year digit, e.g. ESH5
+    return f"{root}{MONTH_CODES[month]}{year % 10}"
+
+
+# 🗓️ Last trade date rules (CME rulebook, US exchange holidays as business-day breaks)
+def _is_business_day(day: date) -> bool:
+    from utils.sessions import us_market_holidays  # utils.sessions imports this module
+    return day.weekday() < 5 and day not in us_market_holidays(day.year)
+
+
+def _business_days_before(day: date, count: int) -> date:
+    # The `count`-th business day strictly before `day`
+    while count:
+        day -= timedelta(days=1)
+        count -= _is_business_day(day)
+    return day
+
+
+def _last_business_day(year: int, month: int) -> date:
+    day = date(year + month // 12, month % 12 + 1, 1)
+    return _business_days_before(day, 1)
+
+
+def _previous_month(year: int, month: int):
+    return (year - 1, 12) if month == 1 else (year, month - 1)
+
+
+def _third_weekday(year: int, month: int, weekday: int) -> date:
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 14)
+
+
+def _equity_index_expiry(year: int, month: int) -> date:
+    # Third Friday of the contract month
+    return _third_weekday(year, month, 4)
+
+
+def _fx_expiry(year: int, month: int) -> date:
+    # Two business days before the third Wednesday of the contract month
+    return _business_days_before(_third_weekday(year, month, 2), 2)
+
+
+def _short_treasury_expiry(year: int, month: int) -> date:
+    # 2- and 5-year notes: last business day of the contract month
+    return _last_business_day(year, month)
+
+
+def _long_treasury_expiry(year: int, month: int) -> date:
+    # 10-year and longer: seventh business day before the last business day of the contract month
+    return _business_days_before(_last_business_day(year, month), 7)
+
+
+def _crude_expiry(year: int, month: int) -> date:
+    # Three business days before the 25th of the prior month (before the business day preceding it if a holiday)
+    day = date(*_previous_month(year, month), 25)
+    if not _is_business_day(day):
+        day = _business_days_before(day, 1)
+    return _business_days_before(day, 3)
+
+
+def _natural_gas_expiry(year: int, month: int) -> date:
+    # Three business days before the first calendar day of the contract month
+    return _business_days_before(date(year, month, 1), 3)
+
+
+def _refined_products_expiry(year: int, month: int) -> date:
+    # Heating oil and RBOB: last business day of the prior month
+    return _last_business_day(*_previous_month(year, month))
+
+
+def _metals_expiry(year: int, month: int) -> date:
+    # Third last business day of the contract month
+    return _business_days_before(_last_business_day(year, month), 2)
+
+
+def _grain_expiry(year: int, month: int) -> date:
+    # Business day before the 15th of the contract month
+    return _business_days_before(date(year, month, 15), 1)
+
+
+# Listed cycle of the actively traded contracts and their last trade date rule.
+# Roots without an entry are not stitched locally (see data/databento_client.stitches_locally).
+CONTRACT_CALENDARS = {
+    # Equity index
+    **{root: (QUARTERLY_MONTHS, _equity_index_expiry) for root in (
+        "ES", "NQ", "YM", "RTY", "EMD", "MES", "MNQ", "MYM", "M2K",
+    )},
+    # Rates
+    **{root: (QUARTERLY_MONTHS, _short_treasury_expiry) for root in ("ZT", "ZF")},
+    **{root: (QUARTERLY_MONTHS, _long_treasury_expiry) for root in ("ZN", "ZB", "UB", "TN")},
+    # FX
+    **{root: (QUARTERLY_MONTHS, _fx_expiry) for root in ("6A", "6B", "6C", "6E", "6J", "6M", "6N", "6S")},
+    # Energy: the contract stops trading in the month before its delivery month
+    **{root: (ALL_MONTHS, _crude_expiry) for root in ("CL", "MCL", "QM")},
+    **{root: (ALL_MONTHS, _natural_gas_expiry) for root in ("NG", "QG")},
+    **{root: (ALL_MONTHS, _refined_products_expiry) for root in ("HO", "RB")},
+    # Metals
+    **{root: ((2, 4, 6, 8, 10, 12), _metals_expiry) for root in ("GC", "MGC")},
+    **{root: ((3, 5, 7, 9, 12), _metals_expiry) for root in ("SI", "SIL", "HG")},
+    "PL": ((1, 4, 7, 10), _metals_expiry),
+    "PA": (QUARTERLY_MONTHS, _metals_expiry),
+    # Grains
+    "ZC": ((3, 5, 7, 9, 12), _grain_expiry),
+    "ZW": ((3, 5, 7, 9, 12), _grain_expiry),
+    "ZS": ((1, 3, 5, 7, 8, 9, 11), _grain_expiry),
+    "ZL": ((1, 3, 5, 7, 8, 9, 10, 12), _grain_expiry),
+    "ZM": ((1, 3, 5, 7, 8, 9, 10, 12), _grain_expiry),
+}
+
+
+def has_contract_calendar(root: str) -> bool:
+    return root.upper() in CONTRACT_CALENDARS
+
+
+def _contract_calendar(root: str):
+    calendar = CONTRACT_CALENDARS.get(root.upper())
+    if calendar is None:
+        raise ValueError(f"No contract calendar for {root}; listed months and expiry rule are unknown")
+    return calendar
+
+
+def contract_expiry(root: str, year: int, month: int) -> datetime:
+    """
+    Last trade date of the `root` contract for (year, month), at 00:00 UTC.
+    Raises ValueError for roots without a contract calendar.
+    """
+    day = _contract_calendar(root)[1](year, month)
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+def contract_chain(root: str, start_time: datetime, end_time: datetime) -> list:
+    """
+    Returns [{"symbol", "year", "month", "expiry"}, ...] for every listed contract
+    that is the front month at some point in [start_time, end_time), oldest first.
+    Raises ValueError for roots without a contract calendar rather than guessing one.
+    """
+    months = _contract_calendar(root)[0]
+    chain = []
+    year = start_time.year
+    while True:
+        for month in months:
+            expiry = contract_expiry(root, year, month)
+            if expiry < start_time:
+                continue
+            chain.append({
+                "symbol": contract_symbol(root.upper(), year, month),
+                "year": year,
+                "month": month,
+                "expiry": expiry,
+            })
+            if expiry >= end_time:
+                return chain
+        year += 1
+
 def get_weekend_es_contract():
     current_date = datetime.now(timezone.utc)
     year_last_digit = str(current_date.year)[-1]